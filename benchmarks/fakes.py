@@ -0,0 +1,299 @@
+"""In-process stand-ins for the Bluetooth stack used by the benchmarks."""
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import ExitStack, contextmanager
+from typing import Any
+from unittest.mock import patch
+
+from bleak import BleakClient
+from bleak.backends.device import BLEDevice
+from bleak.exc import BleakDBusError
+from bleak_retry_connector import BleakNotFoundError
+from custom_components.snooz.const import DOMAIN, SNOOZ_SERVICE_UUID
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_ADDRESS, CONF_TOKEN, Platform
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+from pysnooz.testing import MockSnoozClient
+
+SNOOZ_MANUFACTURER_ID = 65552
+
+# advertisement token of a device that isn't in pairing mode
+IDLE_TOKEN = bytes(range(1, 9))
+
+
+class FakeRadio:
+    """Latency and failure behavior of the fake Bluetooth stack.
+
+    Latencies are in seconds; failure rates are probabilities from 0 to 1.
+    """
+
+    def __init__(
+        self,
+        connect_latency: float = 0.0,
+        write_latency: float = 0.0,
+        connect_failure_rate: float = 0.0,
+        write_failure_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.connect_latency = connect_latency
+        self.write_latency = write_latency
+        self.connect_failure_rate = connect_failure_rate
+        self.write_failure_rate = write_failure_rate
+        self.connects = 0
+        self.writes = 0
+        self._random = random.Random(seed)
+
+    def fails(self, rate: float) -> bool:
+        return rate > 0 and self._random.random() < rate
+
+
+class FakeSnoozClient(MockSnoozClient):
+    """MockSnoozClient with the latency and failures of a FakeRadio."""
+
+    def __init__(
+        self,
+        radio: FakeRadio,
+        address_or_ble_device: BLEDevice | str,
+        disconnected_callback: Callable[[BleakClient], None] | None = None,
+    ) -> None:
+        super().__init__(address_or_ble_device, disconnected_callback)
+        self._radio = radio
+
+    async def write_gatt_char(self, char_specifier: Any, data: Any, response: bool = False) -> None:
+        self._radio.writes += 1
+        if self._radio.write_latency:
+            await asyncio.sleep(self._radio.write_latency)
+        if self._radio.fails(self._radio.write_failure_rate):
+            # a transient error that pysnooz retries
+            raise BleakDBusError("org.bluez.Error.InProgress", [])
+        await super().write_gatt_char(char_specifier, data, response)
+
+
+def fake_establish_connection(radio: FakeRadio) -> Callable[..., Any]:
+    """Return a stand-in for bleak_retry_connector.establish_connection."""
+
+    async def _establish_connection(
+        client_class: type[BleakClient],
+        device: BLEDevice,
+        name: str,
+        disconnected_callback: Callable[[BleakClient], None] | None = None,
+        **kwargs: Any,
+    ) -> BleakClient:
+        radio.connects += 1
+        if radio.connect_latency:
+            await asyncio.sleep(radio.connect_latency)
+        if radio.fails(radio.connect_failure_rate):
+            raise BleakNotFoundError(f"{name} was not found")
+        return FakeSnoozClient(radio, device, disconnected_callback)
+
+    return _establish_connection
+
+
+class EventLoopLagProbe:
+    """Measures how long the event loop was blocked by everything else.
+
+    A task repeatedly sleeps for a short interval; any time beyond that
+    interval is time the loop spent running other callbacks.
+    """
+
+    def __init__(self, interval: float = 0.001) -> None:
+        self._interval = interval
+        self._task: asyncio.Task[None] | None = None
+        self.total = 0.0
+        self.max = 0.0
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._async_run())
+
+    async def async_stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _async_run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self._interval)
+            lag = max(loop.time() - start - self._interval, 0)
+            self.total += lag
+            self.max = max(self.max, lag)
+
+
+def attach_entity(hass: HomeAssistant, entity: Entity, entity_id: str) -> list[int]:
+    """Give an entity enough of hass to run, counting its state writes.
+
+    Returns a one-item list holding the number of state writes so far.
+    """
+    writes = [0]
+
+    def _count_write() -> None:
+        writes[0] += 1
+
+    entity.hass = hass
+    entity.entity_id = entity_id
+    entity.async_write_ha_state = _count_write  # type: ignore[method-assign]
+    return writes
+
+
+def fake_address(index: int) -> str:
+    """Return a unique, stable MAC address for a fake device."""
+    return ":".join(f"{b:02X}" for b in (0xAA, 0xBB, 0xCC, 0xDD, index >> 8 & 0xFF, index & 0xFF))
+
+
+def fake_ble_device(address: str, name: str = "Snooz") -> BLEDevice:
+    try:
+        return BLEDevice(address, name, {})
+    except TypeError:
+        # bleak < 1.0 also requires an rssi
+        return BLEDevice(address, name, {}, -60)
+
+
+def fake_service_info(
+    address: str = "AA:BB:CC:DD:00:00",
+    rssi: int = -60,
+    token: bytes = IDLE_TOKEN,
+    source: str = "local",
+    name: str = "Snooz-0000",
+) -> BluetoothServiceInfoBleak:
+    """Build an advertisement like the ones a SNOOZ broadcasts."""
+    return BluetoothServiceInfoBleak(
+        name=name,
+        address=address,
+        rssi=rssi,
+        manufacturer_data={SNOOZ_MANUFACTURER_ID: b"\x04" + token},
+        service_data={},
+        service_uuids=[SNOOZ_SERVICE_UUID],
+        source=source,
+        device=fake_ble_device(address, name),
+        advertisement=None,
+        connectable=True,
+        time=time.monotonic(),
+        tx_power=None,
+    )
+
+
+def fake_other_service_info(address: str, name: str = "Thermometer") -> BluetoothServiceInfoBleak:
+    """Build an advertisement from some other nearby Bluetooth device."""
+    return BluetoothServiceInfoBleak(
+        name=name,
+        address=address,
+        rssi=-80,
+        manufacturer_data={76: b"\x02\x15" + bytes(21)},
+        service_data={},
+        service_uuids=[],
+        source="local",
+        device=fake_ble_device(address, name),
+        advertisement=None,
+        connectable=False,
+        time=time.monotonic(),
+        tx_power=None,
+    )
+
+
+def fake_config_entry(index: int, options: dict | None = None) -> ConfigEntry:
+    """Build a config entry for a paired fake device."""
+    address = fake_address(index)
+    return ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"Snooz {address.replace(':', '')[-4:]}",
+        data={CONF_ADDRESS: address, CONF_TOKEN: "0011223344556677"},
+        source="user",
+        options=options or {},
+    )
+
+
+class FakeConfigEntries:
+    """The parts of ConfigEntries used by async_setup_entry.
+
+    Platforms are not forwarded, so only the integration's own setup is measured.
+    """
+
+    def __init__(self) -> None:
+        self.entries: list[ConfigEntry] = []
+
+    async def async_forward_entry_setups(
+        self, entry: ConfigEntry, platforms: Iterable[Platform]
+    ) -> None:
+        return None
+
+    def async_entries(self, domain: str | None = None, *args: Any, **kwargs: Any) -> list[ConfigEntry]:
+        return self.entries
+
+
+async def async_create_fake_hass(config_dir: str) -> HomeAssistant:
+    """Create a bare HomeAssistant instance with no integrations loaded."""
+    hass = HomeAssistant(config_dir)
+    hass.config_entries = FakeConfigEntries()
+    return hass
+
+
+@contextmanager
+def fake_bluetooth(
+    discovered: bool = True, radio: FakeRadio | None = None
+) -> Iterator[FakeRadio]:
+    """Answer the bluetooth integration's lookups without any adapters.
+
+    Connections made by pysnooz go to FakeSnoozClients driven by the radio.
+    """
+    radio = radio or FakeRadio()
+
+    def _ble_device_from_address(hass: HomeAssistant, address: str, connectable: bool = True) -> BLEDevice | None:
+        return fake_ble_device(address) if discovered else None
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            patch("custom_components.snooz.async_ble_device_from_address", _ble_device_from_address)
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.device.async_ble_device_from_address", _ble_device_from_address)
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.device.async_last_service_info", return_value=None)
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.device.async_scanner_devices_by_address", return_value=[])
+        )
+        stack.enter_context(
+            patch("pysnooz.device.establish_connection", fake_establish_connection(radio))
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.discovery.async_discovered_service_info", return_value=[])
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.discovery.async_register_callback", return_value=lambda: None)
+        )
+        stack.enter_context(
+            patch("custom_components.snooz.coordinator.async_track_unavailable", return_value=lambda: None)
+        )
+        stack.enter_context(
+            patch(
+                "homeassistant.components.bluetooth.update_coordinator.async_address_present",
+                return_value=discovered,
+            )
+        )
+        for name in ("async_register_callback", "async_track_unavailable"):
+            stack.enter_context(
+                patch(
+                    f"homeassistant.components.bluetooth.update_coordinator.{name}",
+                    return_value=lambda: None,
+                )
+            )
+        stack.enter_context(
+            patch(
+                "homeassistant.components.bluetooth.passive_update_processor.async_register_coordinator_for_restore",
+                return_value=lambda: None,
+            )
+        )
+        yield radio
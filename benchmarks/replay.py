@@ -0,0 +1,275 @@
+"""Replays captured SNOOZ traffic through the integration against fake devices.
+
+run: sets up one config entry per device in a capture written by the
+snooz.start_capture service, then feeds its advertisements through the
+shared dispatcher and its commands straight to each device, at the captured
+pace divided by --speed (0 replays as fast as possible). Captured commands
+were already coalesced, so they skip each device's command queue.
+Captured addresses are mapped to fake devices in order of appearance.
+Reports throughput, sensor state writes, command latency percentiles,
+command results next to the captured ones, how late entries were fed in
+and how long the event loop was blocked.
+
+synthesize: writes a capture with the shape of a busy system, for runs on
+machines that have no capture from a real one.
+
+Usage: python -m benchmarks.replay run CAPTURE [--speed N]
+           [--connect-latency S] [--write-latency S]
+           [--connect-failure-rate P] [--write-failure-rate P]
+       python -m benchmarks.replay synthesize OUT [--devices N]
+           [--seconds N] [--seed N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+from datetime import timedelta
+from typing import Any
+
+from custom_components.snooz.capture import (KIND_ADVERTISEMENT, KIND_COMMAND,
+                                             KIND_RESULT)
+from custom_components.snooz.const import SNOOZ_SERVICE_UUID
+from custom_components.snooz.discovery import async_get_discovery_index
+from homeassistant.components.bluetooth import (BluetoothChange,
+                                                BluetoothServiceInfoBleak)
+from pysnooz.commands import SnoozCommandData, SnoozCommandResultStatus
+
+from benchmarks.fakes import (IDLE_TOKEN, SNOOZ_MANUFACTURER_ID,
+                              EventLoopLagProbe, FakeRadio,
+                              async_create_fake_hass, fake_address,
+                              fake_ble_device, fake_bluetooth)
+from benchmarks.suite import BenchEntry, _percentiles, async_setup_entries
+
+
+def load_capture(path: str) -> list[dict[str, Any]]:
+    """Return the entries of a capture, oldest first."""
+    with open(path, encoding="utf-8") as file:
+        entries = [json.loads(line) for line in file if line.strip()]
+    entries.sort(key=lambda entry: entry["t"])
+    return entries
+
+
+def _service_info(entry: dict[str, Any], address: str) -> BluetoothServiceInfoBleak:
+    return BluetoothServiceInfoBleak(
+        name=entry["name"],
+        address=address,
+        rssi=entry["rssi"],
+        manufacturer_data={
+            int(key): bytes.fromhex(value)
+            for key, value in entry["manufacturer_data"].items()
+        },
+        service_data={
+            key: bytes.fromhex(value) for key, value in entry["service_data"].items()
+        },
+        service_uuids=entry["service_uuids"],
+        source=entry["source"],
+        device=fake_ble_device(address, entry["name"]),
+        advertisement=None,
+        connectable=entry["connectable"],
+        time=time.monotonic(),
+        tx_power=None,
+    )
+
+
+def _command(entry: dict[str, Any]) -> SnoozCommandData:
+    duration = entry["duration"]
+    return SnoozCommandData(
+        on=entry["on"],
+        volume=entry["volume"],
+        duration=timedelta(seconds=duration) if duration is not None else None,
+    )
+
+
+async def async_replay(args: argparse.Namespace) -> None:
+    entries = load_capture(args.capture)
+    addresses: dict[str, str] = {}
+    for entry in entries:
+        addresses.setdefault(entry["address"], fake_address(len(addresses)))
+
+    hass = await async_create_fake_hass(tempfile.mkdtemp())
+    radio = FakeRadio(
+        connect_latency=args.connect_latency,
+        write_latency=args.write_latency,
+        connect_failure_rate=args.connect_failure_rate,
+        write_failure_rate=args.write_failure_rate,
+    )
+
+    with fake_bluetooth(radio=radio):
+        bench_entries = await async_setup_entries(hass, len(addresses), {})
+        by_address = {
+            bench_entry.entry.data["address"]: bench_entry for bench_entry in bench_entries
+        }
+        dispatch = async_get_discovery_index(hass)._async_on_advertisement
+
+        latencies: list[float] = []
+        replayed: Counter[str] = Counter()
+
+        async def _async_timed(bench_entry: BenchEntry, command: SnoozCommandData) -> None:
+            start = time.perf_counter()
+            result = await bench_entry.data.device.async_execute_command(command)
+            latencies.append(time.perf_counter() - start)
+            replayed[result.status.name.lower()] += 1
+
+        probe = EventLoopLagProbe()
+        probe.start()
+        loop = asyncio.get_running_loop()
+        tasks: list[asyncio.Task[None]] = []
+        lateness: list[float] = []
+        adverts = 0
+        start = loop.time()
+
+        for entry in entries:
+            if args.speed > 0:
+                due = start + entry["t"] / args.speed
+                if (delay := due - loop.time()) > 0:
+                    await asyncio.sleep(delay)
+                lateness.append(max(loop.time() - due, 0))
+
+            address = addresses[entry["address"]]
+            if entry["kind"] == KIND_ADVERTISEMENT:
+                adverts += 1
+                dispatch(_service_info(entry, address), BluetoothChange.ADVERTISEMENT)
+            elif entry["kind"] == KIND_COMMAND:
+                tasks.append(
+                    loop.create_task(_async_timed(by_address[address], _command(entry)))
+                )
+
+        feed_elapsed = loop.time() - start
+        await asyncio.gather(*tasks)
+        await hass.async_block_till_done()
+        elapsed = loop.time() - start
+        await probe.async_stop()
+
+        for bench_entry in bench_entries:
+            await bench_entry.data.device.async_disconnect()
+
+    await hass.async_stop(force=True)
+
+    captured = Counter(
+        entry["status"] for entry in entries if entry["kind"] == KIND_RESULT
+    )
+    statuses = [status.name.lower() for status in SnoozCommandResultStatus]
+
+    print(f"{len(addresses)} devices, {len(entries)} entries, speed {args.speed or 'max'}")
+    print(
+        f"  replay:      {elapsed:.2f} s for {entries[-1]['t'] if entries else 0:.2f} s "
+        f"captured, fed in {feed_elapsed:.2f} s"
+    )
+    if feed_elapsed > 0:
+        print(
+            f"  adverts:     {adverts / feed_elapsed:>10.0f} /s, "
+            f"{sum(e.state_writes for e in bench_entries)} state writes"
+        )
+    if latencies:
+        p50, p95, p99 = _percentiles(latencies)
+        print(
+            f"  commands:    p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+            f"p99 {p99 * 1000:.1f} ms, {radio.connects} connects"
+        )
+    print(
+        "  results:     "
+        + ", ".join(f"{status} {replayed[status]} (captured {captured[status]})" for status in statuses)
+    )
+    if lateness:
+        print(f"  lateness:    max {max(lateness) * 1000:.1f} ms behind schedule")
+    print(f"  loop lag:    max {probe.max * 1000:.1f} ms, total {probe.total * 1000:.1f} ms")
+
+
+def synthesize(args: argparse.Namespace) -> None:
+    """Write a capture of devices advertising about once a second.
+
+    Every device gets a volume change now and then, and every few minutes
+    all of them are turned on or off at once, like a bedtime automation.
+    """
+    rng = random.Random(args.seed)
+    entries: list[dict[str, Any]] = []
+
+    for index in range(args.devices):
+        address = fake_address(index)
+        name = f"Snooz-{address.replace(':', '')[-4:]}"
+        rssi = rng.randint(-85, -55)
+        t = rng.random()
+        while t < args.seconds:
+            entries.append(
+                {
+                    "t": round(t, 6),
+                    "kind": KIND_ADVERTISEMENT,
+                    "address": address,
+                    "name": name,
+                    "rssi": rssi + rng.randint(-4, 4),
+                    "source": "local",
+                    "connectable": True,
+                    "manufacturer_data": {
+                        str(SNOOZ_MANUFACTURER_ID): (b"\x04" + IDLE_TOKEN).hex()
+                    },
+                    "service_data": {},
+                    "service_uuids": [SNOOZ_SERVICE_UUID],
+                }
+            )
+            t += rng.uniform(0.8, 1.2)
+
+        t = rng.uniform(0, 60)
+        while t < args.seconds:
+            entries.append(_synthetic_command(t, address, None, rng.randint(10, 100)))
+            t += rng.expovariate(1 / 60)
+
+    for t in range(0, args.seconds, 300):
+        on = t // 300 % 2 == 0
+        entries += [
+            _synthetic_command(t + rng.random() * 0.05, fake_address(index), on, None)
+            for index in range(args.devices)
+        ]
+
+    entries.sort(key=lambda entry: entry["t"])
+    with open(args.out, "w", encoding="utf-8") as file:
+        for entry in entries:
+            file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    print(f"Wrote {len(entries)} entries for {args.devices} devices to {args.out}")
+
+
+def _synthetic_command(
+    t: float, address: str, on: bool | None, volume: int | None
+) -> dict[str, Any]:
+    return {
+        "t": round(t, 6),
+        "kind": KIND_COMMAND,
+        "address": address,
+        "on": on,
+        "volume": volume,
+        "duration": None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run")
+    run.add_argument("capture")
+    run.add_argument("--speed", type=float, default=1.0)
+    run.add_argument("--connect-latency", type=float, default=0.05)
+    run.add_argument("--write-latency", type=float, default=0.01)
+    run.add_argument("--connect-failure-rate", type=float, default=0.0)
+    run.add_argument("--write-failure-rate", type=float, default=0.0)
+
+    synth = commands.add_parser("synthesize")
+    synth.add_argument("out")
+    synth.add_argument("--devices", type=int, default=10)
+    synth.add_argument("--seconds", type=int, default=600)
+    synth.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        asyncio.run(async_replay(args))
+    else:
+        synthesize(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Micro-benchmark for converting advertisements into sensor data updates.
+
+Compares the one-shot conversion the integration used to do for every
+advertisement with the incremental SensorUpdateConverter on a stream of
+advertisements where only the RSSI changes, which is what a SNOOZ sends
+while idle.
+
+Usage: python -m benchmarks.sensor_update [--count N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from collections.abc import Callable
+
+from custom_components.snooz.sensor import (
+    SENSOR_DESCRIPTIONS, SensorUpdateConverter,
+    _device_key_to_bluetooth_entity_key, _sensor_device_info_to_hass)
+from homeassistant.components.bluetooth.passive_update_processor import \
+    PassiveBluetoothDataUpdate
+from pysnooz.advertisement import SnoozAdvertisementData
+from sensor_state_data import SensorUpdate
+
+from benchmarks.fakes import fake_service_info
+
+
+def sensor_update_to_bluetooth_data_update(
+    sensor_update: SensorUpdate,
+) -> PassiveBluetoothDataUpdate:
+    """Convert a whole sensor update, the baseline for SensorUpdateConverter."""
+    return PassiveBluetoothDataUpdate(
+        devices={
+            device_id: _sensor_device_info_to_hass(device_info)
+            for device_id, device_info in sensor_update.devices.items()
+        },
+        entity_descriptions={
+            _device_key_to_bluetooth_entity_key(device_key): SENSOR_DESCRIPTIONS[
+                (description.device_class, description.native_unit_of_measurement)
+            ]
+            for device_key, description in sensor_update.entity_descriptions.items()
+            if description.native_unit_of_measurement
+        },
+        entity_data={
+            _device_key_to_bluetooth_entity_key(device_key): sensor_values.native_value
+            for device_key, sensor_values in sensor_update.entity_values.items()
+        },
+        entity_names={
+            _device_key_to_bluetooth_entity_key(device_key): sensor_values.name
+            for device_key, sensor_values in sensor_update.entity_values.items()
+        },
+    )
+
+
+def _sensor_updates(count: int) -> list[SensorUpdate]:
+    data = SnoozAdvertisementData()
+    return [
+        data.update(fake_service_info(rssi=-60 - (i % 7))) for i in range(count)
+    ]
+
+
+def _measure(
+    convert: Callable[[SensorUpdate], object], updates: list[SensorUpdate]
+) -> tuple[float, int, int]:
+    """Return seconds per update, allocated blocks and bytes per update."""
+    start = time.perf_counter()
+    for update in updates:
+        convert(update)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results = [convert(update) for update in updates]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del results
+
+    count = len(updates)
+    return elapsed / count, blocks // count, size // count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=20000)
+    args = parser.parse_args()
+
+    updates = _sensor_updates(args.count)
+
+    print(f"{'converter':<14}{'us/update':>12}{'blocks':>10}{'bytes':>10}")
+    for name, convert in (
+        ("one-shot", sensor_update_to_bluetooth_data_update),
+        ("incremental", SensorUpdateConverter()),
+    ):
+        seconds, blocks, size = _measure(convert, updates)
+        print(f"{name:<14}{seconds * 1e6:>12.2f}{blocks:>10}{size:>10}")
+
+
+if __name__ == "__main__":
+    main()
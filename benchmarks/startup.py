@@ -0,0 +1,102 @@
+"""Cold-start benchmark for the SNOOZ integration.
+
+imports: runs `python -X importtime` in a fresh interpreter and reports the
+cumulative import time of each integration module, with the Home Assistant
+modules it builds on already loaded so only this integration is counted.
+
+setup: times async_setup_entry for N config entries against fake devices.
+Platforms are not forwarded, so this is the integration's own setup cost.
+
+Usage: python -m benchmarks.startup imports
+       python -m benchmarks.startup setup [--entries N]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import tempfile
+import time
+
+# Home Assistant modules loaded before the integration in a real install
+PRELOADED = [
+    "homeassistant.components.bluetooth",
+    "homeassistant.components.bluetooth.passive_update_processor",
+    "homeassistant.components.diagnostics",
+    "homeassistant.components.fan",
+    "homeassistant.components.sensor",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.restore_state",
+    "homeassistant.helpers.service",
+]
+
+MODULES = [
+    "custom_components.snooz",
+    "custom_components.snooz.config_flow",
+    "custom_components.snooz.fan",
+    "custom_components.snooz.sensor",
+]
+
+
+def measure_imports() -> dict[str, int]:
+    """Return cumulative import time in microseconds of each top-level import."""
+    code = "; ".join(f"import {module}" for module in PRELOADED + MODULES)
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    timings: dict[str, int] = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if (name := name.strip()) in MODULES:
+            timings[name] = int(cumulative)
+
+    return timings
+
+
+async def async_measure_setup(entries: int) -> tuple[float, float]:
+    """Return total and per entry seconds spent in async_setup_entry."""
+    from benchmarks.fakes import (async_create_fake_hass, fake_bluetooth,
+                                  fake_config_entry)
+    from custom_components.snooz import async_setup_entry
+
+    hass = await async_create_fake_hass(tempfile.mkdtemp())
+    config_entries = [fake_config_entry(i) for i in range(entries)]
+    hass.config_entries.entries = config_entries
+
+    with fake_bluetooth():
+        start = time.perf_counter()
+        for entry in config_entries:
+            await async_setup_entry(hass, entry)
+        elapsed = time.perf_counter() - start
+
+    await hass.async_stop(force=True)
+
+    return elapsed, elapsed / entries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    subparsers.add_parser("imports")
+    setup = subparsers.add_parser("setup")
+    setup.add_argument("--entries", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.benchmark == "imports":
+        for module, microseconds in measure_imports().items():
+            print(f"{module:<40}{microseconds / 1000:>10.1f} ms")
+        return
+
+    total, per_entry = asyncio.run(async_measure_setup(args.entries))
+    print(f"{args.entries} entries: {total * 1000:.1f} ms ({per_entry * 1000:.2f} ms per entry)")
+
+
+if __name__ == "__main__":
+    main()
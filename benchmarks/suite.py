@@ -0,0 +1,267 @@
+"""End-to-end benchmarks for the SNOOZ integration against a fake radio.
+
+For each device count, sets up that many config entries with their fan and
+sensor entities against fake devices and a fake Bluetooth stack, then reports:
+
+- advertisement throughput through the coordinator, processor and sensors
+- latency percentiles of fan commands sent to every device at once
+- how long the event loop was blocked while those commands ran
+- memory allocated per config entry, including its entities
+- time for the config flow to list the discovered devices
+
+Connect and write latency and failure rates of the fake radio are configurable,
+so a run can model a congested adapter without any hardware.
+
+Usage: python -m benchmarks.suite [--devices 1 10 100] [--adverts N]
+           [--rounds N] [--connect-latency S] [--write-latency S]
+           [--connect-failure-rate P] [--write-failure-rate P]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import MagicMock, patch
+
+from custom_components.snooz import async_setup_entry
+from custom_components.snooz.config_flow import SnoozConfigFlow
+from custom_components.snooz.const import (CONF_COMMAND_DEBOUNCE,
+                                           DATA_DISCOVERY_INDEX, DOMAIN)
+from custom_components.snooz.discovery import async_get_discovery_index
+from custom_components.snooz.fan import SnoozFan
+from custom_components.snooz.fan import \
+    async_setup_entry as async_setup_fan_entry
+from custom_components.snooz.models import SnoozConfigurationData
+from custom_components.snooz.sensor import \
+    async_setup_entry as async_setup_sensor_entry
+from homeassistant.components.bluetooth import BluetoothChange
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity import Entity
+
+from benchmarks.fakes import (EventLoopLagProbe, FakeRadio,
+                              async_create_fake_hass, attach_entity,
+                              fake_address, fake_bluetooth, fake_config_entry,
+                              fake_other_service_info, fake_service_info)
+
+# other Bluetooth devices heard while the config flow lists SNOOZ devices
+OTHER_DEVICES = 500
+
+
+class BenchEntry:
+    """A set up config entry and the entities of its platforms."""
+
+    def __init__(self, entry: ConfigEntry, data: SnoozConfigurationData) -> None:
+        self.entry = entry
+        self.data = data
+        self.fan: SnoozFan | None = None
+        self.writes: list[list[int]] = []
+
+    @property
+    def state_writes(self) -> int:
+        return sum(writes[0] for writes in self.writes)
+
+    def add_entities(self, hass: HomeAssistant, entities: list[Entity]) -> None:
+        """Stand in for an entity platform's AddEntitiesCallback."""
+        for entity in entities:
+            entity_id = f"{DOMAIN}.{self.entry.entry_id}_{len(self.writes)}"
+            self.writes.append(attach_entity(hass, entity, entity_id))
+            if isinstance(entity, SnoozFan):
+                # skip restoring state, which needs the restore_state storage
+                self.fan = entity
+                entity.async_on_remove(entity._subscribe_to_device_events())
+            else:
+                hass.async_create_task(entity.async_added_to_hass())
+
+
+async def async_setup_entries(
+    hass: HomeAssistant, count: int, options: dict
+) -> list[BenchEntry]:
+    """Set up config entries and their fan and sensor platforms."""
+    config_entries = [fake_config_entry(i, options) for i in range(count)]
+    hass.config_entries.entries = config_entries
+
+    bench_entries = []
+    with patch(
+        "custom_components.snooz.fan.entity_platform.async_get_current_platform",
+        return_value=MagicMock(),
+    ):
+        for entry in config_entries:
+            await async_setup_entry(hass, entry)
+            bench_entry = BenchEntry(entry, hass.data[DOMAIN][entry.entry_id])
+
+            def _add_entities(entities: list[Entity], *args, bench_entry=bench_entry) -> None:
+                bench_entry.add_entities(hass, entities)
+
+            await async_setup_fan_entry(hass, entry, _add_entities)
+            await async_setup_sensor_entry(hass, entry, _add_entities)
+            bench_entries.append(bench_entry)
+
+    await hass.async_block_till_done()
+    return bench_entries
+
+
+async def async_measure_adverts(
+    hass: HomeAssistant, bench_entries: list[BenchEntry], adverts: int
+) -> tuple[float, int]:
+    """Return advertisements handled per second and state writes per 1000.
+
+    Advertisements enter through the shared dispatcher, like the ones the
+    bluetooth integration delivers.
+    """
+    dispatch = async_get_discovery_index(hass)._async_on_advertisement
+
+    # the first advertisement of each device creates its sensor entities
+    for index in range(len(bench_entries)):
+        dispatch(fake_service_info(fake_address(index)), BluetoothChange.ADVERTISEMENT)
+    await hass.async_block_till_done()
+
+    infos = [
+        fake_service_info(fake_address(i % len(bench_entries)), rssi=-60 - (i % 7))
+        for i in range(adverts)
+    ]
+    writes_before = sum(entry.state_writes for entry in bench_entries)
+
+    start = time.perf_counter()
+    for info in infos:
+        dispatch(info, BluetoothChange.ADVERTISEMENT)
+    elapsed = time.perf_counter() - start
+
+    writes = sum(entry.state_writes for entry in bench_entries) - writes_before
+    return adverts / elapsed, writes * 1000 // adverts
+
+
+async def async_measure_commands(
+    bench_entries: list[BenchEntry], rounds: int
+) -> tuple[list[float], int, EventLoopLagProbe]:
+    """Send a command to every fan at once for a number of rounds.
+
+    Returns the latency of every command, how many failed and the loop lag.
+    """
+    latencies: list[float] = []
+
+    async def _async_timed(fan: SnoozFan, volume: int) -> bool:
+        start = time.perf_counter()
+        await fan.async_set_percentage(volume)
+        latencies.append(time.perf_counter() - start)
+        return fan._last_command_successful
+
+    probe = EventLoopLagProbe()
+    probe.start()
+    failed = 0
+    for round_index in range(rounds):
+        volume = 10 + (round_index * 17) % 90
+        results = await asyncio.gather(
+            *(_async_timed(entry.fan, volume) for entry in bench_entries)
+        )
+        failed += results.count(False)
+    await probe.async_stop()
+
+    return latencies, failed, probe
+
+
+def _percentiles(values: list[float]) -> tuple[float, float, float]:
+    if len(values) < 2:
+        return (values[0],) * 3
+    quantiles = statistics.quantiles(values, n=100, method="inclusive")
+    return quantiles[49], quantiles[94], quantiles[98]
+
+
+async def async_measure_config_flow(hass: HomeAssistant, count: int) -> tuple[float, float]:
+    """Return seconds for the user step to list count discovered devices.
+
+    Other Bluetooth devices are heard too, as on a system with proxies. The
+    first time includes starting the discovery index.
+    """
+    infos = [fake_service_info(fake_address(1000 + i)) for i in range(count)]
+    infos += [fake_other_service_info(fake_address(2000 + i)) for i in range(OTHER_DEVICES)]
+
+    async def _async_open_picker() -> float:
+        flow = SnoozConfigFlow()
+        flow.hass = hass
+        flow.handler = DOMAIN
+        flow.flow_id = "benchmark"
+        flow.context = {"source": "user"}
+
+        start = time.perf_counter()
+        await flow.async_step_user()
+        return time.perf_counter() - start
+
+    # set the entries' index aside so the flow starts one from scratch
+    entries_index = hass.data[DOMAIN].pop(DATA_DISCOVERY_INDEX, None)
+
+    with patch(
+        "custom_components.snooz.discovery.async_discovered_service_info",
+        return_value=infos,
+    ), patch(
+        "custom_components.snooz.discovery.async_register_callback",
+        return_value=lambda: None,
+    ):
+        timings = await _async_open_picker(), await _async_open_picker()
+
+    hass.data[DOMAIN].pop(DATA_DISCOVERY_INDEX).async_stop()
+    if entries_index is not None:
+        hass.data[DOMAIN][DATA_DISCOVERY_INDEX] = entries_index
+    return timings
+
+
+async def async_run(devices: int, args: argparse.Namespace) -> None:
+    hass = await async_create_fake_hass(tempfile.mkdtemp())
+    radio = FakeRadio(
+        connect_latency=args.connect_latency,
+        write_latency=args.write_latency,
+        connect_failure_rate=args.connect_failure_rate,
+        write_failure_rate=args.write_failure_rate,
+    )
+    options = {CONF_COMMAND_DEBOUNCE: args.debounce}
+
+    with fake_bluetooth(radio=radio):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        bench_entries = await async_setup_entries(hass, devices, options)
+        memory = (tracemalloc.get_traced_memory()[0] - before) / devices
+        tracemalloc.stop()
+
+        throughput, writes = await async_measure_adverts(hass, bench_entries, args.adverts)
+        latencies, failed, probe = await async_measure_commands(bench_entries, args.rounds)
+        flow_cold, flow_warm = await async_measure_config_flow(hass, devices)
+
+        for bench_entry in bench_entries:
+            await bench_entry.data.device.async_disconnect()
+
+    await hass.async_stop(force=True)
+
+    p50, p95, p99 = _percentiles(latencies)
+    print(f"{devices} devices")
+    print(f"  adverts:     {throughput:>10.0f} /s, {writes} state writes per 1000")
+    print(
+        f"  commands:    p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+        f"p99 {p99 * 1000:.1f} ms, {failed}/{len(latencies)} failed, "
+        f"{radio.connects} connects"
+    )
+    print(f"  loop lag:    max {probe.max * 1000:.1f} ms, total {probe.total * 1000:.1f} ms")
+    print(f"  memory:      {memory / 1024:.1f} KiB per entry")
+    print(f"  config flow: {flow_cold * 1000:.2f} ms first, {flow_warm * 1000:.2f} ms after")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--adverts", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--debounce", type=float, default=0.0)
+    parser.add_argument("--connect-latency", type=float, default=0.05)
+    parser.add_argument("--write-latency", type=float, default=0.01)
+    parser.add_argument("--connect-failure-rate", type=float, default=0.0)
+    parser.add_argument("--write-failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    for devices in args.devices:
+        asyncio.run(async_run(devices, args))
+
+
+if __name__ == "__main__":
+    main()
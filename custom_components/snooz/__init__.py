@@ -3,18 +3,42 @@ from __future__ import annotations
 
 import logging
 
-from custom_components.snooz.const import DOMAIN
+from custom_components.snooz.batcher import SnoozStateWriteBatcher
+from custom_components.snooz.capture import SnoozTrafficCapture
+from custom_components.snooz.coalescer import SnoozCommandCoalescer
+from custom_components.snooz.const import (CONF_COMMAND_DEBOUNCE,
+                                           CONF_LAZY_SETUP,
+                                           CONF_OFFLINE_INTENT_EXPIRY,
+                                           CONF_STATE_WRITE_WINDOW,
+                                           CONF_TRANSITION_EASING,
+                                           CONF_TRANSITION_INTERVAL,
+                                           CONF_TRANSITION_STEP,
+                                           CONNECTION_SLOT_TIMEOUT,
+                                           DATA_CAPTURE,
+                                           DATA_CONNECTION_SCHEDULER,
+                                           DATA_DISCOVERY_INDEX,
+                                           DEFAULT_COMMAND_DEBOUNCE,
+                                           DEFAULT_LAZY_SETUP,
+                                           DEFAULT_OFFLINE_INTENT_EXPIRY,
+                                           DEFAULT_STATE_WRITE_WINDOW,
+                                           DEFAULT_TRANSITION_EASING,
+                                           DEFAULT_TRANSITION_INTERVAL,
+                                           DEFAULT_TRANSITION_STEP, DOMAIN,
+                                           MAX_CONNECTIONS_PER_SCANNER)
+from custom_components.snooz.coordinator import SnoozProcessorCoordinator
+from custom_components.snooz.device import ManagedSnoozDevice
+from custom_components.snooz.intents import SnoozIntentBuffer
 from custom_components.snooz.models import SnoozConfigurationData
+from custom_components.snooz.scheduler import SnoozConnectionScheduler
+from custom_components.snooz.services import (async_setup_services,
+                                              async_unload_services)
+from custom_components.snooz.transition import SnoozTransitionEngine
 from homeassistant.components.bluetooth import (BluetoothScanningMode,
                                                 async_ble_device_from_address)
-from homeassistant.components.bluetooth.passive_update_processor import \
-    PassiveBluetoothProcessorCoordinator
-from homeassistant.config_entries import ConfigEntry
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
 from homeassistant.const import CONF_ADDRESS, CONF_TOKEN, Platform
 from homeassistant.core import HomeAssistant
 from homeassistant.exceptions import ConfigEntryNotReady
-from pysnooz.device import SnoozDevice
-from pysnooz.advertisement import SnoozAdvertisementData
 
 PLATFORMS: list[Platform] = [Platform.FAN, Platform.SENSOR]
 
@@ -29,33 +53,102 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     token = entry.data.get(CONF_TOKEN)
     assert token
 
-    if not (ble_device := async_ble_device_from_address(hass, address.upper())):
+    ble_device = async_ble_device_from_address(hass, address.upper())
+    lazy = entry.options.get(CONF_LAZY_SETUP, DEFAULT_LAZY_SETUP)
+
+    if not ble_device and not lazy:
         raise ConfigEntryNotReady(
             f"Could not find SNOOZ with address {address}. Try power cycling the device."
         )
 
-    data = SnoozAdvertisementData()
-    coordinator = PassiveBluetoothProcessorCoordinator(
-        hass, _LOGGER, address=address, mode=BluetoothScanningMode.ACTIVE, update_method=data.update
+    coordinator = SnoozProcessorCoordinator(
+        hass, _LOGGER, address=address, mode=BluetoothScanningMode.ACTIVE
     )
     
-    device = SnoozDevice(ble_device, token, hass.loop)
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if DATA_CONNECTION_SCHEDULER not in domain_data:
+        domain_data[DATA_CONNECTION_SCHEDULER] = SnoozConnectionScheduler(
+            hass.loop, MAX_CONNECTIONS_PER_SCANNER, CONNECTION_SLOT_TIMEOUT
+        )
+    if DATA_CAPTURE not in domain_data:
+        domain_data[DATA_CAPTURE] = SnoozTrafficCapture(hass)
+    capture: SnoozTrafficCapture = domain_data[DATA_CAPTURE]
+
+    device = ManagedSnoozDevice(
+        hass,
+        address,
+        entry.title,
+        ble_device,
+        token,
+        domain_data[DATA_CONNECTION_SCHEDULER],
+        capture,
+    )
+    transitions = SnoozTransitionEngine(
+        device,
+        hass.loop,
+        entry.options.get(CONF_TRANSITION_STEP, DEFAULT_TRANSITION_STEP),
+        entry.options.get(CONF_TRANSITION_INTERVAL, DEFAULT_TRANSITION_INTERVAL),
+        entry.options.get(CONF_TRANSITION_EASING, DEFAULT_TRANSITION_EASING),
+    )
+    offline_intent_expiry = entry.options.get(
+        CONF_OFFLINE_INTENT_EXPIRY, DEFAULT_OFFLINE_INTENT_EXPIRY
+    )
+    commands = SnoozCommandCoalescer(
+        device,
+        hass.loop,
+        entry.options.get(CONF_COMMAND_DEBOUNCE, DEFAULT_COMMAND_DEBOUNCE),
+        transitions,
+        device.metrics,
+        SnoozIntentBuffer(offline_intent_expiry) if offline_intent_expiry > 0 else None,
+    )
 
-    hass.data.setdefault(DOMAIN, {})[
-        entry.entry_id
-    ] = SnoozConfigurationData(ble_device, device, coordinator)
+    writes = SnoozStateWriteBatcher(
+        hass.loop,
+        entry.options.get(CONF_STATE_WRITE_WINDOW, DEFAULT_STATE_WRITE_WINDOW),
+    )
+
+    domain_data[entry.entry_id] = SnoozConfigurationData(ble_device, device, coordinator, commands, writes)
+
+    async_setup_services(hass)
 
     await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
     entry.async_on_unload(coordinator.async_start())
+    entry.async_on_unload(
+        coordinator.async_add_advertisement_listener(capture.async_record_advertisement)
+    )
+    entry.async_on_unload(
+        coordinator.async_add_advertisement_listener(device.record_advertisement)
+    )
+    # after the device, so the circuit is closed before held commands are sent
+    entry.async_on_unload(
+        coordinator.async_add_advertisement_listener(commands.async_on_advertisement)
+    )
+    entry.async_on_unload(commands.async_stop)
+    entry.async_on_unload(writes.async_cancel)
+    entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
     return True
 
 
+async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Reload the config entry when its options change."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
     if unload_ok := await hass.config_entries.async_unload_platforms(entry, PLATFORMS):
         hass.data[DOMAIN].pop(entry.entry_id)
-        if not hass.config_entries.async_entries(DOMAIN):
-            hass.data.pop(DOMAIN)
+        # the entry being unloaded is still listed, and still loaded
+        if not any(
+            other.state is ConfigEntryState.LOADED and other.entry_id != entry.entry_id
+            for other in hass.config_entries.async_entries(DOMAIN)
+        ):
+            domain_data = hass.data.pop(DOMAIN)
+            if discovery_index := domain_data.get(DATA_DISCOVERY_INDEX):
+                discovery_index.async_stop()
+            if capture := domain_data.get(DATA_CAPTURE):
+                await capture.async_stop()
+            async_unload_services(hass)
 
     return unload_ok
@@ -0,0 +1,56 @@
+"""Batches state writes of the entities that share a SNOOZ device."""
+from __future__ import annotations
+
+from asyncio import AbstractEventLoop, Handle
+
+from homeassistant.helpers.entity import Entity
+
+
+class SnoozStateWriteBatcher:
+    """Writes each entity's state at most once per burst of device events.
+
+    A single device event (like a connection status change) updates several
+    entities, and connections often change status several times in quick
+    succession. Writes requested within the window, or within the same event
+    loop iteration when the window is 0, are collapsed into one per entity.
+    """
+
+    def __init__(self, loop: AbstractEventLoop, window: float) -> None:
+        self._loop = loop
+        self._window = window
+        # dict rather than set so entities are written in the order they asked
+        self._pending: dict[Entity, None] = {}
+        self._flush_handle: Handle | None = None
+        self.collapsed_writes = 0
+
+    def async_schedule(self, entity: Entity) -> None:
+        """Write the entity's state once the current burst is over."""
+        if entity in self._pending:
+            self.collapsed_writes += 1
+            return
+
+        self._pending[entity] = None
+
+        if self._flush_handle is None:
+            self._flush_handle = (
+                self._loop.call_later(self._window, self._flush)
+                if self._window > 0
+                else self._loop.call_soon(self._flush)
+            )
+
+    def async_discard(self, entity: Entity) -> None:
+        """Forget a pending write, for an entity being removed."""
+        self._pending.pop(entity, None)
+
+    def async_cancel(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+
+        for entity in pending:
+            entity.async_write_ha_state()
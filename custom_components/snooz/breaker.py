@@ -0,0 +1,127 @@
+"""Stops connecting to SNOOZ devices that are known to be unreachable."""
+from __future__ import annotations
+
+import random
+from collections.abc import Callable
+from enum import Enum
+
+from custom_components.snooz.listeners import ChangeNotifier
+
+
+class CircuitState(Enum):
+    """Whether commands are sent to the device."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class SnoozCircuitBreaker(ChangeNotifier):
+    """Fails commands fast while a device can't be reached.
+
+    A command that couldn't connect opens the circuit. Once the backoff has
+    passed, the next command is let through as a single trial, and other
+    commands fail right away until it resolves; if the trial fails too, the
+    backoff doubles up to the maximum. Jitter keeps devices that became
+    unreachable together, like after a power cut, from retrying in lockstep.
+    Only a successful connection closes the circuit. The first connectable
+    advertisement after the circuit opened lets a trial through right away,
+    without resetting the backoff.
+    """
+
+    __slots__ = (
+        "_base_delay",
+        "_max_delay",
+        "_jitter",
+        "_random",
+        "state",
+        "failures",
+        "rejected",
+        "retry_at",
+        "_trial_in_flight",
+        "_advertisement_trial_used",
+    )
+
+    def __init__(
+        self,
+        base_delay: float,
+        max_delay: float,
+        jitter: float,
+        random_fn: Callable[[], float] = random.random,
+    ) -> None:
+        super().__init__()
+        self._base_delay = base_delay
+        self._max_delay = max_delay
+        self._jitter = jitter
+        self._random = random_fn
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.rejected = 0
+        self.retry_at: float | None = None
+        self._trial_in_flight = False
+        # only one early trial per outage, so adverts can't bypass the backoff
+        self._advertisement_trial_used = False
+
+    def is_open(self, now: float) -> bool:
+        """Return True if commands would fail right away."""
+        if self.state == CircuitState.HALF_OPEN:
+            return self._trial_in_flight
+
+        return (
+            self.state == CircuitState.OPEN
+            and self.retry_at is not None
+            and now < self.retry_at
+        )
+
+    def allow(self, now: float) -> bool:
+        """Return True if a command may try to reach the device.
+
+        A command let through while the circuit isn't closed is the trial,
+        and must be ended with record_success, record_failure or end_trial.
+        """
+        if self.state == CircuitState.CLOSED:
+            return True
+
+        if not self.is_open(now):
+            self._trial_in_flight = True
+            self._set_state(CircuitState.HALF_OPEN)
+            return True
+
+        self.rejected += 1
+        return False
+
+    def end_trial(self) -> None:
+        """Let another trial through, for a trial that neither failed nor connected."""
+        self._trial_in_flight = False
+
+    def record_advertisement(self, now: float) -> None:
+        """Let a trial through now, once per outage, since the device is in range."""
+        if self.state != CircuitState.OPEN or self._advertisement_trial_used:
+            return
+
+        self._advertisement_trial_used = True
+        if self.retry_at is not None and self.retry_at > now:
+            self.retry_at = now
+            self._notify()
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        delay = min(self._max_delay, self._base_delay * 2 ** (self.failures - 1))
+        delay -= delay * self._jitter * self._random()
+        self.retry_at = now + delay
+        self._trial_in_flight = False
+        self._set_state(CircuitState.OPEN)
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.retry_at = None
+        self._trial_in_flight = False
+        self._advertisement_trial_used = False
+        self._set_state(CircuitState.CLOSED)
+
+    def _set_state(self, state: CircuitState) -> None:
+        changed = state != self.state
+        self.state = state
+        # a failed trial re-opens with a new retry time, which listeners show
+        if changed or state == CircuitState.OPEN:
+            self._notify()
@@ -0,0 +1,194 @@
+"""Records advertisements and commands of SNOOZ devices for replay."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import IO, Any
+
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import CALLBACK_TYPE, Event, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+from pysnooz.commands import SnoozCommandData, SnoozCommandResult
+
+_LOGGER = logging.getLogger(__name__)
+
+# seconds between writes of recorded entries to the capture file
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+# entries held in memory while waiting for a write, newer ones are dropped
+CAPTURE_MAX_BUFFERED = 10000
+
+KIND_ADVERTISEMENT = "advertisement"
+KIND_COMMAND = "command"
+KIND_RESULT = "result"
+
+
+class SnoozTrafficCapture:
+    """Writes advertisements, commands and results to a JSON lines file.
+
+    Each line is one entry with a kind and the seconds since the capture
+    started. Results carry the id of their command. Entries are written from
+    the executor in batches, so recording doesn't block the event loop, and
+    recording costs a single check while no capture is running. A capture
+    still running when Home Assistant stops is written and closed.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        self._hass = hass
+        self._file: IO[str] | None = None
+        self._started = 0.0
+        self._buffer: list[str] = []
+        self._command_ids = itertools.count(1)
+        self._flush_unsub: CALLBACK_TYPE | None = None
+        self._stop_unsub: CALLBACK_TYPE | None = None
+        self._write_lock = asyncio.Lock()
+        self.path: str | None = None
+        self.recorded = 0
+        self.dropped = 0
+
+    @property
+    def is_recording(self) -> bool:
+        return self._file is not None
+
+    async def async_start(self, path: str) -> None:
+        """Start recording to path, replacing what it holds."""
+        await self.async_stop()
+        self._file = await self._hass.async_add_executor_job(_open_capture, path)
+        self._started = time.monotonic()
+        self.path = path
+        self.recorded = 0
+        self.dropped = 0
+        self._stop_unsub = self._hass.bus.async_listen_once(
+            EVENT_HOMEASSISTANT_STOP, self._async_on_hass_stop
+        )
+        _LOGGER.info("Capturing SNOOZ traffic to %s", path)
+
+    async def async_stop(self) -> None:
+        """Write what is buffered and close the capture file."""
+        if self._file is None:
+            return
+
+        file, self._file = self._file, None
+        if self._flush_unsub is not None:
+            self._flush_unsub()
+            self._flush_unsub = None
+        if self._stop_unsub is not None:
+            self._stop_unsub()
+            self._stop_unsub = None
+
+        lines, self._buffer = self._buffer, []
+        async with self._write_lock:
+            await self._hass.async_add_executor_job(_write_and_close, file, lines)
+        _LOGGER.info(
+            "Captured %s SNOOZ entries to %s, %s dropped", self.recorded, self.path, self.dropped
+        )
+
+    async def _async_on_hass_stop(self, _event: Event) -> None:
+        # the listener is gone once it has fired
+        self._stop_unsub = None
+        await self.async_stop()
+
+    @callback
+    def async_record_advertisement(self, service_info: BluetoothServiceInfoBleak) -> None:
+        if self._file is None:
+            return
+
+        self._record(
+            {
+                "kind": KIND_ADVERTISEMENT,
+                "address": service_info.address,
+                "name": service_info.name,
+                "rssi": service_info.rssi,
+                "source": service_info.source,
+                "connectable": service_info.connectable,
+                "manufacturer_data": {
+                    str(key): value.hex()
+                    for key, value in service_info.manufacturer_data.items()
+                },
+                "service_data": {
+                    key: value.hex() for key, value in service_info.service_data.items()
+                },
+                "service_uuids": service_info.service_uuids,
+            }
+        )
+
+    @callback
+    def async_record_command(self, address: str, command: SnoozCommandData) -> int | None:
+        """Record a command; returns the id to record its result with."""
+        if self._file is None:
+            return None
+
+        command_id = next(self._command_ids)
+        self._record(
+            {
+                "kind": KIND_COMMAND,
+                "address": address,
+                "id": command_id,
+                "on": command.on,
+                "volume": command.volume,
+                "duration": (
+                    command.duration.total_seconds() if command.duration is not None else None
+                ),
+            }
+        )
+        return command_id
+
+    @callback
+    def async_record_result(
+        self, address: str, command_id: int | None, result: SnoozCommandResult, latency: float
+    ) -> None:
+        if self._file is None or command_id is None:
+            return
+
+        self._record(
+            {
+                "kind": KIND_RESULT,
+                "address": address,
+                "id": command_id,
+                "status": result.status.name.lower(),
+                "latency": round(latency, 6),
+            }
+        )
+
+    def _record(self, entry: dict[str, Any]) -> None:
+        if len(self._buffer) >= CAPTURE_MAX_BUFFERED:
+            self.dropped += 1
+            return
+
+        entry["t"] = round(time.monotonic() - self._started, 6)
+        self._buffer.append(json.dumps(entry, separators=(",", ":")))
+        self.recorded += 1
+
+        if self._flush_unsub is None:
+            self._flush_unsub = async_call_later(
+                self._hass, CAPTURE_FLUSH_INTERVAL, self._async_flush
+            )
+
+    async def _async_flush(self, _now: Any) -> None:
+        self._flush_unsub = None
+        async with self._write_lock:
+            # stopping writes whatever is buffered itself
+            if self._file is None or not self._buffer:
+                return
+
+            lines, self._buffer = self._buffer, []
+            await self._hass.async_add_executor_job(_write, self._file, lines)
+
+
+def _open_capture(path: str) -> IO[str]:
+    return open(path, "w", encoding="utf-8")
+
+
+def _write(file: IO[str], lines: list[str]) -> None:
+    file.write("\n".join(lines) + "\n")
+    file.flush()
+
+
+def _write_and_close(file: IO[str], lines: list[str]) -> None:
+    if lines:
+        _write(file, lines)
+    file.close()
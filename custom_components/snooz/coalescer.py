@@ -0,0 +1,338 @@
+"""Per-device queue that prioritizes and coalesces SNOOZ commands."""
+from __future__ import annotations
+
+import asyncio
+import time
+from asyncio import AbstractEventLoop, Future, TimerHandle
+from datetime import timedelta
+
+from custom_components.snooz.device import ManagedSnoozDevice
+from custom_components.snooz.intents import (SnoozCommandPending,
+                                             SnoozIntentBuffer)
+from custom_components.snooz.listeners import ChangeNotifier
+from custom_components.snooz.metrics import SnoozDeviceMetrics
+from custom_components.snooz.scheduler import (ConnectionPriority,
+                                               command_priority)
+from custom_components.snooz.transition import SnoozTransitionEngine
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus)
+
+
+class SnoozCommandSuperseded(SnoozCommandResult):
+    """Result of a command whose every change was overwritten by a newer one."""
+
+    def __init__(self) -> None:
+        super().__init__(SnoozCommandResultStatus.CANCELLED, timedelta())
+
+
+class SnoozCommandCoalescer(ChangeNotifier):
+    """Sends only the newest intent from a burst of commands to a device.
+
+    An immediate command (power or volume) is written right away when nothing
+    was sent within the debounce window. Commands that arrive within the
+    window, or while a write is running, are merged, newest value wins, and
+    written once the window ends. Callers that were merged share the result
+    of that write, except those whose every change was overwritten by a
+    newer command, which return as superseded as soon as that happens.
+    Transitions are never merged; they drop whatever is pending and are
+    handed to the transition engine, which any later command pre-empts.
+
+    Commands are prioritized like connections: turning off skips the debounce
+    window so it reaches the device right away, and disconnecting drops
+    everything that is queued or running.
+
+    With an intent buffer, commands for a device that can't be reached are
+    held and return right away as pending. The held intent is sent once the
+    device advertises again. Listeners are notified when a held intent
+    settles: it was sent, it expired or it was dropped.
+    """
+
+    def __init__(
+        self,
+        device: ManagedSnoozDevice,
+        loop: AbstractEventLoop,
+        debounce: float,
+        transitions: SnoozTransitionEngine,
+        metrics: SnoozDeviceMetrics,
+        intents: SnoozIntentBuffer | None = None,
+    ) -> None:
+        super().__init__()
+        self._device = device
+        self._loop = loop
+        self._debounce = debounce
+        self._transitions = transitions
+        self._metrics = metrics
+        self._intents = intents
+        self._pending: SnoozCommandData | None = None
+        self._pending_callers: list[
+            tuple[SnoozCommandData, Future[SnoozCommandResult]]
+        ] = []
+        self._pending_since = 0.0
+        self._flush_handle: TimerHandle | None = None
+        self._sending = 0
+        self._window_ends = 0.0
+        self._waiting = 0
+        self._expiry_handle: TimerHandle | None = None
+        self.dropped_commands = 0
+        self.replayed_intents = 0
+        # what the last held intent settled with, None if it was never sent
+        self.intent_result: SnoozCommandResult | None = None
+
+    @property
+    def debounce(self) -> float:
+        return self._debounce
+
+    @property
+    def intents(self) -> SnoozIntentBuffer | None:
+        return self._intents
+
+    @property
+    def has_pending_intent(self) -> bool:
+        """Return True if a command is held until the device is back in range."""
+        return self._intents is not None and self._intents.has_intent(time.monotonic())
+
+    async def async_execute_command(
+        self, command: SnoozCommandData, easing: str | None = None
+    ) -> SnoozCommandResult:
+        """Queue a command and wait for the write it ends up in."""
+        self._waiting += 1
+        self._metrics.record_queue_depth(self._waiting)
+        try:
+            issued_at = time.monotonic()
+            if self._intents is not None and self._device.breaker.is_open(issued_at):
+                self.async_cancel()
+                return self._hold(command, issued_at)
+
+            if command.duration is not None:
+                self.async_cancel()
+                result = await self._transitions.async_run(command, easing)
+            else:
+                result = await self._async_enqueue(command)
+
+            return self._hold_if_unavailable(command, issued_at, result)
+        finally:
+            self._waiting -= 1
+            self._metrics.record_queue_depth(self._waiting)
+
+    async def async_disconnect(self) -> None:
+        """Drop everything queued, held or running, then disconnect."""
+        self.async_cancel()
+        self._drop_intent(None)
+        await self._device.async_disconnect()
+
+    def async_stop(self) -> None:
+        """Drop the pending command and stop watching the held intent."""
+        self.async_cancel()
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+            self._expiry_handle = None
+
+    def async_cancel(self) -> None:
+        """Drop the pending command and stop any transition."""
+        self._cancel_transition()
+
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._pending is not None:
+            self.dropped_commands += 1
+
+        for _, result in self._pending_callers:
+            if not result.done():
+                result.set_result(
+                    SnoozCommandResult(SnoozCommandResultStatus.CANCELLED, timedelta())
+                )
+
+        self._pending = None
+        self._pending_callers = []
+
+    def async_on_advertisement(self, service_info: BluetoothServiceInfoBleak) -> None:
+        """Send the held intent now that the device is in range again.
+
+        The intent waits while the breaker would fail it, so a device that
+        advertises but won't connect is only retried at the breaker's pace.
+        """
+        if (
+            self._intents is None
+            or self._intents.expires_at is None
+            or not service_info.connectable
+            or self._device.breaker.is_open(time.monotonic())
+        ):
+            return
+
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+            self._expiry_handle = None
+
+        if (held := self._intents.take(time.monotonic())) is None:
+            self._settle(None)
+            return
+
+        command, issued_at = held
+        self.replayed_intents += 1
+        self._loop.create_task(
+            self._async_replay(command, issued_at), name=f"[Replay] {command}"
+        )
+
+    async def _async_replay(self, command: SnoozCommandData, issued_at: float) -> None:
+        result = await self._async_enqueue(command)
+        result = self._hold_if_unavailable(command, issued_at, result)
+        if not isinstance(result, SnoozCommandPending):
+            self._settle(result)
+
+    def _hold(self, command: SnoozCommandData, issued_at: float) -> SnoozCommandPending:
+        self._intents.add(command, issued_at)
+        self._schedule_expiry()
+        return SnoozCommandPending()
+
+    def _schedule_expiry(self) -> None:
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+
+        self._expiry_handle = self._loop.call_later(
+            max(0.0, self._intents.expires_at - time.monotonic()), self._expire_intent
+        )
+
+    def _expire_intent(self) -> None:
+        self._expiry_handle = None
+        if self._intents.expire(time.monotonic()):
+            self._settle(None)
+        elif self._intents.expires_at is not None:
+            self._schedule_expiry()
+
+    def _drop_intent(self, result: SnoozCommandResult | None) -> None:
+        if self._intents is None or self._intents.expires_at is None:
+            return
+
+        self._intents.clear()
+        if self._expiry_handle is not None:
+            self._expiry_handle.cancel()
+            self._expiry_handle = None
+        self._settle(result)
+
+    def _settle(self, result: SnoozCommandResult | None) -> None:
+        self.intent_result = result
+        self._notify()
+
+    def _hold_if_unavailable(
+        self, command: SnoozCommandData, issued_at: float, result: SnoozCommandResult
+    ) -> SnoozCommandResult:
+        if self._intents is None or isinstance(result, SnoozCommandPending):
+            return result
+
+        if result.status == SnoozCommandResultStatus.SUCCESSFUL:
+            # whatever reached the device is newer than anything held
+            self._drop_intent(result)
+        elif result.status == SnoozCommandResultStatus.DEVICE_UNAVAILABLE:
+            return self._hold(command, issued_at)
+
+        return result
+
+    async def _async_enqueue(self, command: SnoozCommandData) -> SnoozCommandResult:
+        self._cancel_transition()
+        result: Future[SnoozCommandResult] = self._loop.create_future()
+
+        if self._pending is None:
+            self._pending = command
+            self._pending_since = self._loop.time()
+        else:
+            self.dropped_commands += 1
+            self._pending = _merge_commands(self._pending, command)
+            self._resolve_superseded(command)
+        self._pending_callers.append((command, result))
+
+        if command_priority(command) == ConnectionPriority.HIGH:
+            # turning off shouldn't wait for the rest of the burst
+            self._schedule_flush(immediately=True)
+        elif self._flush_handle is None and not self._sending:
+            self._schedule_flush()
+
+        # shield so a cancelled caller doesn't cancel the write for everyone else
+        return await asyncio.shield(result)
+
+    def _resolve_superseded(self, newer: SnoozCommandData) -> None:
+        """Return early to callers that have nothing left in the merged command."""
+        callers = []
+        for command, result in self._pending_callers:
+            if _is_superseded(command, newer):
+                if not result.done():
+                    result.set_result(SnoozCommandSuperseded())
+            else:
+                callers.append((command, result))
+        self._pending_callers = callers
+
+    def _schedule_flush(self, immediately: bool = False) -> None:
+        if self._flush_handle is not None:
+            if not immediately:
+                return
+            self._flush_handle.cancel()
+
+        now = self._loop.time()
+        if immediately or now >= self._window_ends:
+            self._flush_handle = self._loop.call_soon(self._flush)
+        else:
+            self._flush_handle = self._loop.call_at(self._window_ends, self._flush)
+
+    def _cancel_transition(self) -> None:
+        if self._transitions.is_running:
+            self._metrics.record_superseded_transition()
+        self._transitions.async_cancel()
+
+    def _flush(self) -> None:
+        command, callers = self._pending, self._pending_callers
+        self._flush_handle = None
+        self._pending = None
+        self._pending_callers = []
+
+        if command is None:
+            return
+
+        now = self._loop.time()
+        self._metrics.record_queue_wait(now - self._pending_since)
+        self._window_ends = now + self._debounce
+        self._sending += 1
+
+        self._loop.create_task(
+            self._async_send(command, callers), name=f"[Send] {command}"
+        )
+
+    async def _async_send(
+        self,
+        command: SnoozCommandData,
+        callers: list[tuple[SnoozCommandData, Future[SnoozCommandResult]]],
+    ) -> None:
+        try:
+            command_result = await self._device.async_execute_command(command)
+        except Exception as ex:  # pylint: disable=broad-except
+            for _, result in callers:
+                if not result.done():
+                    result.set_exception(ex)
+            return
+        finally:
+            self._sending -= 1
+            # whatever arrived during the write goes out once the window ends
+            if self._pending is not None and not self._sending:
+                self._schedule_flush()
+
+        for _, result in callers:
+            if not result.done():
+                result.set_result(command_result)
+
+
+def _is_superseded(command: SnoozCommandData, newer: SnoozCommandData) -> bool:
+    """Return True if every change in command is overwritten by newer."""
+    return (command.on is None or newer.on is not None) and (
+        command.volume is None or newer.volume is not None
+    )
+
+
+def _merge_commands(
+    pending: SnoozCommandData, newer: SnoozCommandData
+) -> SnoozCommandData:
+    """Fold a newer immediate command into a pending one, newest value wins."""
+    return SnoozCommandData(
+        on=newer.on if newer.on is not None else pending.on,
+        volume=newer.volume if newer.volume is not None else pending.volume,
+    )
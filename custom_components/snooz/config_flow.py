@@ -5,26 +5,59 @@ import asyncio
 from typing import Any
 
 import voluptuous as vol
-from custom_components.snooz.const import DOMAIN
-from homeassistant.components.bluetooth import (BluetoothScanningMode,
+from custom_components.snooz.const import (CONF_COMMAND_DEBOUNCE,
+                                           CONF_CONNECTING_THRESHOLD,
+                                           CONF_LAZY_SETUP,
+                                           CONF_OFFLINE_INTENT_EXPIRY,
+                                           CONF_OPTIMISTIC,
+                                           CONF_RSSI_MIN_INTERVAL,
+                                           CONF_RSSI_SMOOTHING,
+                                           CONF_RSSI_THRESHOLD,
+                                           CONF_STATE_WRITE_WINDOW,
+                                           CONF_TRANSITION_EASING,
+                                           CONF_TRANSITION_INTERVAL,
+                                           CONF_TRANSITION_STEP,
+                                           DEFAULT_COMMAND_DEBOUNCE,
+                                           DEFAULT_CONNECTING_THRESHOLD,
+                                           DEFAULT_LAZY_SETUP,
+                                           DEFAULT_OFFLINE_INTENT_EXPIRY,
+                                           DEFAULT_OPTIMISTIC,
+                                           DEFAULT_RSSI_MIN_INTERVAL,
+                                           DEFAULT_RSSI_SMOOTHING,
+                                           DEFAULT_RSSI_THRESHOLD,
+                                           DEFAULT_STATE_WRITE_WINDOW,
+                                           DEFAULT_TRANSITION_EASING,
+                                           DEFAULT_TRANSITION_INTERVAL,
+                                           DEFAULT_TRANSITION_STEP, DOMAIN,
+                                           EASINGS,
+                                           RSSI_SMOOTHING_MEAN,
+                                           RSSI_SMOOTHING_MEDIAN,
+                                           RSSI_SMOOTHING_NONE,
+                                           SNOOZ_LOCAL_NAME_PREFIX)
+from custom_components.snooz.discovery import (DeviceDiscovery,
+                                               async_get_discovery_index,
+                                               async_release_discovery_index)
+from homeassistant.components.bluetooth import (BluetoothCallbackMatcher,
+                                                BluetoothChange,
+                                                BluetoothScanningMode,
                                                 BluetoothServiceInfo,
-                                                async_discovered_service_info,
-                                                async_process_advertisements)
-from homeassistant.config_entries import ConfigFlow
-from homeassistant.const import CONF_ADDRESS, CONF_NAME, CONF_TOKEN
-from homeassistant.data_entry_flow import FlowResult
-from pysnooz.advertisement import SnoozAdvertisementData, get_snooz_display_name
+                                                async_process_advertisements,
+                                                async_register_callback)
+from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
+from homeassistant.const import (CONF_ADDRESS, CONF_DEVICES, CONF_NAME,
+                                 CONF_TOKEN)
+from homeassistant.core import callback
+from homeassistant.data_entry_flow import (FlowResult, FlowResultType,
+                                           UnknownFlow)
+from homeassistant.helpers import config_validation as cv
+from pysnooz.advertisement import SnoozAdvertisementData
 
 # number of seconds to wait for a device to be put in pairing mode
 WAIT_FOR_PAIRING_TIMEOUT = 30
-
-class DeviceDiscovery:
-    info: BluetoothServiceInfo
-    device: SnoozAdvertisementData
-
-    def __init__(self, info: BluetoothServiceInfo, device: SnoozAdvertisementData):
-        self.info = info
-        self.device = device
+# number of seconds to wait for all devices selected in bulk to be put in pairing mode
+WAIT_FOR_BULK_PAIRING_TIMEOUT = 5 * 60
+# flow source of the entries created for devices paired in bulk
+SOURCE_BULK = "bulk"
 
 class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
     """Handle a config flow for SNOOZ."""
@@ -36,6 +69,22 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
         self._discovery: DeviceDiscovery = None
         self._discovered_devices: dict[str, DeviceDiscovery] = {}
         self._pairing_task: asyncio.Task | None = None
+        self._bulk_pending: dict[str, DeviceDiscovery] = {}
+        self._bulk_selected = 0
+        self._bulk_created = 0
+
+    @callback
+    def async_remove(self) -> None:
+        """Stop waiting for pairing and release the discovery index."""
+        if self._pairing_task:
+            self._pairing_task.cancel()
+        async_release_discovery_index(self.hass)
+
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Get the options flow for this handler."""
+        return SnoozOptionsFlow(config_entry)
 
     async def async_step_bluetooth(
         self, discovery_info: BluetoothServiceInfo
@@ -62,7 +111,7 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
             return self.create_snooz_entry(self._discovery)
 
         self._set_confirm_only()
-        placeholders = {"name": get_snooz_display_name(self._discovery.device.title, self._discovery.info.address)}
+        placeholders = {"name": self._discovery.name}
         self.context["title_placeholders"] = placeholders
         return self.async_show_form(
             step_id="bluetooth_confirm", description_placeholders=placeholders
@@ -71,7 +120,27 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
-        """Handle the user step to pick discovered device."""
+        """Handle the user step to find discovered devices."""
+        configured_addresses = self._async_current_ids()
+
+        for discovery in async_get_discovery_index(self.hass).async_discovered():
+            if discovery.info.address not in configured_addresses:
+                self._discovered_devices[discovery.name] = discovery
+
+        if not self._discovered_devices:
+            return self.async_abort(reason="no_devices_found")
+
+        if len(self._discovered_devices) == 1:
+            return await self.async_step_pick_device()
+
+        return self.async_show_menu(
+            step_id="user", menu_options=["pick_device", "bulk_select"]
+        )
+
+    async def async_step_pick_device(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle the step to pick one discovered device."""
         if user_input is not None:
             name = user_input[CONF_NAME]
 
@@ -85,26 +154,79 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
             await self.async_set_unique_id(address, raise_on_progress=False)
             return self.create_snooz_entry(discovered)
 
-        configured_addresses = self._async_current_ids()
-
-        for info in async_discovered_service_info(self.hass):
-            address = info.address
-            if address in configured_addresses:
-                continue
-            device = SnoozAdvertisementData()
-            if device.supported(info):
-                self._discovered_devices[get_snooz_display_name(device.title, info.address)] = DeviceDiscovery(info, device)
+        return self.async_show_form(
+            step_id="pick_device",
+            data_schema=vol.Schema(
+                {vol.Required(CONF_NAME): vol.In(list(self._discovered_devices))}
+            ),
+        )
 
-        if not self._discovered_devices:
-            return self.async_abort(reason="no_devices_found")
+    async def async_step_bulk_select(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Handle the step to pick any number of discovered devices."""
+        if user_input is not None:
+            self._bulk_pending = {
+                self._discovered_devices[name].info.address: self._discovered_devices[name]
+                for name in user_input[CONF_DEVICES]
+            }
+            self._bulk_selected = len(self._bulk_pending)
+            return await self.async_step_wait_for_bulk_pairing()
 
         return self.async_show_form(
-            step_id="user",
+            step_id="bulk_select",
             data_schema=vol.Schema(
-                {vol.Required(CONF_NAME): vol.In([get_snooz_display_name(d.device.title, d.info.address) for d in self._discovered_devices.values()])}
+                {
+                    vol.Required(CONF_DEVICES): cv.multi_select(
+                        {name: name for name in self._discovered_devices}
+                    )
+                }
             ),
         )
 
+    async def async_step_wait_for_bulk_pairing(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Wait for every selected device to enter pairing mode."""
+        if not self._pairing_task:
+            self._pairing_task = self.hass.async_create_task(self._async_wait_for_bulk_pairing())
+            return self.async_show_progress(
+                step_id="wait_for_bulk_pairing",
+                progress_action="wait_for_bulk_pairing",
+                description_placeholders={"selected": str(self._bulk_selected)},
+            )
+
+        try:
+            await self._pairing_task
+        except asyncio.TimeoutError:
+            pass
+
+        self._pairing_task = None
+
+        return self.async_show_progress_done(next_step_id="bulk_complete")
+
+    async def async_step_bulk_complete(self, user_input: dict[str, Any] | None = None) -> FlowResult:
+        """Report which of the selected devices were added."""
+        missed = ", ".join(sorted(d.name for d in self._bulk_pending.values()))
+        return self.async_abort(
+            reason="bulk_pairing_complete",
+            description_placeholders={
+                "paired": str(self._bulk_created),
+                "selected": str(self._bulk_selected),
+                "missed": missed or "none",
+            },
+        )
+
+    async def async_step_bulk(self, bulk_data: dict[str, Any]) -> FlowResult:
+        """Create an entry for a device paired in bulk."""
+        await self.async_set_unique_id(bulk_data[CONF_ADDRESS], raise_on_progress=False)
+        self._abort_if_unique_id_configured()
+
+        return self.async_create_entry(
+            title=bulk_data[CONF_NAME],
+            data={CONF_ADDRESS: bulk_data[CONF_ADDRESS], CONF_TOKEN: bulk_data[CONF_TOKEN]},
+        )
+
     async def async_step_wait_for_pairing_mode(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
@@ -141,7 +263,7 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
 
     def create_snooz_entry(self, discovery: DeviceDiscovery) -> FlowResult:
         return self.async_create_entry(
-            title=get_snooz_display_name(discovery.device.title, discovery.info.address), 
+            title=discovery.name,
             data={CONF_ADDRESS: discovery.info.address, CONF_TOKEN: discovery.device.pairing_token}
         )
 
@@ -164,6 +286,149 @@ class SnoozConfigFlow(ConfigFlow, domain=DOMAIN):
                 WAIT_FOR_PAIRING_TIMEOUT,
             )
         finally:
-            self.hass.async_create_task(
-                self.hass.config_entries.flow.async_configure(flow_id=self.flow_id)
+            self.hass.async_create_task(self._async_resume_flow())
+
+    async def _async_wait_for_bulk_pairing(self) -> None:
+        """Add each selected device as soon as it enters pairing mode.
+
+        A single advertisement callback serves every selected device, so
+        they can be put in pairing mode in any order.
+        """
+        all_paired = asyncio.Event()
+        entry_tasks: list[asyncio.Task[None]] = []
+
+        @callback
+        def _async_on_advertisement(
+            service_info: BluetoothServiceInfo, change: BluetoothChange
+        ) -> None:
+            if (discovery := self._bulk_pending.get(service_info.address)) is None:
+                return
+
+            device = discovery.device
+            if not device.supported(service_info) or not device.is_pairing:
+                return
+
+            del self._bulk_pending[service_info.address]
+            entry_tasks.append(
+                self.hass.async_create_task(
+                    self._async_create_bulk_entry(
+                        {
+                            CONF_ADDRESS: service_info.address,
+                            CONF_NAME: discovery.name,
+                            CONF_TOKEN: device.pairing_token,
+                        }
+                    )
+                )
             )
+
+            if not self._bulk_pending:
+                all_paired.set()
+
+        cancel_callback = async_register_callback(
+            self.hass,
+            _async_on_advertisement,
+            BluetoothCallbackMatcher(local_name=f"{SNOOZ_LOCAL_NAME_PREFIX}*"),
+            BluetoothScanningMode.ACTIVE,
+        )
+
+        try:
+            # devices that were already in pairing mode when discovered
+            for discovery in list(self._bulk_pending.values()):
+                _async_on_advertisement(discovery.info, BluetoothChange.ADVERTISEMENT)
+
+            if self._bulk_pending:
+                await asyncio.wait_for(all_paired.wait(), WAIT_FOR_BULK_PAIRING_TIMEOUT)
+        finally:
+            cancel_callback()
+            # so the summary only counts entries that were actually created
+            if entry_tasks:
+                await asyncio.gather(*entry_tasks)
+            self.hass.async_create_task(self._async_resume_flow())
+
+    async def _async_resume_flow(self) -> None:
+        """Move on to the step after the wait, unless the flow is gone."""
+        try:
+            await self.hass.config_entries.flow.async_configure(flow_id=self.flow_id)
+        except UnknownFlow:
+            # the flow was aborted or closed while waiting
+            pass
+
+    async def _async_create_bulk_entry(self, data: dict[str, Any]) -> None:
+        result = await self.hass.config_entries.flow.async_init(
+            DOMAIN, context={"source": SOURCE_BULK}, data=data
+        )
+        if result["type"] == FlowResultType.CREATE_ENTRY:
+            self._bulk_created += 1
+
+
+class SnoozOptionsFlow(OptionsFlow):
+    """Handle options for a SNOOZ device."""
+
+    def __init__(self, config_entry: ConfigEntry) -> None:
+        """Initialize the options flow."""
+        self.config_entry = config_entry
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Manage the device options."""
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+
+        options = self.config_entry.options
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                {
+                    vol.Optional(
+                        CONF_COMMAND_DEBOUNCE,
+                        default=options.get(CONF_COMMAND_DEBOUNCE, DEFAULT_COMMAND_DEBOUNCE),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                    vol.Optional(
+                        CONF_RSSI_MIN_INTERVAL,
+                        default=options.get(CONF_RSSI_MIN_INTERVAL, DEFAULT_RSSI_MIN_INTERVAL),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=3600)),
+                    vol.Optional(
+                        CONF_RSSI_THRESHOLD,
+                        default=options.get(CONF_RSSI_THRESHOLD, DEFAULT_RSSI_THRESHOLD),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=50)),
+                    vol.Optional(
+                        CONF_RSSI_SMOOTHING,
+                        default=options.get(CONF_RSSI_SMOOTHING, DEFAULT_RSSI_SMOOTHING),
+                    ): vol.In([RSSI_SMOOTHING_NONE, RSSI_SMOOTHING_MEAN, RSSI_SMOOTHING_MEDIAN]),
+                    vol.Optional(
+                        CONF_TRANSITION_STEP,
+                        default=options.get(CONF_TRANSITION_STEP, DEFAULT_TRANSITION_STEP),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=1, max=50)),
+                    vol.Optional(
+                        CONF_TRANSITION_INTERVAL,
+                        default=options.get(CONF_TRANSITION_INTERVAL, DEFAULT_TRANSITION_INTERVAL),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0.5, max=60)),
+                    vol.Optional(
+                        CONF_TRANSITION_EASING,
+                        default=options.get(CONF_TRANSITION_EASING, DEFAULT_TRANSITION_EASING),
+                    ): vol.In(EASINGS),
+                    vol.Optional(
+                        CONF_LAZY_SETUP,
+                        default=options.get(CONF_LAZY_SETUP, DEFAULT_LAZY_SETUP),
+                    ): bool,
+                    vol.Optional(
+                        CONF_OPTIMISTIC,
+                        default=options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC),
+                    ): bool,
+                    vol.Optional(
+                        CONF_STATE_WRITE_WINDOW,
+                        default=options.get(CONF_STATE_WRITE_WINDOW, DEFAULT_STATE_WRITE_WINDOW),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=5)),
+                    vol.Optional(
+                        CONF_CONNECTING_THRESHOLD,
+                        default=options.get(CONF_CONNECTING_THRESHOLD, DEFAULT_CONNECTING_THRESHOLD),
+                    ): vol.All(vol.Coerce(float), vol.Range(min=0, max=30)),
+                    vol.Optional(
+                        CONF_OFFLINE_INTENT_EXPIRY,
+                        default=options.get(CONF_OFFLINE_INTENT_EXPIRY, DEFAULT_OFFLINE_INTENT_EXPIRY),
+                    ): vol.All(vol.Coerce(int), vol.Range(min=0, max=24*60*60)),
+                }
+            ),
+        )
@@ -1,3 +1,134 @@
 """Constants for the SNOOZ Noise Maker integration."""
 
 DOMAIN = "snooz"
+
+# seconds to wait for newer commands before writing the latest one to the device
+CONF_COMMAND_DEBOUNCE = "command_debounce"
+DEFAULT_COMMAND_DEBOUNCE = 0.25
+
+# key in hass.data[DOMAIN] holding the connection scheduler shared by all entries
+DATA_CONNECTION_SCHEDULER = "connection_scheduler"
+
+# number of simultaneous connections allowed through a single adapter or proxy
+MAX_CONNECTIONS_PER_SCANNER = 3
+
+# number of seconds to wait in line for a connection slot before giving up
+CONNECTION_SLOT_TIMEOUT = 30
+
+ATTR_TRANSITION = "transition"
+ATTR_VOLUME = "volume"
+
+SERVICE_GROUP_COMMAND = "group_command"
+
+SERVICE_SNAPSHOT = "snapshot"
+SERVICE_RESTORE = "restore"
+SERVICE_START_CAPTURE = "start_capture"
+SERVICE_STOP_CAPTURE = "stop_capture"
+
+# file in the config directory that traffic is captured to by default
+DEFAULT_CAPTURE_FILENAME = "snooz_capture.jsonl"
+
+# fired once a group command has finished on every targeted device
+EVENT_GROUP_COMMAND_COMPLETE = "snooz_group_command_complete"
+
+# fired once a snapshot has been restored on every device in it
+EVENT_RESTORE_COMPLETE = "snooz_restore_complete"
+
+# key in hass.data holding the saved snapshots by id, outside hass.data[DOMAIN]
+# so they outlive unloading every entry
+DATA_SNAPSHOTS = f"{DOMAIN}_snapshots"
+
+# key in hass.data[DOMAIN] holding the traffic capture shared by all entries
+DATA_CAPTURE = "capture"
+
+# number of devices a group command runs on at the same time
+DEFAULT_GROUP_CONCURRENCY = 5
+
+# number of seconds each device in a group command has to finish,
+# in addition to the length of any transition
+DEFAULT_GROUP_TIMEOUT = 30
+
+# minimum number of seconds between signal strength state writes
+CONF_RSSI_MIN_INTERVAL = "rssi_min_interval"
+DEFAULT_RSSI_MIN_INTERVAL = 30
+
+# minimum change in dBm before a new signal strength is written
+CONF_RSSI_THRESHOLD = "rssi_threshold"
+DEFAULT_RSSI_THRESHOLD = 2
+
+# how recent signal strength readings are combined before being written
+CONF_RSSI_SMOOTHING = "rssi_smoothing"
+RSSI_SMOOTHING_NONE = "none"
+RSSI_SMOOTHING_MEAN = "mean"
+RSSI_SMOOTHING_MEDIAN = "median"
+DEFAULT_RSSI_SMOOTHING = RSSI_SMOOTHING_MEDIAN
+
+# number of readings used to smooth the signal strength
+RSSI_SMOOTHING_WINDOW = 5
+
+ATTR_EASING = "easing"
+
+# minimum volume change in percent before a transition writes a new volume
+CONF_TRANSITION_STEP = "transition_step"
+DEFAULT_TRANSITION_STEP = 1
+
+# minimum number of seconds between volume writes during a transition
+CONF_TRANSITION_INTERVAL = "transition_interval"
+DEFAULT_TRANSITION_INTERVAL = 2
+
+# curve that volume follows over the course of a transition
+CONF_TRANSITION_EASING = "transition_easing"
+EASING_LINEAR = "linear"
+EASING_EXPONENTIAL = "exponential"
+EASING_LOG = "log"
+EASINGS = [EASING_LINEAR, EASING_EXPONENTIAL, EASING_LOG]
+DEFAULT_TRANSITION_EASING = EASING_LINEAR
+
+# set up entities right away, even if the device hasn't been discovered yet
+CONF_LAZY_SETUP = "lazy_setup"
+DEFAULT_LAZY_SETUP = False
+
+# service advertised by every SNOOZ, matches the manifest's bluetooth matcher
+SNOOZ_SERVICE_UUID = "729f0608-496a-47fe-a124-3a62aaa3fbc0"
+
+# prefix of the local name advertised by every SNOOZ
+SNOOZ_LOCAL_NAME_PREFIX = "Snooz"
+
+# key in hass.data[DOMAIN] holding the index of discovered devices
+DATA_DISCOVERY_INDEX = "discovery_index"
+
+# number of seconds a discovered device is listed after its last advertisement
+DISCOVERY_TTL = 15 * 60
+
+# show the intended fan state right away instead of waiting for the device
+CONF_OPTIMISTIC = "optimistic"
+DEFAULT_OPTIMISTIC = False
+
+# seconds to collect device events before writing the state of its entities,
+# 0 writes once at the end of the current event loop iteration
+CONF_STATE_WRITE_WINDOW = "state_write_window"
+DEFAULT_STATE_WRITE_WINDOW = 0
+
+# seconds a connection has to be connecting before the status sensor shows it,
+# 0 shows every connection attempt
+CONF_CONNECTING_THRESHOLD = "connecting_threshold"
+DEFAULT_CONNECTING_THRESHOLD = 0
+
+# seconds after its last advertisement that a scanner is no longer a connection candidate
+CONNECTION_SOURCE_STALE_AFTER = 120
+
+# seconds a scanner that failed to connect is only used if no other scanner hears the device
+CONNECTION_SOURCE_FAILURE_COOLDOWN = 60
+
+# seconds before the first retry of a device that couldn't be reached,
+# doubled after every failed retry up to the maximum
+CIRCUIT_BACKOFF_BASE = 5
+CIRCUIT_BACKOFF_MAX = 300
+
+# fraction of a backoff that is randomly taken off so devices don't retry in lockstep
+CIRCUIT_BACKOFF_JITTER = 0.2
+
+# seconds a command for an unreachable device is held and sent once the device
+# advertises again, 0 fails the command instead
+CONF_OFFLINE_INTENT_EXPIRY = "offline_intent_expiry"
+DEFAULT_OFFLINE_INTENT_EXPIRY = 0
@@ -0,0 +1,132 @@
+"""Advertisement processing for SNOOZ devices."""
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from typing import Hashable
+
+from custom_components.snooz.discovery import (advertisement_fingerprint,
+                                               async_get_discovery_index)
+from homeassistant.components.bluetooth import (BluetoothChange,
+                                                BluetoothScanningMode,
+                                                BluetoothServiceInfoBleak,
+                                                async_track_unavailable)
+from homeassistant.components.bluetooth.passive_update_processor import \
+    PassiveBluetoothProcessorCoordinator
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from pysnooz.advertisement import SnoozAdvertisementData
+from sensor_state_data import SensorUpdate
+
+
+class AdvertisementStats:
+    """Counts what happened to the advertisements received for a device."""
+
+    __slots__ = ("received", "skipped", "rssi_only", "parsed")
+
+    def __init__(self) -> None:
+        # every advertisement delivered by the bluetooth integration
+        self.received = 0
+        # identical to the previous advertisement, never parsed or dispatched
+        self.skipped = 0
+        # same payload with a new RSSI, only the signal strength was updated
+        self.rssi_only = 0
+        # new payload, fully parsed
+        self.parsed = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class SnoozAdvertisementParser(SnoozAdvertisementData):
+    """SnoozAdvertisementData that only re-parses payloads that changed.
+
+    The public update() still runs for every advertisement, so events are
+    cleared and the signal strength is updated as usual; only the
+    _start_update() hook that pysnooz implements is skipped.
+    """
+
+    def __init__(self, stats: AdvertisementStats) -> None:
+        super().__init__()
+        self._stats = stats
+        self._fingerprint: Hashable | None = None
+
+    def _start_update(self, data: BluetoothServiceInfoBleak) -> None:
+        fingerprint = advertisement_fingerprint(data)
+
+        if fingerprint == self._fingerprint:
+            # payload is unchanged so only the signal strength can differ
+            self._stats.rssi_only += 1
+            return
+
+        self._fingerprint = fingerprint
+        self._stats.parsed += 1
+        super()._start_update(data)
+
+
+class SnoozProcessorCoordinator(PassiveBluetoothProcessorCoordinator[SensorUpdate]):
+    """Processor coordinator that drops advertisements identical to the last one."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        logger: logging.Logger,
+        address: str,
+        mode: BluetoothScanningMode,
+    ) -> None:
+        self.stats = AdvertisementStats()
+        self.parser = SnoozAdvertisementParser(self.stats)
+        super().__init__(
+            hass, logger, address=address, mode=mode, update_method=self.parser.update
+        )
+        self._last_fingerprint: Hashable | None = None
+        self._advertisement_listeners: list[Callable[[BluetoothServiceInfoBleak], None]] = []
+
+    @callback
+    def async_add_advertisement_listener(
+        self, listener: Callable[[BluetoothServiceInfoBleak], None]
+    ) -> CALLBACK_TYPE:
+        """Call listener with every advertisement, including skipped ones."""
+        self._advertisement_listeners.append(listener)
+
+        @callback
+        def _async_remove() -> None:
+            self._advertisement_listeners.remove(listener)
+
+        return _async_remove
+
+    @callback
+    def _async_handle_bluetooth_event(
+        self,
+        service_info: BluetoothServiceInfoBleak,
+        change: BluetoothChange,
+    ) -> None:
+        self.stats.received += 1
+        for listener in self._advertisement_listeners:
+            listener(service_info)
+
+        fingerprint = (advertisement_fingerprint(service_info), service_info.rssi)
+
+        # an unavailable device always goes through so availability is restored
+        if self.available and fingerprint == self._last_fingerprint:
+            self.stats.skipped += 1
+            return
+
+        self._last_fingerprint = fingerprint
+        super()._async_handle_bluetooth_event(service_info, change)
+
+    @callback
+    def _async_start(self) -> None:
+        """Receive advertisements through the integration's shared dispatcher."""
+        self._on_stop.append(
+            async_get_discovery_index(self.hass).async_register_address(
+                self.address, self._async_handle_bluetooth_event
+            )
+        )
+        self._on_stop.append(
+            async_track_unavailable(
+                self.hass,
+                self._async_handle_unavailable,
+                self.address,
+                self.connectable,
+            )
+        )
@@ -0,0 +1,262 @@
+"""SNOOZ device that cooperates with the rest of the integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import TYPE_CHECKING
+
+from bleak.backends.device import BLEDevice
+from bleak_retry_connector import BleakAbortedError, BleakNotFoundError
+from custom_components.snooz.breaker import CircuitState, SnoozCircuitBreaker
+from custom_components.snooz.capture import SnoozTrafficCapture
+from custom_components.snooz.const import (
+    CIRCUIT_BACKOFF_BASE, CIRCUIT_BACKOFF_JITTER, CIRCUIT_BACKOFF_MAX,
+    CONNECTION_SOURCE_FAILURE_COOLDOWN, CONNECTION_SOURCE_STALE_AFTER)
+from custom_components.snooz.metrics import SnoozDeviceMetrics
+from custom_components.snooz.scheduler import (ConnectionPriority,
+                                               SnoozConnectionScheduler,
+                                               command_priority)
+from custom_components.snooz.sources import ConnectionSourceSelector
+from homeassistant.components.bluetooth import (
+    BluetoothServiceInfoBleak, async_ble_device_from_address,
+    async_last_service_info, async_scanner_devices_by_address)
+from homeassistant.core import HomeAssistant
+from pysnooz.api import SnoozDeviceApi
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus)
+from pysnooz.device import SnoozConnectionStatus, SnoozDevice
+
+if TYPE_CHECKING:
+    from transitions import EventData
+
+# transitions logging is pretty verbose, so only enable warnings/errors
+logging.getLogger("transitions.core").setLevel(logging.WARNING)
+
+# scanner name used when the advertisement source is unknown
+DEFAULT_SOURCE = "local"
+
+
+class ConnectionSlotTimeout(BleakAbortedError):
+    """No connection slot freed up on the scanner in time.
+
+    pysnooz treats it like any other unreachable device and retries, but the
+    device itself may be fine, so it doesn't count against the breaker.
+    """
+
+
+class ManagedSnoozDevice(SnoozDevice):
+    """SnoozDevice that waits for a shared connection slot before connecting.
+
+    The BLEDevice may be unknown when the device is created; it is then
+    resolved from the first advertisement routed to the entry, or right
+    before the first connect.
+    Each connect goes through the scanner that hears the device best, moving
+    on to the next best after a failure. Commands fail right away while the
+    circuit breaker considers the device unreachable.
+    """
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        address: str,
+        name: str,
+        ble_device: BLEDevice | None,
+        token: str,
+        scheduler: SnoozConnectionScheduler,
+        capture: SnoozTrafficCapture | None = None,
+    ) -> None:
+        super().__init__(ble_device, token, hass.loop)
+        self._hass = hass
+        self._address = address.upper()
+        self._name = name
+        self._scheduler = scheduler
+        self._capture = capture
+        self._slot_source: str | None = None
+        self._priority = ConnectionPriority.NORMAL
+        self._slot_ticket: int | None = None
+        # the last connect of the command never got a slot
+        self._slot_starved = False
+        self._executing_commands = 0
+        self.metrics = SnoozDeviceMetrics()
+        self.sources = ConnectionSourceSelector(
+            CONNECTION_SOURCE_STALE_AFTER, CONNECTION_SOURCE_FAILURE_COOLDOWN
+        )
+        self.breaker = SnoozCircuitBreaker(
+            CIRCUIT_BACKOFF_BASE, CIRCUIT_BACKOFF_MAX, CIRCUIT_BACKOFF_JITTER
+        )
+
+        self.events.on_connection_status_change += self._on_slot_connection_status_change
+        self.events.on_connection_load_time += self._on_connection_load_time
+
+    @property
+    def name(self) -> str:
+        if self._device is not None and self._device.name:
+            return self._device.name
+        return self._name
+
+    @property
+    def address(self) -> str:
+        if self._device is not None:
+            return self._device.address
+        return self._address
+
+    @property
+    def ble_device(self) -> BLEDevice | None:
+        return self._device
+
+    def record_advertisement(self, service_info: BluetoothServiceInfoBleak) -> None:
+        """Track how well the scanner that heard an advertisement hears the device."""
+        if self._device is None and service_info.connectable:
+            # set up before the device was heard, connect through this one
+            self._device = service_info.device
+        now = time.monotonic()
+        self.sources.record(service_info.source, service_info.device, service_info.rssi, now)
+        if service_info.connectable:
+            # in range again; the circuit only closes once a connection succeeds
+            self.breaker.record_advertisement(now)
+
+    @property
+    def is_idle(self) -> bool:
+        """Return True if no command is using the connection."""
+        return self._executing_commands == 0
+
+    async def async_execute_command(self, data: SnoozCommandData) -> SnoozCommandResult:
+        command_id = (
+            self._capture.async_record_command(self.address, data)
+            if self._capture is not None
+            else None
+        )
+        start = time.monotonic()
+        if not self.breaker.allow(start):
+            result = SnoozCommandResult(SnoozCommandResultStatus.DEVICE_UNAVAILABLE, timedelta())
+            self._record_result(command_id, result, start)
+            return result
+
+        # let through while the circuit wasn't closed, so this is the trial
+        trial = self.breaker.state != CircuitState.CLOSED
+        self._priority = command_priority(data)
+        # reconnects of this command keep the place of its first slot request
+        self._slot_ticket = None
+        self._slot_starved = False
+        self._executing_commands += 1
+        try:
+            result = await super().async_execute_command(data)
+            self.metrics.record_command(time.monotonic() - start, result.status)
+            if (
+                result.status == SnoozCommandResultStatus.DEVICE_UNAVAILABLE
+                and not self._slot_starved
+            ):
+                self.breaker.record_failure(time.monotonic())
+            self._record_result(command_id, result, start)
+            return result
+        finally:
+            if trial:
+                self.breaker.end_trial()
+            self._executing_commands -= 1
+            if self.is_idle and self._slot_source is not None:
+                self._scheduler.async_holder_idle(self._slot_source, self)
+
+    def _record_result(
+        self, command_id: int | None, result: SnoozCommandResult, start: float
+    ) -> None:
+        if self._capture is not None:
+            self._capture.async_record_result(
+                self.address, command_id, result, time.monotonic() - start
+            )
+
+    async def _async_create_api(self) -> SnoozDeviceApi:
+        # the advertisement stream only carries the preferred scanner's
+        # advertisements, so also look at what every other scanner last heard
+        now = time.monotonic()
+        for scanner_device in async_scanner_devices_by_address(
+            self._hass, self.address, connectable=True
+        ):
+            self.sources.record(
+                scanner_device.scanner.source,
+                scanner_device.ble_device,
+                scanner_device.advertisement.rssi,
+                now,
+            )
+
+        if best := self.sources.best(now):
+            self._device = best.ble_device
+            source = best.source
+        else:
+            if self._device is None:
+                if not (ble_device := async_ble_device_from_address(
+                    self._hass, self._address, connectable=True
+                )):
+                    raise BleakNotFoundError(f"{self._name} has not been discovered yet")
+                self._device = ble_device
+
+            source = self._connection_source()
+
+        if self._slot_ticket is None:
+            self._slot_ticket = self._scheduler.next_ticket()
+
+        start = time.monotonic()
+        try:
+            await self._scheduler.async_acquire(
+                source, self, self._priority, self._slot_ticket
+            )
+        except asyncio.TimeoutError as ex:
+            self._slot_starved = True
+            self.metrics.record_slot_timeout()
+            raise ConnectionSlotTimeout(
+                f"No connection slot became available on {source}"
+            ) from ex
+        finally:
+            self.metrics.record_slot_wait(time.monotonic() - start)
+
+        self._slot_starved = False
+        self._slot_source = source
+
+        try:
+            api = await super()._async_create_api()
+        except BaseException:
+            self.sources.record_failure(source, time.monotonic())
+            self._release_slot()
+            raise
+
+        self.sources.record_success(source)
+        return api
+
+    def _connection_source(self) -> str:
+        if service_info := async_last_service_info(
+            self._hass, self.address, connectable=True
+        ):
+            return service_info.source
+
+        details = self._device.details
+        if isinstance(details, dict) and (source := details.get("source")):
+            return source
+
+        return DEFAULT_SOURCE
+
+    def _release_slot(self) -> None:
+        if self._slot_source is None:
+            return
+
+        source, self._slot_source = self._slot_source, None
+        self._scheduler.release(source, self)
+
+    def _on_connection_start(self, e: EventData) -> None:
+        super()._on_connection_start(e)
+        if self._connection_attempts > 1:
+            self.metrics.record_connection_retry()
+
+    def _after_device_disconnected(self, e: EventData) -> None:
+        super()._after_device_disconnected(e)
+        if (reason := e.kwargs.get("reason")) is not None:
+            self.metrics.record_disconnect(reason)
+
+    def _on_connection_load_time(self, load_time: timedelta) -> None:
+        self.metrics.record_connect(load_time.total_seconds())
+
+    def _on_slot_connection_status_change(self, new_status: SnoozConnectionStatus) -> None:
+        if new_status == SnoozConnectionStatus.DISCONNECTED:
+            self._release_slot()
+        elif new_status == SnoozConnectionStatus.CONNECTED:
+            self.breaker.record_success()
@@ -0,0 +1,45 @@
+"""Diagnostics support for SNOOZ."""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from custom_components.snooz.const import DOMAIN
+from custom_components.snooz.models import SnoozConfigurationData
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_TOKEN
+from homeassistant.core import HomeAssistant
+
+TO_REDACT = {CONF_TOKEN}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    data: SnoozConfigurationData = hass.data[DOMAIN][entry.entry_id]
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "device": {
+            "connection_status": data.device.connection_status.name.lower(),
+            "state": repr(data.device.state),
+            "connection_sources": data.device.sources.as_dict(time.monotonic()),
+        },
+        "advertisements": data.coordinator.stats.as_dict(),
+        "commands": {
+            "coalesced": data.commands.dropped_commands,
+            "replayed_intents": data.commands.replayed_intents,
+            "expired_intents": (
+                data.commands.intents.expired if data.commands.intents is not None else 0
+            ),
+        },
+        "metrics": data.device.metrics.as_dict(),
+        "circuit": {
+            "state": data.device.breaker.state.value,
+            "consecutive_failures": data.device.breaker.failures,
+            "rejected_commands": data.device.breaker.rejected,
+        },
+        "state_writes": {"collapsed": data.writes.collapsed_writes},
+    }
@@ -0,0 +1,172 @@
+"""Index and dispatcher for advertisements from SNOOZ devices."""
+from __future__ import annotations
+
+import time
+from collections.abc import Callable, Hashable
+
+from custom_components.snooz.const import (DATA_DISCOVERY_INDEX,
+                                           DISCOVERY_TTL, DOMAIN,
+                                           SNOOZ_LOCAL_NAME_PREFIX,
+                                           SNOOZ_SERVICE_UUID)
+from homeassistant.components.bluetooth import (BluetoothCallbackMatcher,
+                                                BluetoothChange,
+                                                BluetoothScanningMode,
+                                                BluetoothServiceInfo,
+                                                async_discovered_service_info,
+                                                async_register_callback)
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from pysnooz.advertisement import SnoozAdvertisementData, get_snooz_display_name
+
+
+AdvertisementCallback = Callable[[BluetoothServiceInfo, BluetoothChange], None]
+
+
+def advertisement_fingerprint(service_info: BluetoothServiceInfo) -> Hashable:
+    """Return a cheap, comparable summary of an advertisement's payload."""
+    return (
+        service_info.name,
+        tuple(service_info.manufacturer_data.items()),
+        tuple(service_info.service_data.items()),
+    )
+
+
+class DeviceDiscovery:
+    """A supported advertisement and the data parsed from it."""
+
+    __slots__ = ("info", "device", "name", "fingerprint", "last_seen")
+
+    def __init__(self, info: BluetoothServiceInfo, device: SnoozAdvertisementData):
+        self.info = info
+        self.device = device
+        self.name = get_snooz_display_name(device.title, info.address)
+        self.fingerprint: Hashable | None = None
+        self.last_seen = time.monotonic()
+
+
+def is_snooz_advertisement(service_info: BluetoothServiceInfo) -> bool:
+    """Cheaply rule out advertisements that can't be from a SNOOZ."""
+    return (
+        service_info.name.startswith(SNOOZ_LOCAL_NAME_PREFIX)
+        or SNOOZ_SERVICE_UUID in service_info.service_uuids
+    )
+
+
+class SnoozDiscoveryIndex:
+    """Supported SNOOZ advertisements seen recently, keyed by address.
+
+    A single Bluetooth callback serves the whole integration. Advertisements
+    from configured devices are routed to their entry by address; the rest
+    are indexed for the config flow and only parsed when their payload
+    changes, so listing devices doesn't scan everything the bluetooth
+    integration has seen.
+    """
+
+    def __init__(self, hass: HomeAssistant, ttl: float) -> None:
+        self._hass = hass
+        self._ttl = ttl
+        self._devices: dict[str, DeviceDiscovery] = {}
+        self._routes: dict[str, AdvertisementCallback] = {}
+        self._unsubscribes: list[CALLBACK_TYPE] = []
+
+    @callback
+    def async_start(self) -> None:
+        for service_info in async_discovered_service_info(self._hass):
+            if is_snooz_advertisement(service_info):
+                self._async_on_advertisement(service_info, BluetoothChange.ADVERTISEMENT)
+
+        # pysnooz only parses advertisements with this local name, so it
+        # matches everything the service UUID would without double delivery
+        self._unsubscribes.append(
+            async_register_callback(
+                self._hass,
+                self._async_on_advertisement,
+                BluetoothCallbackMatcher(local_name=f"{SNOOZ_LOCAL_NAME_PREFIX}*"),
+                BluetoothScanningMode.ACTIVE,
+            )
+        )
+
+    @callback
+    def async_register_address(
+        self, address: str, on_advertisement: AdvertisementCallback
+    ) -> CALLBACK_TYPE:
+        """Route advertisements from a configured device to its entry."""
+        address = address.upper()
+        self._routes[address] = on_advertisement
+        self._devices.pop(address, None)
+
+        @callback
+        def _async_unregister() -> None:
+            if self._routes.get(address) is on_advertisement:
+                del self._routes[address]
+
+        return _async_unregister
+
+    @callback
+    def async_stop(self) -> None:
+        for unsubscribe in self._unsubscribes:
+            unsubscribe()
+        self._unsubscribes.clear()
+        self._devices.clear()
+        self._routes.clear()
+
+    @callback
+    def async_discovered(self) -> list[DeviceDiscovery]:
+        """Return supported devices advertised within the TTL."""
+        expired = time.monotonic() - self._ttl
+        for address in [
+            address
+            for address, discovery in self._devices.items()
+            if discovery.last_seen < expired
+        ]:
+            del self._devices[address]
+
+        return list(self._devices.values())
+
+    @callback
+    def _async_on_advertisement(
+        self, service_info: BluetoothServiceInfo, change: BluetoothChange
+    ) -> None:
+        if (route := self._routes.get(service_info.address)) is not None:
+            route(service_info, change)
+            return
+
+        fingerprint = advertisement_fingerprint(service_info)
+        discovery = self._devices.get(service_info.address)
+
+        if discovery is not None and discovery.fingerprint == fingerprint:
+            discovery.info = service_info
+            discovery.last_seen = time.monotonic()
+            return
+
+        device = SnoozAdvertisementData()
+        if not device.supported(service_info):
+            self._devices.pop(service_info.address, None)
+            return
+
+        discovery = DeviceDiscovery(service_info, device)
+        discovery.fingerprint = fingerprint
+        self._devices[service_info.address] = discovery
+
+
+@callback
+def async_get_discovery_index(hass: HomeAssistant) -> SnoozDiscoveryIndex:
+    """Return the integration's discovery index, starting it on first use."""
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    if (index := domain_data.get(DATA_DISCOVERY_INDEX)) is None:
+        index = domain_data[DATA_DISCOVERY_INDEX] = SnoozDiscoveryIndex(hass, DISCOVERY_TTL)
+        index.async_start()
+    return index
+
+
+@callback
+def async_release_discovery_index(hass: HomeAssistant) -> None:
+    """Stop the discovery index once no loaded entry routes through it."""
+    if any(
+        entry.state is ConfigEntryState.LOADED
+        for entry in hass.config_entries.async_entries(DOMAIN)
+    ):
+        return
+
+    if (index := hass.data.get(DOMAIN, {}).pop(DATA_DISCOVERY_INDEX, None)) is not None:
+        index.async_stop()
@@ -1,13 +1,19 @@
 """Support for SNOOZ noise maker"""
+from __future__ import annotations
 
+import asyncio
 import logging
 from collections.abc import Callable, Mapping
 from datetime import timedelta
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import voluptuous as vol
-from custom_components.snooz.const import DOMAIN
-from custom_components.snooz.models import SnoozConfigurationData
+from custom_components.snooz.coalescer import SnoozCommandSuperseded
+from custom_components.snooz.const import (ATTR_EASING, ATTR_TRANSITION,
+                                           ATTR_VOLUME, CONF_OPTIMISTIC,
+                                           DEFAULT_OPTIMISTIC, DOMAIN,
+                                           EASINGS)
+from custom_components.snooz.intents import SnoozCommandPending
 from homeassistant.components.fan import FanEntity, FanEntityFeature
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (CONF_ADDRESS, SERVICE_TURN_OFF,
@@ -16,19 +22,19 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.restore_state import RestoreEntity
 from pysnooz.api import SnoozDeviceState, UnknownSnoozState
-from pysnooz.commands import (SnoozCommandData, SnoozCommandResultStatus,
-                              set_volume, turn_off, turn_on)
-from pysnooz.device import SnoozConnectionStatus, SnoozDevice
+from pysnooz.commands import (SnoozCommandResultStatus, set_volume, turn_off,
+                              turn_on)
 
-# transitions logging is pretty verbose, so only enable warnings/errors
-logging.getLogger("transitions.core").setLevel(logging.WARNING)
+if TYPE_CHECKING:
+    from custom_components.snooz.batcher import SnoozStateWriteBatcher
+    from custom_components.snooz.coalescer import SnoozCommandCoalescer
+    from custom_components.snooz.models import SnoozConfigurationData
+    from pysnooz.commands import SnoozCommandData, SnoozCommandResult
+    from pysnooz.device import SnoozConnectionStatus, SnoozDevice
 
 _LOGGER = logging.getLogger(__name__)
 _LOGGER.setLevel(logging.DEBUG)
 
-ATTR_TRANSITION = "transition"
-ATTR_VOLUME = "volume"
-
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities
 ) -> bool:
@@ -47,6 +53,7 @@ async def async_setup_entry(
             vol.Optional(ATTR_TRANSITION): vol.All(
                 vol.Coerce(int), vol.Range(min=1, max=5*60)
             ),
+            vol.Optional(ATTR_EASING): vol.In(EASINGS),
         },
         "async_turn_on",
     )
@@ -57,6 +64,7 @@ async def async_setup_entry(
             vol.Optional(ATTR_TRANSITION): vol.All(
                 vol.Coerce(int), vol.Range(min=1, max=5*60)
             ),
+            vol.Optional(ATTR_EASING): vol.In(EASINGS),
         },
         "async_turn_off",
     )
@@ -67,27 +75,37 @@ async def async_setup_entry(
         "async_disconnect",
     )
     
-    async_add_entities(
-        [
-            SnoozFan(
-                hass,
-                data.device.display_name,
-                address,
-                data.device,
-            )
-        ]
+    data.fan = SnoozFan(
+        hass,
+        data.device.display_name,
+        address,
+        data.device,
+        data.commands,
+        data.writes,
+        entry.options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC),
     )
+    async_add_entities([data.fan])
 
     return True
 
 
 class SnoozFan(FanEntity, RestoreEntity):
-    """Fan representation of SNOOZ device"""
+    """Fan representation of SNOOZ device
+
+    In optimistic mode the intended state is shown as soon as a command is
+    sent, and rolled back to the device's state if the command fails or its
+    caller stops waiting for it. It is also dropped once the device reports
+    that state, or any state while no command is waiting. A command held
+    until the device is back in range hasn't failed: its outcome is taken
+    from the held intent once that is sent or dropped.
+    """
     
-    def __init__(self, hass, name: str, address: str, device: SnoozDevice) -> None:
+    def __init__(self, hass, name: str, address: str, device: SnoozDevice, commands: SnoozCommandCoalescer, writes: SnoozStateWriteBatcher, optimistic: bool = False) -> None:
         self.hass = hass
         self._address = address
         self._device = device
+        self._commands = commands
+        self._writes = writes
         self._attr_unique_id = address
         self._attr_supported_features = FanEntityFeature.SET_SPEED
         self._attr_name = name
@@ -95,6 +113,13 @@ class SnoozFan(FanEntity, RestoreEntity):
         self._attr_should_poll = False
         self._attr_percentage = None
         self._last_command_successful = None
+        self._optimistic = optimistic
+        self._optimistic_state: SnoozDeviceState | None = None
+        self._optimistic_command = 0
+        self._rolled_back = False
+        # the newest command is held until the device is back in range
+        self._awaiting_intent = False
+        self._commands_in_flight = 0
 
     def _write_state_changed(self) -> None:
         # cache state for restore entity
@@ -102,12 +127,28 @@ class SnoozFan(FanEntity, RestoreEntity):
             self._attr_is_on = self._device.state.on
             self._attr_percentage = self._device.state.volume
 
-        self.async_write_ha_state()
+        self._writes.async_schedule(self)
 
     def _on_connection_status_changed(self, new_status: SnoozConnectionStatus) -> None:
         self._write_state_changed()
         
     def _on_device_state_changed(self, new_state: SnoozDeviceState) -> None:
+        # the device confirmed the intended state, or changed after the
+        # command stopped waiting for it (like a held command or the button)
+        if self._optimistic_state is not None and (
+            new_state == self._optimistic_state or not self._commands_in_flight
+        ):
+            self._optimistic_state = None
+        self._write_state_changed()
+
+    def _on_intent_settled(self) -> None:
+        if self._awaiting_intent and not self._commands.has_pending_intent:
+            self._awaiting_intent = False
+            result = self._commands.intent_result
+            self._set_command_result(
+                result is not None and result.status == SnoozCommandResultStatus.SUCCESSFUL
+            )
+
         self._write_state_changed()
 
     async def async_added_to_hass(self):
@@ -119,6 +160,7 @@ class SnoozFan(FanEntity, RestoreEntity):
             self._last_command_successful = last_state.attributes.get("last_command_successful")
             
         self.async_on_remove(self._subscribe_to_device_events())
+        self.async_on_remove(self._commands.add_listener(self._on_intent_settled))
     
     def _subscribe_to_device_events(self) -> Callable[[], None]:
         events = self._device.events
@@ -126,6 +168,7 @@ class SnoozFan(FanEntity, RestoreEntity):
         def unsubscribe():
             events.on_connection_status_change -= self._on_connection_status_changed
             events.on_state_change -= self._on_device_state_changed
+            self._writes.async_discard(self)
             
         events.on_connection_status_change += self._on_connection_status_changed
         events.on_state_change += self._on_device_state_changed
@@ -137,10 +180,14 @@ class SnoozFan(FanEntity, RestoreEntity):
 
     @property
     def percentage(self) -> int:
+        if self._optimistic_state is not None:
+            return self._optimistic_state.volume
         return self._attr_percentage if self.assumed_state else self._device.state.volume
 
     @property
     def is_on(self) -> bool:
+        if self._optimistic_state is not None:
+            return self._optimistic_state.on
         return self._attr_is_on if self.assumed_state else self._device.state.on
 
     @property
@@ -149,27 +196,78 @@ class SnoozFan(FanEntity, RestoreEntity):
 
     @property
     def extra_state_attributes(self) -> Mapping[Any, Any]:
-        return {"last_command_successful": self._last_command_successful}
+        attributes = {"last_command_successful": self._last_command_successful}
+        if self._commands.intents is not None:
+            attributes["pending_command"] = self._commands.has_pending_intent
+        if self._optimistic:
+            attributes["pending_confirmation"] = self._optimistic_state is not None
+            attributes["rolled_back"] = self._rolled_back
+        return attributes
 
     async def async_disconnect(self, **kwargs) -> None:
         """Disconnect the underlying bluetooth device."""
-        await self._device.async_disconnect()
+        await self._commands.async_disconnect()
         
     async def async_turn_on(self, percentage: int = None, preset_mode: str = None, **kwargs) -> None:
         transition = self._get_transition(kwargs)
-        await self._async_execute_command(turn_on(percentage or kwargs.get("volume"), transition))
+        await self.async_execute_command(turn_on(percentage or kwargs.get("volume"), transition), kwargs.get(ATTR_EASING))
 
     async def async_turn_off(self, **kwargs) -> None:
         transition = self._get_transition(kwargs)
-        await self._async_execute_command(turn_off(transition))
+        await self.async_execute_command(turn_off(transition), kwargs.get(ATTR_EASING))
 
     async def async_set_percentage(self, percentage: int) -> None:
-        await self._async_execute_command(set_volume(percentage))
+        await self.async_execute_command(set_volume(percentage))
+
+    async def async_execute_command(self, command: SnoozCommandData, easing: str | None = None) -> SnoozCommandResult:
+        """Send a command and update the fan's state from its result."""
+        self._awaiting_intent = False
+        if self._optimistic:
+            self._optimistic_command += 1
+            optimistic_command = self._optimistic_command
+            self._optimistic_state = SnoozDeviceState(
+                on=command.on if command.on is not None else self.is_on,
+                volume=command.volume if command.volume is not None else self.percentage,
+            )
+            self._rolled_back = False
+            self.async_write_ha_state()
+
+        self._commands_in_flight += 1
+        try:
+            result = await self._commands.async_execute_command(command, easing)
+        except BaseException as ex:
+            # cancelled callers (timeouts, stopped scripts) and errors roll back too
+            if not self._optimistic or optimistic_command == self._optimistic_command:
+                if not isinstance(ex, asyncio.CancelledError):
+                    self._last_command_successful = False
+                if self._optimistic and self._optimistic_state is not None:
+                    self._optimistic_state = None
+                    self._rolled_back = True
+                self.async_write_ha_state()
+            raise
+        finally:
+            self._commands_in_flight -= 1
+
+        if isinstance(result, SnoozCommandSuperseded):
+            # the newer command reports for both
+            return result
+
+        # a newer command owns the outcome once it has been sent
+        if not self._optimistic or optimistic_command == self._optimistic_command:
+            if isinstance(result, SnoozCommandPending):
+                # keep showing the intended state until the held intent settles
+                self._awaiting_intent = True
+            else:
+                self._set_command_result(result.status == SnoozCommandResultStatus.SUCCESSFUL)
 
-    async def _async_execute_command(self, command: SnoozCommandData) -> None:
-        result = await self._device.async_execute_command(command)
-        self._last_command_successful = result.status == SnoozCommandResultStatus.SUCCESSFUL
         self.async_write_ha_state()
+        return result
+
+    def _set_command_result(self, successful: bool) -> None:
+        self._last_command_successful = successful
+        if self._optimistic:
+            self._optimistic_state = None
+            self._rolled_back = not successful
 
     def _get_transition(self, kwargs: Mapping[str, Any]) -> timedelta:
         seconds = kwargs.get(ATTR_TRANSITION)
@@ -0,0 +1,82 @@
+"""Holds commands for SNOOZ devices that are out of range."""
+from __future__ import annotations
+
+from datetime import timedelta
+
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus)
+
+
+class SnoozCommandPending(SnoozCommandResult):
+    """Result of a command held until its device advertises again."""
+
+    def __init__(self) -> None:
+        super().__init__(SnoozCommandResultStatus.DEVICE_UNAVAILABLE, timedelta())
+
+
+class SnoozIntentBuffer:
+    """The newest power and volume intended for an unreachable device.
+
+    Commands are folded into a single intent, newest value wins, so the
+    buffer never grows. Transitions are held as the state they end in. An
+    intent that nothing was added to within the expiry is dropped instead
+    of being applied.
+    """
+
+    def __init__(self, expiry: float) -> None:
+        self._expiry = expiry
+        self._intent: SnoozCommandData | None = None
+        self._since = 0.0
+        self.expired = 0
+
+    def add(self, command: SnoozCommandData, since: float) -> None:
+        """Fold a command issued at since into the intent."""
+        if self._intent is None:
+            self._intent = SnoozCommandData(on=command.on, volume=command.volume)
+            self._since = since
+            return
+
+        # a failed replay can come back after newer commands were held
+        older, newer = self._intent, command
+        if since < self._since:
+            older, newer = newer, older
+
+        self._intent = SnoozCommandData(
+            on=newer.on if newer.on is not None else older.on,
+            volume=newer.volume if newer.volume is not None else older.volume,
+        )
+        self._since = max(self._since, since)
+
+    def take(self, now: float) -> tuple[SnoozCommandData, float] | None:
+        """Remove and return the intent and when it was issued, unless expired."""
+        intent, since = self._intent, self._since
+        self._intent = None
+
+        if intent is None:
+            return None
+
+        if now - since > self._expiry:
+            self.expired += 1
+            return None
+
+        return intent, since
+
+    def expire(self, now: float) -> bool:
+        """Drop the intent if it expired; returns True if one was dropped."""
+        if self._intent is None or now - self._since < self._expiry:
+            return False
+
+        self._intent = None
+        self.expired += 1
+        return True
+
+    def clear(self) -> None:
+        self._intent = None
+
+    @property
+    def expires_at(self) -> float | None:
+        """Return when the held intent expires, if there is one."""
+        return None if self._intent is None else self._since + self._expiry
+
+    def has_intent(self, now: float) -> bool:
+        return self._intent is not None and now - self._since <= self._expiry
@@ -0,0 +1,26 @@
+"""Change notifications for objects that entities display."""
+from __future__ import annotations
+
+from collections.abc import Callable
+
+
+class ChangeNotifier:
+    """Calls its listeners whenever it reports a change."""
+
+    __slots__ = ("_listeners",)
+
+    def __init__(self) -> None:
+        self._listeners: list[Callable[[], None]] = []
+
+    def add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call listener on every change; returns a remove callback."""
+        self._listeners.append(listener)
+
+        def _remove() -> None:
+            self._listeners.remove(listener)
+
+        return _remove
+
+    def _notify(self) -> None:
+        for listener in self._listeners:
+            listener()
@@ -0,0 +1,171 @@
+"""Constant-memory connection and command metrics for SNOOZ devices."""
+from __future__ import annotations
+
+import math
+from bisect import bisect_left
+from typing import Any
+
+from custom_components.snooz.listeners import ChangeNotifier
+from pysnooz.commands import SnoozCommandResultStatus
+from pysnooz.device import DisconnectionReason
+
+# smallest and largest latency bucket boundaries, in seconds
+HISTOGRAM_MIN = 0.001
+HISTOGRAM_MAX = 300.0
+# ratio between neighbouring bucket boundaries, bounds the percentile error
+HISTOGRAM_GROWTH = 1.1
+
+_BOUNDS = tuple(
+    HISTOGRAM_MIN * HISTOGRAM_GROWTH**i
+    for i in range(
+        math.ceil(math.log(HISTOGRAM_MAX / HISTOGRAM_MIN, HISTOGRAM_GROWTH)) + 1
+    )
+)
+
+
+class LatencyHistogram:
+    """Histogram of durations in fixed, logarithmically spaced buckets.
+
+    Recording is a binary search and an increment, and memory doesn't grow
+    with the number of samples. Percentiles are accurate to one bucket. The
+    buckets are only allocated once the first duration is recorded, since
+    most devices never fill some of their histograms.
+    """
+
+    __slots__ = ("_counts", "count", "total", "max")
+
+    def __init__(self) -> None:
+        self._counts: list[int] | None = None
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        if self._counts is None:
+            # the last bucket catches everything above HISTOGRAM_MAX
+            self._counts = [0] * (len(_BOUNDS) + 1)
+        self._counts[bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the upper bound of the bucket holding the percentile."""
+        if not self.count or self._counts is None:
+            return None
+
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= rank:
+                bound = _BOUNDS[index] if index < len(_BOUNDS) else self.max
+                return min(bound, self.max)
+
+        return self.max
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return a summary in milliseconds."""
+
+        def _ms(seconds: float | None) -> float | None:
+            return None if seconds is None else round(seconds * 1000, 1)
+
+        return {
+            "count": self.count,
+            "mean": _ms(self.total / self.count if self.count else None),
+            "p50": _ms(self.percentile(50)),
+            "p95": _ms(self.percentile(95)),
+            "p99": _ms(self.percentile(99)),
+            "max": _ms(self.max if self.count else None),
+        }
+
+
+class SnoozDeviceMetrics(ChangeNotifier):
+    """Where the time goes when a SNOOZ device runs commands."""
+
+    __slots__ = (
+        "connect",
+        "slot_wait",
+        "slot_timeouts",
+        "command",
+        "queue_wait",
+        "queue_depth",
+        "max_queue_depth",
+        "superseded_transitions",
+        "connection_retries",
+        "command_results",
+        "disconnect_reasons",
+        "last_disconnect_reason",
+    )
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.connect = LatencyHistogram()
+        self.slot_wait = LatencyHistogram()
+        self.slot_timeouts = 0
+        self.command = LatencyHistogram()
+        self.queue_wait = LatencyHistogram()
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.superseded_transitions = 0
+        self.connection_retries = 0
+        self.command_results = {status: 0 for status in SnoozCommandResultStatus}
+        self.disconnect_reasons = {reason: 0 for reason in DisconnectionReason}
+        self.last_disconnect_reason: DisconnectionReason | None = None
+
+    def record_connect(self, seconds: float) -> None:
+        self.connect.record(seconds)
+        self._notify()
+
+    def record_slot_wait(self, seconds: float) -> None:
+        self.slot_wait.record(seconds)
+
+    def record_slot_timeout(self) -> None:
+        self.slot_timeouts += 1
+
+    def record_queue_wait(self, seconds: float) -> None:
+        self.queue_wait.record(seconds)
+
+    def record_queue_depth(self, depth: int) -> None:
+        self.queue_depth = depth
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    def record_superseded_transition(self) -> None:
+        self.superseded_transitions += 1
+
+    def record_connection_retry(self) -> None:
+        self.connection_retries += 1
+        self._notify()
+
+    def record_command(self, seconds: float, status: SnoozCommandResultStatus) -> None:
+        self.command.record(seconds)
+        self.command_results[status] += 1
+        self._notify()
+
+    def record_disconnect(self, reason: DisconnectionReason) -> None:
+        self.disconnect_reasons[reason] += 1
+        self.last_disconnect_reason = reason
+        self._notify()
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "connect_ms": self.connect.as_dict(),
+            "slot_wait_ms": self.slot_wait.as_dict(),
+            "slot_timeouts": self.slot_timeouts,
+            "command_ms": self.command.as_dict(),
+            "queue_wait_ms": self.queue_wait.as_dict(),
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "superseded_transitions": self.superseded_transitions,
+            "connection_retries": self.connection_retries,
+            "command_results": {
+                status.name.lower(): count
+                for status, count in self.command_results.items()
+            },
+            "disconnect_reasons": {
+                reason.name.lower(): count
+                for reason, count in self.disconnect_reasons.items()
+            },
+        }
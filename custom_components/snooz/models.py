@@ -1,13 +1,26 @@
-from bleak.backends.device import BLEDevice
-from homeassistant.components.bluetooth.passive_update_processor import \
-    PassiveBluetoothProcessorCoordinator
-from pysnooz.device import SnoozDevice
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from bleak.backends.device import BLEDevice
+    from custom_components.snooz.batcher import SnoozStateWriteBatcher
+    from custom_components.snooz.coalescer import SnoozCommandCoalescer
+    from custom_components.snooz.coordinator import SnoozProcessorCoordinator
+    from custom_components.snooz.fan import SnoozFan
+    from pysnooz.device import SnoozDevice
 
 
 class SnoozConfigurationData:
     """Configuration data for SNOOZ."""
+
+    __slots__ = ("ble_device", "device", "coordinator", "commands", "writes", "fan")
     
-    def __init__(self, ble_device: BLEDevice, device: SnoozDevice, coordinator: PassiveBluetoothProcessorCoordinator) -> None:
+    def __init__(self, ble_device: BLEDevice | None, device: SnoozDevice, coordinator: SnoozProcessorCoordinator, commands: SnoozCommandCoalescer, writes: SnoozStateWriteBatcher) -> None:
         self.ble_device = ble_device
         self.device = device
         self.coordinator = coordinator
+        self.commands = commands
+        self.writes = writes
+        # set once the fan platform has created the entity
+        self.fan: SnoozFan | None = None
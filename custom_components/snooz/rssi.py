@@ -0,0 +1,93 @@
+"""Decides which signal strength readings are worth writing."""
+from __future__ import annotations
+
+import statistics
+from collections import deque
+
+from custom_components.snooz.const import (RSSI_SMOOTHING_MEAN,
+                                           RSSI_SMOOTHING_MEDIAN,
+                                           RSSI_SMOOTHING_WINDOW)
+
+
+class RssiEmissionPolicy:
+    """Rate limits, thresholds and optionally smooths RSSI readings.
+
+    A reading is emitted when it is the first one, or when at least
+    min_interval seconds have passed since the last emitted value and the
+    (smoothed) value moved by at least threshold dBm. A reading that moved
+    enough but came too soon is held, and flushed once the interval is over
+    unless a newer reading replaces it first.
+    """
+
+    __slots__ = (
+        "_min_interval",
+        "_threshold",
+        "_smoothing",
+        "_samples",
+        "_last_emit_time",
+        "_held",
+        "value",
+    )
+
+    def __init__(
+        self,
+        min_interval: float,
+        threshold: float,
+        smoothing: str,
+        window: int = RSSI_SMOOTHING_WINDOW,
+    ) -> None:
+        self._min_interval = min_interval
+        self._threshold = threshold
+        self._smoothing = smoothing
+        self._samples: deque[float] = deque(maxlen=window)
+        self._last_emit_time: float | None = None
+        self._held: int | float | None = None
+        self.value: int | float | None = None
+
+    def update(self, reading: int | float | None, now: float) -> bool:
+        """Add a reading and return True if the emitted value changed."""
+        if reading is None:
+            return False
+
+        self._samples.append(reading)
+        candidate = self._smoothed(reading)
+
+        if self._last_emit_time is not None:
+            if self.value is not None and abs(candidate - self.value) < max(self._threshold, 1):
+                self._held = None
+                return False
+            if now - self._last_emit_time < self._min_interval:
+                self._held = candidate
+                return False
+
+        self._emit(candidate, now)
+        return True
+
+    def due_in(self, now: float) -> float | None:
+        """Return the seconds until the held reading may be flushed, if any."""
+        if self._held is None or self._last_emit_time is None:
+            return None
+
+        return max(0.0, self._last_emit_time + self._min_interval - now)
+
+    def flush(self, now: float) -> bool:
+        """Emit the held reading; returns True if the emitted value changed."""
+        if self._held is None:
+            return False
+
+        self._emit(self._held, now)
+        return True
+
+    def _emit(self, value: int | float, now: float) -> None:
+        self.value = value
+        self._last_emit_time = now
+        self._held = None
+
+    def _smoothed(self, reading: int | float) -> int | float:
+        if self._smoothing == RSSI_SMOOTHING_MEAN:
+            return round(statistics.fmean(self._samples))
+
+        if self._smoothing == RSSI_SMOOTHING_MEDIAN:
+            return round(statistics.median(self._samples))
+
+        return reading
@@ -0,0 +1,182 @@
+"""Shares Bluetooth connection slots between SNOOZ devices."""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+from asyncio import AbstractEventLoop, Future
+from enum import IntEnum
+from typing import Protocol
+
+from pysnooz.commands import SnoozCommandData
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ConnectionPriority(IntEnum):
+    """Order in which waiting devices are given a connection slot."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+def command_priority(command: SnoozCommandData) -> ConnectionPriority:
+    """Rank a command so turning devices off never waits behind long transitions."""
+    if command.on is False:
+        return ConnectionPriority.HIGH
+
+    if command.duration is not None:
+        return ConnectionPriority.LOW
+
+    return ConnectionPriority.NORMAL
+
+
+class ConnectionSlotHolder(Protocol):
+    """A device that can hold a connection slot."""
+
+    @property
+    def address(self) -> str:
+        ...
+
+    @property
+    def is_idle(self) -> bool:
+        ...
+
+    async def async_disconnect(self) -> None:
+        ...
+
+
+class _ScannerSlots:
+    """Slots and waiters for a single adapter or proxy."""
+
+    def __init__(self) -> None:
+        self.holders: dict[str, ConnectionSlotHolder] = {}
+        # priority, ticket, then a tiebreaker for a ticket that is reused
+        self.waiters: list[
+            tuple[ConnectionPriority, int, int, Future[None], ConnectionSlotHolder]
+        ] = []
+
+
+class SnoozConnectionScheduler:
+    """Caps concurrent connections per scanner and hands out slots by priority.
+
+    Waiters are served by priority, then in the order they asked. A device
+    that asks again with the ticket of its first request, like when a
+    command reconnects, keeps its place in that order. When a scanner is
+    full and someone is waiting, holders that aren't executing a command are
+    disconnected so their slot can be reused right away.
+    """
+
+    def __init__(
+        self, loop: AbstractEventLoop, max_connections: int, timeout: float
+    ) -> None:
+        self._loop = loop
+        self._max_connections = max_connections
+        self._timeout = timeout
+        self._scanners: dict[str, _ScannerSlots] = {}
+        self._sequence = itertools.count()
+
+    def pending(self, source: str) -> int:
+        """Return the number of devices waiting for a slot on a scanner."""
+        if (slots := self._scanners.get(source)) is None:
+            return 0
+
+        return sum(1 for *_, future, _ in slots.waiters if not future.done())
+
+    def next_ticket(self) -> int:
+        """Return a ticket that orders a request after every earlier one."""
+        return next(self._sequence)
+
+    async def async_acquire(
+        self,
+        source: str,
+        holder: ConnectionSlotHolder,
+        priority: ConnectionPriority = ConnectionPriority.NORMAL,
+        ticket: int | None = None,
+    ) -> None:
+        """Wait until the holder may connect through the given scanner.
+
+        Raises asyncio.TimeoutError if no slot frees up in time.
+        """
+        slots = self._scanners.setdefault(source, _ScannerSlots())
+
+        if holder.address in slots.holders:
+            return
+
+        if len(slots.holders) < self._max_connections and not slots.waiters:
+            slots.holders[holder.address] = holder
+            return
+
+        future: Future[None] = self._loop.create_future()
+        heapq.heappush(
+            slots.waiters,
+            (
+                priority,
+                self.next_ticket() if ticket is None else ticket,
+                next(self._sequence),
+                future,
+                holder,
+            ),
+        )
+        _LOGGER.debug(
+            "[%s] waiting for a connection slot on %s (%d queued)",
+            holder.address,
+            source,
+            len(slots.waiters),
+        )
+        self._release_idle_holders(slots)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self._timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            if future.done() and not future.cancelled():
+                # the slot was granted as we gave up on it
+                self.release(source, holder)
+            else:
+                future.cancel()
+            raise
+
+    def release(self, source: str, holder: ConnectionSlotHolder) -> None:
+        """Give up a slot and hand it to the next waiter."""
+        if (slots := self._scanners.get(source)) is None:
+            return
+
+        if slots.holders.get(holder.address) is holder:
+            del slots.holders[holder.address]
+
+        self._grant_waiters(slots)
+
+    def async_holder_idle(self, source: str, holder: ConnectionSlotHolder) -> None:
+        """Release an idle holder's slot if anyone else is waiting for it."""
+        if (slots := self._scanners.get(source)) is None:
+            return
+
+        if holder.address in slots.holders and self.pending(source):
+            self._request_release(holder)
+
+    def _grant_waiters(self, slots: _ScannerSlots) -> None:
+        while slots.waiters and len(slots.holders) < self._max_connections:
+            *_, future, holder = heapq.heappop(slots.waiters)
+            if future.done():
+                continue
+            slots.holders[holder.address] = holder
+            future.set_result(None)
+
+    def _release_idle_holders(self, slots: _ScannerSlots) -> None:
+        waiting = sum(1 for *_, future, _ in slots.waiters if not future.done())
+        free = self._max_connections - len(slots.holders)
+
+        for holder in list(slots.holders.values()):
+            if waiting <= free:
+                return
+            if holder.is_idle:
+                self._request_release(holder)
+                waiting -= 1
+
+    def _request_release(self, holder: ConnectionSlotHolder) -> None:
+        _LOGGER.debug("[%s] releasing idle connection for a waiting device", holder.address)
+        self._loop.create_task(
+            holder.async_disconnect(), name=f"[Release slot] {holder.address}"
+        )
@@ -1,11 +1,23 @@
 """Support for SNOOZ device sensors."""
 from __future__ import annotations
 
-from collections.abc import Callable
-from typing import Optional, Union
+import time
+from asyncio import TimerHandle
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Optional, Union
 
-from custom_components.snooz.const import DOMAIN
-from custom_components.snooz.models import SnoozConfigurationData
+from custom_components.snooz.breaker import CircuitState
+from custom_components.snooz.const import (CONF_CONNECTING_THRESHOLD,
+                                           CONF_RSSI_MIN_INTERVAL,
+                                           CONF_RSSI_SMOOTHING,
+                                           CONF_RSSI_THRESHOLD,
+                                           DEFAULT_CONNECTING_THRESHOLD,
+                                           DEFAULT_RSSI_MIN_INTERVAL,
+                                           DEFAULT_RSSI_SMOOTHING,
+                                           DEFAULT_RSSI_THRESHOLD, DOMAIN)
+from custom_components.snooz.rssi import RssiEmissionPolicy
 from homeassistant.components.bluetooth.passive_update_processor import (
     PassiveBluetoothDataProcessor, PassiveBluetoothDataUpdate,
     PassiveBluetoothEntityKey, PassiveBluetoothProcessorEntity)
@@ -14,14 +26,24 @@ from homeassistant.components.sensor import (SensorDeviceClass, SensorEntity,
                                              SensorStateClass)
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (ATTR_MANUFACTURER, ATTR_MODEL, ATTR_NAME,
-                                 SIGNAL_STRENGTH_DECIBELS_MILLIWATT)
-from homeassistant.core import HomeAssistant
+                                 SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+                                 UnitOfTime)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo, EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from pysnooz.device import SnoozDevice
+from homeassistant.helpers.typing import StateType
+from homeassistant.util import dt as dt_util
+from pysnooz.device import DisconnectionReason, SnoozConnectionStatus
 from sensor_state_data import (DeviceClass, DeviceKey, SensorDeviceInfo,
                                SensorUpdate, Units)
 
+if TYPE_CHECKING:
+    from custom_components.snooz.batcher import SnoozStateWriteBatcher
+    from custom_components.snooz.device import ManagedSnoozDevice
+    from custom_components.snooz.metrics import SnoozDeviceMetrics
+    from custom_components.snooz.models import SnoozConfigurationData
+
+
 SENSOR_DESCRIPTIONS = {
     (
         DeviceClass.SIGNAL_STRENGTH,
@@ -36,6 +58,76 @@ SENSOR_DESCRIPTIONS = {
     ),
 }
 
+
+@dataclass(frozen=True, kw_only=True)
+class SnoozMetricSensorEntityDescription(SensorEntityDescription):
+    """Describes a sensor showing one of a device's metrics."""
+
+    value_fn: Callable[[SnoozDeviceMetrics], StateType]
+    attributes_fn: Callable[[SnoozDeviceMetrics], Mapping[str, Any]] | None = None
+
+
+def _to_ms(seconds: float | None) -> float | None:
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+METRIC_SENSOR_DESCRIPTIONS = (
+    SnoozMetricSensorEntityDescription(
+        key="command_latency",
+        name="Command Latency",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda metrics: _to_ms(metrics.command.percentile(95)),
+        attributes_fn=lambda metrics: metrics.command.as_dict(),
+    ),
+    SnoozMetricSensorEntityDescription(
+        key="connect_time",
+        name="Connect Time",
+        device_class=SensorDeviceClass.DURATION,
+        native_unit_of_measurement=UnitOfTime.MILLISECONDS,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda metrics: _to_ms(metrics.connect.percentile(95)),
+        attributes_fn=lambda metrics: metrics.connect.as_dict(),
+    ),
+    SnoozMetricSensorEntityDescription(
+        key="connection_retries",
+        name="Connection Retries",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda metrics: metrics.connection_retries,
+    ),
+    SnoozMetricSensorEntityDescription(
+        key="last_disconnect_reason",
+        name="Last Disconnect Reason",
+        device_class=SensorDeviceClass.ENUM,
+        options=[reason.name.lower() for reason in DisconnectionReason],
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda metrics: (
+            metrics.last_disconnect_reason.name.lower()
+            if metrics.last_disconnect_reason is not None
+            else None
+        ),
+        attributes_fn=lambda metrics: {
+            reason.name.lower(): count
+            for reason, count in metrics.disconnect_reasons.items()
+        },
+    ),
+)
+
+# marks a value that hasn't been converted yet, since None is a valid value
+_UNSET = object()
+
+# every SNOOZ reports the same few keys, so their entity keys are shared
+_ENTITY_KEYS: dict[DeviceKey, PassiveBluetoothEntityKey] = {}
+
+
 def _device_key_to_bluetooth_entity_key(
     device_key: DeviceKey,
 ) -> PassiveBluetoothEntityKey:
@@ -56,31 +148,68 @@ def _sensor_device_info_to_hass(
         hass_device_info[ATTR_MODEL] = sensor_device_info.model
     return hass_device_info
 
-def sensor_update_to_bluetooth_data_update(
-    sensor_update: SensorUpdate,
-) -> PassiveBluetoothDataUpdate:
-    """Convert a sensor update to a bluetooth data update."""
-    return PassiveBluetoothDataUpdate(
-        devices={
-            device_id: _sensor_device_info_to_hass(device_info)
-            for device_id, device_info in sensor_update.devices.items()
-        },
-        entity_descriptions={
-            _device_key_to_bluetooth_entity_key(device_key): SENSOR_DESCRIPTIONS[
+
+class SensorUpdateConverter:
+    """Incrementally converts sensor updates to bluetooth data updates.
+
+    Device info, descriptions and entity keys are built once per DeviceKey and
+    reused, entity keys across all devices. Each update only carries what
+    changed since the previous one, which is usually just the signal strength
+    value.
+    """
+
+    __slots__ = ("_devices", "_descriptions", "_names", "_values")
+
+    def __init__(self) -> None:
+        self._devices: dict[str | None, tuple[tuple[str | None, ...], DeviceInfo]] = {}
+        self._descriptions: set[DeviceKey] = set()
+        self._names: dict[DeviceKey, str | None] = {}
+        self._values: dict[DeviceKey, Any] = {}
+
+    def __call__(self, sensor_update: SensorUpdate) -> PassiveBluetoothDataUpdate:
+        """Convert a sensor update to a bluetooth data update."""
+        devices: dict[str | None, DeviceInfo] = {}
+        entity_descriptions: dict[PassiveBluetoothEntityKey, SensorEntityDescription] = {}
+        entity_data: dict[PassiveBluetoothEntityKey, Any] = {}
+        entity_names: dict[PassiveBluetoothEntityKey, str | None] = {}
+
+        for device_id, device_info in sensor_update.devices.items():
+            fingerprint = (device_info.name, device_info.manufacturer, device_info.model)
+            cached = self._devices.get(device_id)
+            if cached is None or cached[0] != fingerprint:
+                cached = (fingerprint, _sensor_device_info_to_hass(device_info))
+                self._devices[device_id] = cached
+                devices[device_id] = cached[1]
+
+        for device_key, description in sensor_update.entity_descriptions.items():
+            if device_key in self._descriptions or not description.native_unit_of_measurement:
+                continue
+            self._descriptions.add(device_key)
+            entity_descriptions[self._entity_key(device_key)] = SENSOR_DESCRIPTIONS[
                 (description.device_class, description.native_unit_of_measurement)
             ]
-            for device_key, description in sensor_update.entity_descriptions.items()
-            if description.native_unit_of_measurement
-        },
-        entity_data={
-            _device_key_to_bluetooth_entity_key(device_key): sensor_values.native_value
-            for device_key, sensor_values in sensor_update.entity_values.items()
-        },
-        entity_names={
-            _device_key_to_bluetooth_entity_key(device_key): sensor_values.name
-            for device_key, sensor_values in sensor_update.entity_values.items()
-        },
-    )
+
+        for device_key, sensor_values in sensor_update.entity_values.items():
+            if self._values.get(device_key, _UNSET) != sensor_values.native_value:
+                self._values[device_key] = sensor_values.native_value
+                entity_data[self._entity_key(device_key)] = sensor_values.native_value
+            if self._names.get(device_key, _UNSET) != sensor_values.name:
+                self._names[device_key] = sensor_values.name
+                entity_names[self._entity_key(device_key)] = sensor_values.name
+
+        return PassiveBluetoothDataUpdate(
+            devices=devices,
+            entity_descriptions=entity_descriptions,
+            entity_data=entity_data,
+            entity_names=entity_names,
+        )
+
+    def _entity_key(self, device_key: DeviceKey) -> PassiveBluetoothEntityKey:
+        if (entity_key := _ENTITY_KEYS.get(device_key)) is None:
+            entity_key = _device_key_to_bluetooth_entity_key(device_key)
+            _ENTITY_KEYS[device_key] = entity_key
+        return entity_key
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -90,14 +219,38 @@ async def async_setup_entry(
     """Set up the SNOOZ device sensors."""
     config_data: SnoozConfigurationData = hass.data[DOMAIN][entry.entry_id]
     processor = PassiveBluetoothDataProcessor(
-        update_method=sensor_update_to_bluetooth_data_update
+        update_method=SensorUpdateConverter()
     )
+    options = entry.options
+
+    def _create_sensor_entity(
+        processor: PassiveBluetoothDataProcessor,
+        entity_key: PassiveBluetoothEntityKey,
+        description: SensorEntityDescription,
+    ) -> SnoozSensorEntity:
+        policy = None
+        if description.device_class == SensorDeviceClass.SIGNAL_STRENGTH:
+            policy = RssiEmissionPolicy(
+                options.get(CONF_RSSI_MIN_INTERVAL, DEFAULT_RSSI_MIN_INTERVAL),
+                options.get(CONF_RSSI_THRESHOLD, DEFAULT_RSSI_THRESHOLD),
+                options.get(CONF_RSSI_SMOOTHING, DEFAULT_RSSI_SMOOTHING),
+            )
+        return SnoozSensorEntity(processor, entity_key, description, policy=policy)
+
     async_add_entities([
-        SnoozConnectionStatusSensorEntity(config_data.device),
+        SnoozConnectionStatusSensorEntity(
+            config_data.device,
+            config_data.writes,
+            options.get(CONF_CONNECTING_THRESHOLD, DEFAULT_CONNECTING_THRESHOLD),
+        ),
+        *(
+            SnoozMetricSensorEntity(config_data.device, description, config_data.writes)
+            for description in METRIC_SENSOR_DESCRIPTIONS
+        ),
     ])
     entry.async_on_unload(
         processor.async_add_entities_listener(
-            SnoozSensorEntity, async_add_entities
+            _create_sensor_entity, async_add_entities
         )
     )
     entry.async_on_unload(config_data.coordinator.async_register_processor(processor))
@@ -111,15 +264,77 @@ class SnoozSensorEntity(
 ):
     """Representation of a SNOOZ device sensor."""
 
+    def __init__(
+        self,
+        processor: PassiveBluetoothDataProcessor,
+        entity_key: PassiveBluetoothEntityKey,
+        description: SensorEntityDescription,
+        context: Any = None,
+        policy: RssiEmissionPolicy | None = None,
+    ) -> None:
+        super().__init__(processor, entity_key, description, context)
+        self._policy = policy
+        self._last_available: bool | None = None
+        self._flush_handle: TimerHandle | None = None
+
     @property
     def native_value(self) -> int | float | None:
         """Return the native value."""
+        if self._policy is not None and self._policy.value is not None:
+            return self._policy.value
+
         return self.processor.entity_data.get(self.entity_key)
 
+    @callback
+    def _handle_processor_update(
+        self, new_data: PassiveBluetoothDataUpdate | None
+    ) -> None:
+        """Only write readings the emission policy lets through."""
+        available = self.available
+        availability_changed = available != self._last_available
+        self._last_available = available
+
+        if self._policy is None or new_data is None:
+            self.async_write_ha_state()
+            return
+
+        now = time.monotonic()
+        emitted = self._policy.update(new_data.entity_data.get(self.entity_key), now)
+
+        # updates stop once the reading settles, so one held back has to be
+        # written when the interval is over rather than with the next update
+        if self._flush_handle is None and (delay := self._policy.due_in(now)) is not None:
+            self._flush_handle = self.hass.loop.call_later(delay, self._flush_held_reading)
+
+        if emitted or availability_changed:
+            self.async_write_ha_state()
+
+    async def async_will_remove_from_hass(self) -> None:
+        await super().async_will_remove_from_hass()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    @callback
+    def _flush_held_reading(self) -> None:
+        self._flush_handle = None
+        if self._policy.flush(time.monotonic()):
+            self.async_write_ha_state()
+
+
 class SnoozConnectionStatusSensorEntity(SensorEntity):
-    """Representation of a SNOOZ connection status."""
-    def __init__(self, device: SnoozDevice) -> None:
+    """Representation of a SNOOZ connection status.
+
+    Connection attempts that finish within the connecting threshold go
+    straight from the previous status to the next one. The circuit breaker's
+    state is in the attributes.
+    """
+    def __init__(self, device: ManagedSnoozDevice, writes: SnoozStateWriteBatcher, connecting_threshold: float = 0) -> None:
         self._device = device
+        self._writes = writes
+        self._connecting_threshold = connecting_threshold
+        self._status = device.connection_status
+        self._connecting_handle: TimerHandle | None = None
         self._attr_entity_registry_enabled_default = True
         self._attr_entity_category = EntityCategory.DIAGNOSTIC
         self._attr_unique_id = f"{device.address}.connection_status"
@@ -128,23 +343,110 @@ class SnoozConnectionStatusSensorEntity(SensorEntity):
 
     @property
     def native_value(self) -> str:
-        return self._device.connection_status.name.lower()
+        return self._status.name.lower()
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any]:
+        breaker = self._device.breaker
+        next_attempt = None
+        if breaker.state == CircuitState.OPEN and breaker.retry_at is not None:
+            next_attempt = dt_util.utcnow() + timedelta(
+                seconds=max(0, breaker.retry_at - time.monotonic())
+            )
+
+        return {
+            "circuit": breaker.state.value,
+            "consecutive_failures": breaker.failures,
+            "next_attempt": next_attempt,
+        }
         
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
 
+        self._status = self._device.connection_status
         self.async_on_remove(self._subscribe_to_device_events())
     
     def _subscribe_to_device_events(self) -> Callable[[], None]:
         events = self._device.events
         
+        remove_breaker_listener = self._device.breaker.add_listener(self._on_circuit_changed)
+
         def unsubscribe():
             events.on_connection_status_change -= self._on_connection_status_changed
+            remove_breaker_listener()
+            self._cancel_connecting()
+            self._writes.async_discard(self)
             
         events.on_connection_status_change += self._on_connection_status_changed
             
         return unsubscribe
     
-    def _on_connection_status_changed(self, new_status) -> None:
-        self.async_write_ha_state()
+    def _on_connection_status_changed(self, new_status: SnoozConnectionStatus) -> None:
+        self._cancel_connecting()
+
+        if new_status == SnoozConnectionStatus.CONNECTING and self._connecting_threshold > 0:
+            self._connecting_handle = self.hass.loop.call_later(
+                self._connecting_threshold, self._show_status, new_status
+            )
+            return
+
+        self._show_status(new_status)
+
+    def _on_circuit_changed(self) -> None:
+        self._writes.async_schedule(self)
+
+    def _show_status(self, status: SnoozConnectionStatus) -> None:
+        self._connecting_handle = None
+        self._status = status
+        self._writes.async_schedule(self)
+
+    def _cancel_connecting(self) -> None:
+        if self._connecting_handle is not None:
+            self._connecting_handle.cancel()
+            self._connecting_handle = None
+
+
+class SnoozMetricSensorEntity(SensorEntity):
+    """Representation of a SNOOZ connection or command metric.
+
+    p95 latencies are the state; the full summary is in the attributes.
+    """
+
+    entity_description: SnoozMetricSensorEntityDescription
+
+    def __init__(
+        self,
+        device: ManagedSnoozDevice,
+        description: SnoozMetricSensorEntityDescription,
+        writes: SnoozStateWriteBatcher,
+    ) -> None:
+        self.entity_description = description
+        self._metrics = device.metrics
+        self._writes = writes
+        self._attr_unique_id = f"{device.address}.{description.key}"
+        self._attr_name = f"{device.display_name} {description.name}"
+        self._attr_should_poll = False
+
+    @property
+    def native_value(self) -> StateType:
+        return self.entity_description.value_fn(self._metrics)
+
+    @property
+    def extra_state_attributes(self) -> Mapping[str, Any] | None:
+        if self.entity_description.attributes_fn is None:
+            return None
+        return self.entity_description.attributes_fn(self._metrics)
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+
+        remove_listener = self._metrics.add_listener(
+            lambda: self._writes.async_schedule(self)
+        )
+
+        @callback
+        def _async_remove() -> None:
+            remove_listener()
+            self._writes.async_discard(self)
 
+        self.async_on_remove(_async_remove)
@@ -0,0 +1,395 @@
+"""Integration-wide SNOOZ services."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from datetime import timedelta
+from typing import Any
+
+import homeassistant.helpers.config_validation as cv
+import voluptuous as vol
+from custom_components.snooz.coalescer import SnoozCommandSuperseded
+from custom_components.snooz.const import (ATTR_EASING, ATTR_TRANSITION,
+                                           ATTR_VOLUME, DATA_CAPTURE,
+                                           DATA_SNAPSHOTS,
+                                           DEFAULT_CAPTURE_FILENAME,
+                                           DEFAULT_GROUP_CONCURRENCY,
+                                           DEFAULT_GROUP_TIMEOUT, DOMAIN,
+                                           EASINGS,
+                                           EVENT_GROUP_COMMAND_COMPLETE,
+                                           EVENT_RESTORE_COMPLETE,
+                                           SERVICE_GROUP_COMMAND,
+                                           SERVICE_RESTORE, SERVICE_SNAPSHOT,
+                                           SERVICE_START_CAPTURE,
+                                           SERVICE_STOP_CAPTURE)
+from custom_components.snooz.intents import SnoozCommandPending
+from custom_components.snooz.models import SnoozConfigurationData
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+from homeassistant.exceptions import ServiceValidationError
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.service import async_extract_referenced_entity_ids
+from pysnooz.api import SnoozDeviceState, UnknownSnoozState
+from pysnooz.commands import (SnoozCommandData, set_volume, turn_off,
+                              turn_on)
+
+_LOGGER = logging.getLogger(__name__)
+
+ATTR_COMMAND = "command"
+ATTR_MAX_CONCURRENCY = "max_concurrency"
+ATTR_TIMEOUT = "timeout"
+ATTR_SNAPSHOT_ID = "snapshot_id"
+ATTR_FILENAME = "filename"
+
+COMMAND_TURN_ON = "turn_on"
+COMMAND_TURN_OFF = "turn_off"
+COMMAND_SET_VOLUME = "set_volume"
+
+# result status for devices that didn't finish within the timeout
+STATUS_TIMEOUT = "timeout"
+# result status for targeted entities that don't belong to a loaded SNOOZ entry
+STATUS_NOT_FOUND = "not_found"
+# result status for devices that are out of range, the command is sent once they're back
+STATUS_PENDING = "pending"
+# result status for devices that were already in their saved state
+STATUS_UNCHANGED = "unchanged"
+# result status for commands overwritten by a newer one before they were sent
+STATUS_SUPERSEDED = "superseded"
+# result status for devices whose command raised an unexpected error
+STATUS_ERROR = "error"
+
+
+def _validate_volume(data: dict[str, Any]) -> dict[str, Any]:
+    if data[ATTR_COMMAND] == COMMAND_SET_VOLUME and ATTR_VOLUME not in data:
+        raise vol.Invalid(f"{ATTR_VOLUME} is required for {COMMAND_SET_VOLUME}")
+
+    return data
+
+
+GROUP_COMMAND_SCHEMA = vol.All(
+    cv.make_entity_service_schema(
+        {
+            vol.Required(ATTR_COMMAND): vol.In(
+                [COMMAND_TURN_ON, COMMAND_TURN_OFF, COMMAND_SET_VOLUME]
+            ),
+            vol.Optional(ATTR_VOLUME): vol.All(
+                vol.Coerce(int), vol.Range(min=0, max=100)
+            ),
+            vol.Optional(ATTR_TRANSITION): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=5*60)
+            ),
+            vol.Optional(ATTR_EASING): vol.In(EASINGS),
+            vol.Optional(ATTR_MAX_CONCURRENCY, default=DEFAULT_GROUP_CONCURRENCY): vol.All(
+                vol.Coerce(int), vol.Range(min=1, max=50)
+            ),
+            vol.Optional(ATTR_TIMEOUT, default=DEFAULT_GROUP_TIMEOUT): vol.All(
+                vol.Coerce(float), vol.Range(min=1, max=10*60)
+            ),
+        }
+    ),
+    _validate_volume,
+)
+
+
+SNAPSHOT_SCHEMA = cv.make_entity_service_schema(
+    {vol.Required(ATTR_SNAPSHOT_ID): cv.string}
+)
+
+RESTORE_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_SNAPSHOT_ID): cv.string,
+        vol.Optional(ATTR_MAX_CONCURRENCY, default=DEFAULT_GROUP_CONCURRENCY): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=50)
+        ),
+        vol.Optional(ATTR_TIMEOUT, default=DEFAULT_GROUP_TIMEOUT): vol.All(
+            vol.Coerce(float), vol.Range(min=1, max=10*60)
+        ),
+    }
+)
+
+
+START_CAPTURE_SCHEMA = vol.Schema(
+    {
+        # a plain file name, so captures can only be written to the config directory
+        vol.Optional(ATTR_FILENAME, default=DEFAULT_CAPTURE_FILENAME): vol.All(
+            cv.string, vol.Match(r"^[\w.-]+$")
+        ),
+    }
+)
+
+
+@callback
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Register the integration-wide services once."""
+    if hass.services.has_service(DOMAIN, SERVICE_GROUP_COMMAND):
+        return
+
+    async def _async_group_command(call: ServiceCall) -> None:
+        await async_execute_group_command(hass, call)
+
+    @callback
+    def _async_snapshot(call: ServiceCall) -> None:
+        async_snapshot(hass, call)
+
+    async def _async_restore(call: ServiceCall) -> None:
+        await async_restore(hass, call)
+
+    async def _async_start_capture(call: ServiceCall) -> None:
+        await hass.data[DOMAIN][DATA_CAPTURE].async_start(
+            hass.config.path(call.data[ATTR_FILENAME])
+        )
+
+    async def _async_stop_capture(call: ServiceCall) -> None:
+        await hass.data[DOMAIN][DATA_CAPTURE].async_stop()
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_GROUP_COMMAND, _async_group_command, GROUP_COMMAND_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_SNAPSHOT, _async_snapshot, SNAPSHOT_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_RESTORE, _async_restore, RESTORE_SCHEMA
+    )
+    hass.services.async_register(
+        DOMAIN, SERVICE_START_CAPTURE, _async_start_capture, START_CAPTURE_SCHEMA
+    )
+    hass.services.async_register(DOMAIN, SERVICE_STOP_CAPTURE, _async_stop_capture)
+
+
+@callback
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Remove the integration-wide services."""
+    for service in (
+        SERVICE_GROUP_COMMAND,
+        SERVICE_SNAPSHOT,
+        SERVICE_RESTORE,
+        SERVICE_START_CAPTURE,
+        SERVICE_STOP_CAPTURE,
+    ):
+        hass.services.async_remove(DOMAIN, service)
+
+
+async def async_execute_group_command(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Run one command on every targeted fan and fire a single result event."""
+    command = _command_from_service_data(call.data)
+    targets = _async_resolve_targets(hass, call)
+
+    start = time.monotonic()
+    results = await _async_run_commands(
+        {entity_id: (data, command) for entity_id, data in targets.items()},
+        call.data[ATTR_MAX_CONCURRENCY],
+        call.data[ATTR_TIMEOUT] + call.data.get(ATTR_TRANSITION, 0),
+        call.data.get(ATTR_EASING),
+    )
+
+    hass.bus.async_fire(
+        EVENT_GROUP_COMMAND_COMPLETE,
+        {
+            ATTR_COMMAND: call.data[ATTR_COMMAND],
+            "duration": round(time.monotonic() - start, 3),
+            **_count_results(results),
+            "devices": results,
+        },
+        context=call.context,
+    )
+
+
+@callback
+def async_snapshot(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Save the power and volume of every targeted fan under the snapshot id.
+
+    Devices whose state has never been read are left out. Snapshots are kept
+    until Home Assistant stops, even while no entry is loaded.
+    """
+    snapshot: dict[str, SnoozDeviceState] = {}
+    for entity_id, data in _async_resolve_targets(hass, call).items():
+        if data is None or data.device.state is UnknownSnoozState:
+            _LOGGER.debug("Not saving %s in snapshot, its state is unknown", entity_id)
+            continue
+
+        state = data.device.state
+        snapshot[entity_id] = SnoozDeviceState(on=state.on, volume=state.volume)
+
+    hass.data.setdefault(DATA_SNAPSHOTS, {})[call.data[ATTR_SNAPSHOT_ID]] = snapshot
+
+
+async def async_restore(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Bring every fan in a snapshot back to its saved state and fire a result event.
+
+    Saved states are compared with each device's last known state, and only
+    devices that differ are sent a command, so unchanged devices aren't
+    connected to at all.
+    """
+    snapshot_id = call.data[ATTR_SNAPSHOT_ID]
+    snapshot = hass.data.get(DATA_SNAPSHOTS, {}).get(snapshot_id)
+    if snapshot is None:
+        raise ServiceValidationError(f"No SNOOZ snapshot named {snapshot_id}")
+
+    commands: dict[str, tuple[SnoozConfigurationData | None, SnoozCommandData | None]] = {}
+    for entity_id, data in _async_resolve_entities(hass, snapshot).items():
+        command = None if data is None else _command_to_restore(
+            data.device.state, snapshot[entity_id]
+        )
+        commands[entity_id] = (data, command)
+
+    start = time.monotonic()
+    results = await _async_run_commands(
+        commands, call.data[ATTR_MAX_CONCURRENCY], call.data[ATTR_TIMEOUT], None
+    )
+
+    hass.bus.async_fire(
+        EVENT_RESTORE_COMPLETE,
+        {
+            ATTR_SNAPSHOT_ID: snapshot_id,
+            "duration": round(time.monotonic() - start, 3),
+            "unchanged": sum(1 for r in results if r["status"] == STATUS_UNCHANGED),
+            **_count_results(results),
+            "devices": results,
+        },
+        context=call.context,
+    )
+
+
+async def _async_run_commands(
+    commands: dict[str, tuple[SnoozConfigurationData | None, SnoozCommandData | None]],
+    max_concurrency: int,
+    timeout: float,
+    easing: str | None,
+) -> list[dict[str, Any]]:
+    """Run a command on each fan and return the status and latency of each.
+
+    Devices run concurrently up to max_concurrency, so the whole group takes
+    about as long as its slowest device rather than the sum of all of them.
+    Fans without a command are reported as unchanged. Commands go through
+    the fan entity when it is loaded, so its state and attributes follow.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _async_run(
+        entity_id: str, data: SnoozConfigurationData | None, command: SnoozCommandData | None
+    ) -> dict[str, Any]:
+        if data is None:
+            return {"entity_id": entity_id, "status": STATUS_NOT_FOUND, "latency": None}
+
+        if command is None:
+            return {"entity_id": entity_id, "status": STATUS_UNCHANGED, "latency": None}
+
+        async with semaphore:
+            start = time.monotonic()
+            try:
+                target = data.fan if data.fan is not None else data.commands
+                result = await asyncio.wait_for(
+                    target.async_execute_command(command, easing), timeout
+                )
+                if isinstance(result, SnoozCommandPending):
+                    status = STATUS_PENDING
+                elif isinstance(result, SnoozCommandSuperseded):
+                    status = STATUS_SUPERSEDED
+                else:
+                    status = result.status.name.lower()
+            except asyncio.TimeoutError:
+                status = STATUS_TIMEOUT
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error running %s on %s", command, entity_id)
+                status = STATUS_ERROR
+
+            return {
+                "entity_id": entity_id,
+                "status": status,
+                "latency": round(time.monotonic() - start, 3),
+            }
+
+    return await asyncio.gather(
+        *(
+            _async_run(entity_id, data, command)
+            for entity_id, (data, command) in commands.items()
+        )
+    )
+
+
+def _count_results(results: list[dict[str, Any]]) -> dict[str, int]:
+    sent = [r for r in results if r["status"] != STATUS_UNCHANGED]
+    return {
+        "successful": sum(1 for r in sent if r["status"] == "successful"),
+        "pending": sum(1 for r in sent if r["status"] == STATUS_PENDING),
+        "superseded": sum(1 for r in sent if r["status"] == STATUS_SUPERSEDED),
+        "failed": sum(
+            1
+            for r in sent
+            if r["status"] not in ("successful", STATUS_PENDING, STATUS_SUPERSEDED)
+        ),
+    }
+
+
+@callback
+def _async_resolve_targets(
+    hass: HomeAssistant, call: ServiceCall
+) -> dict[str, SnoozConfigurationData | None]:
+    """Map each targeted SNOOZ fan to the data of its config entry."""
+    selected = async_extract_referenced_entity_ids(hass, call)
+    registry = er.async_get(hass)
+    domain_data = hass.data.get(DOMAIN, {})
+    targets: dict[str, SnoozConfigurationData | None] = {}
+
+    for entity_id in sorted(selected.referenced | selected.indirectly_referenced):
+        entry = registry.async_get(entity_id)
+
+        if entry is None or entry.platform != DOMAIN:
+            if entity_id in selected.referenced:
+                targets[entity_id] = None
+            continue
+
+        if entry.domain != Platform.FAN:
+            continue
+
+        targets[entity_id] = domain_data.get(entry.config_entry_id)
+
+    return targets
+
+
+@callback
+def _async_resolve_entities(
+    hass: HomeAssistant, entity_ids: Iterable[str]
+) -> dict[str, SnoozConfigurationData | None]:
+    """Map SNOOZ fans to the data of their config entry, if it is loaded."""
+    registry = er.async_get(hass)
+    domain_data = hass.data.get(DOMAIN, {})
+    return {
+        entity_id: (
+            domain_data.get(entry.config_entry_id)
+            if (entry := registry.async_get(entity_id)) is not None
+            else None
+        )
+        for entity_id in entity_ids
+    }
+
+
+def _command_to_restore(
+    current: SnoozDeviceState, saved: SnoozDeviceState
+) -> SnoozCommandData | None:
+    """Return a command that changes only what differs, or None if nothing does."""
+    if current is UnknownSnoozState:
+        return SnoozCommandData(on=saved.on, volume=saved.volume)
+
+    on = saved.on if saved.on != current.on else None
+    volume = saved.volume if saved.volume != current.volume else None
+    if on is None and volume is None:
+        return None
+
+    return SnoozCommandData(on=on, volume=volume)
+
+
+def _command_from_service_data(data: dict[str, Any]) -> SnoozCommandData:
+    seconds = data.get(ATTR_TRANSITION)
+    transition = timedelta(seconds=seconds) if seconds else None
+
+    if data[ATTR_COMMAND] == COMMAND_TURN_OFF:
+        return turn_off(transition)
+
+    if data[ATTR_COMMAND] == COMMAND_SET_VOLUME:
+        return set_volume(data[ATTR_VOLUME])
+
+    return turn_on(data.get(ATTR_VOLUME), transition)
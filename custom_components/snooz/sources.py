@@ -0,0 +1,79 @@
+"""Chooses which scanner or proxy to connect to a SNOOZ through."""
+from __future__ import annotations
+
+from bleak.backends.device import BLEDevice
+
+# weight of the newest reading in a scanner's smoothed signal strength
+RSSI_SMOOTHING_FACTOR = 0.3
+
+
+class ConnectionSource:
+    """What one scanner recently heard from a device."""
+
+    __slots__ = ("source", "ble_device", "rssi", "last_seen", "failed_at")
+
+    def __init__(self, source: str, ble_device: BLEDevice, rssi: float, now: float) -> None:
+        self.source = source
+        self.ble_device = ble_device
+        self.rssi = rssi
+        self.last_seen = now
+        self.failed_at: float | None = None
+
+
+class ConnectionSourceSelector:
+    """Ranks the scanners that hear a device by smoothed signal strength.
+
+    Scanners that haven't heard the device recently are skipped, and one
+    that just failed to connect is only used when no other scanner is left.
+    """
+
+    __slots__ = ("_stale_after", "_failure_cooldown", "_sources")
+
+    def __init__(self, stale_after: float, failure_cooldown: float) -> None:
+        self._stale_after = stale_after
+        self._failure_cooldown = failure_cooldown
+        self._sources: dict[str, ConnectionSource] = {}
+
+    def record(self, source: str, ble_device: BLEDevice, rssi: int, now: float) -> None:
+        if (known := self._sources.get(source)) is None:
+            self._sources[source] = ConnectionSource(source, ble_device, rssi, now)
+            return
+
+        known.ble_device = ble_device
+        known.rssi += RSSI_SMOOTHING_FACTOR * (rssi - known.rssi)
+        known.last_seen = now
+
+    def record_failure(self, source: str, now: float) -> None:
+        if (known := self._sources.get(source)) is not None:
+            known.failed_at = now
+
+    def record_success(self, source: str) -> None:
+        if (known := self._sources.get(source)) is not None:
+            known.failed_at = None
+
+    def best(self, now: float) -> ConnectionSource | None:
+        """Return the best scanner to connect through, if any heard the device."""
+        fresh = [
+            source
+            for source in self._sources.values()
+            if now - source.last_seen <= self._stale_after
+        ]
+        healthy = [
+            source
+            for source in fresh
+            if source.failed_at is None or now - source.failed_at > self._failure_cooldown
+        ]
+        candidates = healthy or fresh
+        return max(candidates, key=lambda source: source.rssi, default=None)
+
+    def as_dict(self, now: float) -> dict[str, dict[str, float | None]]:
+        return {
+            source.source: {
+                "rssi": round(source.rssi, 1),
+                "age": round(now - source.last_seen, 1),
+                "failed_ago": (
+                    None if source.failed_at is None else round(now - source.failed_at, 1)
+                ),
+            }
+            for source in self._sources.values()
+        }
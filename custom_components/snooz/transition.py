@@ -0,0 +1,177 @@
+"""Stepped volume transitions driven by the integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from asyncio import AbstractEventLoop, Task
+from collections.abc import Callable
+from datetime import timedelta
+
+from custom_components.snooz.const import (EASING_EXPONENTIAL, EASING_LINEAR,
+                                           EASING_LOG)
+from pysnooz.api import MIN_DEVICE_VOLUME, UnknownSnoozState
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, set_volume, turn_off,
+                              turn_on)
+from pysnooz.device import SnoozDevice
+
+_LOGGER = logging.getLogger(__name__)
+
+EASING_CURVES: dict[str, Callable[[float], float]] = {
+    EASING_LINEAR: lambda progress: progress,
+    # slow start, fast finish
+    EASING_EXPONENTIAL: lambda progress: (2 ** (10 * progress) - 1) / 1023,
+    # fast start, long gentle tail; sleep-friendly for fading out
+    EASING_LOG: lambda progress: math.log1p(9 * progress) / math.log(10),
+}
+
+
+def plan_transition_steps(
+    start_volume: int,
+    end_volume: int,
+    duration: float,
+    step: int,
+    interval: float,
+    easing: str,
+) -> list[tuple[float, int]]:
+    """Return (seconds from start, volume) writes for a transition.
+
+    Volumes are sampled every interval seconds along the easing curve and a
+    write is only planned once the volume moved by at least step percent.
+    The final volume is always written.
+    """
+    if start_volume == end_volume:
+        return []
+
+    curve = EASING_CURVES[easing]
+    steps: list[tuple[float, int]] = []
+    last_volume = start_volume
+    samples = max(math.floor(duration / interval + 1e-9), 1)
+
+    for sample in range(1, samples):
+        offset = sample * interval
+        volume = round(start_volume + (end_volume - start_volume) * curve(offset / duration))
+        if abs(volume - last_volume) >= step:
+            steps.append((offset, volume))
+            last_volume = volume
+
+    if last_volume != end_volume:
+        steps.append((duration, end_volume))
+
+    return steps
+
+
+class SnoozTransitionEngine:
+    """Runs one cancellable volume transition at a time for a device.
+
+    Each step is a short, separate command, so the connection is free (and
+    may be handed to another device) between steps.
+    """
+
+    def __init__(
+        self,
+        device: SnoozDevice,
+        loop: AbstractEventLoop,
+        step: int,
+        interval: float,
+        easing: str,
+    ) -> None:
+        self._device = device
+        self._loop = loop
+        self._step = step
+        self._interval = interval
+        self._easing = easing
+        self._task: Task[SnoozCommandResult] | None = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def async_run(
+        self, command: SnoozCommandData, easing: str | None = None
+    ) -> SnoozCommandResult:
+        """Transition to the command's target, replacing any running transition."""
+        assert command.duration is not None
+        self.async_cancel()
+
+        task = self._loop.create_task(
+            self._async_transition(command, easing or self._easing),
+            name=f"[Transition] {self._device.display_name} {command}",
+        )
+        self._task = task
+
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.cancelled():
+                raise
+            return SnoozCommandResult(SnoozCommandResultStatus.CANCELLED, timedelta())
+
+    def async_cancel(self) -> None:
+        """Stop the running transition, leaving the volume where it is."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        self._task = None
+
+    async def _async_transition(
+        self, command: SnoozCommandData, easing: str
+    ) -> SnoozCommandResult:
+        start_time = self._loop.time()
+        state = self._device.state
+
+        if state is UnknownSnoozState or state.volume is None:
+            # nothing to ease from, so let pysnooz read the state and transition
+            return await self._async_execute(command)
+
+        original_volume = state.volume
+        start_volume = state.volume if state.on else MIN_DEVICE_VOLUME
+        end_volume = (command.volume or state.volume) if command.on else MIN_DEVICE_VOLUME
+
+        if command.on and not state.on:
+            # set volume before turning on to prevent a moment with the original volume
+            result = await self._async_execute(turn_on(start_volume))
+            if result.status != SnoozCommandResultStatus.SUCCESSFUL:
+                return result
+
+        steps = plan_transition_steps(
+            start_volume,
+            end_volume,
+            command.duration.total_seconds(),
+            self._step,
+            self._interval,
+            easing,
+        )
+        _LOGGER.debug(
+            "[%s] %s volume %d%% to %d%% in %d writes",
+            self._device.display_name,
+            easing,
+            start_volume,
+            end_volume,
+            len(steps),
+        )
+
+        for offset, volume in steps:
+            await asyncio.sleep(max(start_time + offset - self._loop.time(), 0))
+            result = await self._async_execute(set_volume(volume))
+            if result.status != SnoozCommandResultStatus.SUCCESSFUL:
+                return result
+
+        if not command.on:
+            result = await self._async_execute(turn_off())
+            if result.status != SnoozCommandResultStatus.SUCCESSFUL:
+                return result
+            # restore the volume so the next turn on doesn't start silent; a
+            # device that was already off was never stepped down, and a
+            # cancelled transition stops before getting here
+            if steps:
+                await self._async_execute(set_volume(original_volume))
+
+        return SnoozCommandResult(
+            SnoozCommandResultStatus.SUCCESSFUL,
+            timedelta(seconds=self._loop.time() - start_time),
+        )
+
+    async def _async_execute(self, command: SnoozCommandData) -> SnoozCommandResult:
+        # shielded so cancelling the transition never cancels pysnooz's result future
+        return await asyncio.shield(self._device.async_execute_command(command))
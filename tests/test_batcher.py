@@ -0,0 +1,65 @@
+"""Tests for batching the state writes of SNOOZ entities."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+from custom_components.snooz.batcher import SnoozStateWriteBatcher
+
+
+def test_writes_in_one_iteration_are_collapsed_per_entity() -> None:
+    async def _run() -> None:
+        writes = SnoozStateWriteBatcher(asyncio.get_running_loop(), 0)
+        fan, sensor = MagicMock(), MagicMock()
+
+        writes.async_schedule(fan)
+        writes.async_schedule(sensor)
+        writes.async_schedule(fan)
+        fan.async_write_ha_state.assert_not_called()
+
+        await asyncio.sleep(0)
+        fan.async_write_ha_state.assert_called_once()
+        sensor.async_write_ha_state.assert_called_once()
+        assert writes.collapsed_writes == 1
+
+        writes.async_schedule(fan)
+        await asyncio.sleep(0)
+        assert fan.async_write_ha_state.call_count == 2
+
+    asyncio.run(_run())
+
+
+def test_writes_wait_for_the_window() -> None:
+    async def _run() -> None:
+        writes = SnoozStateWriteBatcher(asyncio.get_running_loop(), 0.02)
+        fan = MagicMock()
+
+        writes.async_schedule(fan)
+        await asyncio.sleep(0)
+        writes.async_schedule(fan)
+        fan.async_write_ha_state.assert_not_called()
+
+        await asyncio.sleep(0.05)
+        fan.async_write_ha_state.assert_called_once()
+
+    asyncio.run(_run())
+
+
+def test_discarded_and_cancelled_writes_are_dropped() -> None:
+    async def _run() -> None:
+        writes = SnoozStateWriteBatcher(asyncio.get_running_loop(), 0)
+        removed, other = MagicMock(), MagicMock()
+
+        writes.async_schedule(removed)
+        writes.async_schedule(other)
+        writes.async_discard(removed)
+        await asyncio.sleep(0)
+        removed.async_write_ha_state.assert_not_called()
+        other.async_write_ha_state.assert_called_once()
+
+        writes.async_schedule(other)
+        writes.async_cancel()
+        await asyncio.sleep(0)
+        other.async_write_ha_state.assert_called_once()
+
+    asyncio.run(_run())
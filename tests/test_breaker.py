@@ -0,0 +1,97 @@
+"""Tests for the SNOOZ circuit breaker."""
+from __future__ import annotations
+
+from custom_components.snooz.breaker import CircuitState, SnoozCircuitBreaker
+
+
+def _breaker() -> SnoozCircuitBreaker:
+    return SnoozCircuitBreaker(5, 300, 0.2, random_fn=lambda: 0.0)
+
+
+def test_failure_opens_the_circuit_until_the_backoff_passes() -> None:
+    breaker = _breaker()
+    assert breaker.allow(0)
+
+    breaker.record_failure(0)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.is_open(4)
+    assert not breaker.allow(4)
+    assert breaker.rejected == 1
+
+    assert breaker.allow(5)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+
+def test_failed_trial_doubles_the_backoff_up_to_the_maximum() -> None:
+    breaker = _breaker()
+    breaker.record_failure(0)
+    assert breaker.allow(5)
+    breaker.record_failure(5)
+    assert breaker.retry_at == 15
+
+    for _ in range(10):
+        breaker.record_failure(100)
+    assert breaker.retry_at == 400
+
+
+def test_jitter_only_shortens_the_backoff() -> None:
+    breaker = SnoozCircuitBreaker(10, 300, 0.2, random_fn=lambda: 1.0)
+    breaker.record_failure(0)
+    assert breaker.retry_at == 8
+
+
+def test_success_closes_the_circuit_and_resets_the_backoff() -> None:
+    breaker = _breaker()
+    notified: list[CircuitState] = []
+    breaker.add_listener(lambda: notified.append(breaker.state))
+
+    breaker.record_failure(0)
+    breaker.allow(5)
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.failures == 0
+    assert breaker.retry_at is None
+    assert notified == [CircuitState.OPEN, CircuitState.HALF_OPEN, CircuitState.CLOSED]
+
+    breaker.record_failure(10)
+    assert breaker.retry_at == 15
+
+
+def test_half_open_lets_a_single_trial_through() -> None:
+    breaker = _breaker()
+    breaker.record_failure(0)
+
+    assert breaker.allow(5)
+    assert breaker.is_open(5)
+    assert not breaker.allow(5)
+    assert not breaker.allow(6)
+    assert breaker.rejected == 2
+
+    # a trial that never got to connect lets the next one through
+    breaker.end_trial()
+    assert breaker.allow(6)
+    breaker.record_failure(6)
+    assert breaker.state == CircuitState.OPEN
+    assert breaker.retry_at == 16
+
+
+def test_advertisement_allows_one_early_trial_per_outage() -> None:
+    breaker = _breaker()
+    breaker.record_failure(0)
+
+    breaker.record_advertisement(1)
+    assert breaker.failures == 1
+    assert breaker.allow(1)
+    breaker.record_failure(1)
+
+    # later adverts don't shortcut or reset the backoff
+    for now in range(2, 11):
+        breaker.record_advertisement(now)
+        assert not breaker.allow(now)
+    assert breaker.failures == 2
+    assert breaker.retry_at == 11
+
+    breaker.record_success()
+    breaker.record_failure(20)
+    breaker.record_advertisement(21)
+    assert breaker.allow(21)
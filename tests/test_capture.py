@@ -0,0 +1,69 @@
+"""Tests for the SNOOZ traffic capture."""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from custom_components.snooz.capture import (KIND_COMMAND, KIND_RESULT,
+                                             SnoozTrafficCapture)
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from pysnooz.commands import (SnoozCommandResult, SnoozCommandResultStatus,
+                              turn_on)
+
+from benchmarks.fakes import async_create_fake_hass, fake_address
+
+
+def _read(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_commands_and_results_are_written_on_stop() -> None:
+    async def _run() -> None:
+        config_dir = tempfile.mkdtemp()
+        hass = await async_create_fake_hass(config_dir)
+        capture = SnoozTrafficCapture(hass)
+        path = os.path.join(config_dir, "capture.jsonl")
+
+        await capture.async_start(path)
+        command_id = capture.async_record_command(fake_address(0), turn_on(40))
+        capture.async_record_result(
+            fake_address(0),
+            command_id,
+            SnoozCommandResult(SnoozCommandResultStatus.SUCCESSFUL, timedelta()),
+            0.1,
+        )
+        await capture.async_stop()
+
+        entries = _read(path)
+        assert [entry["kind"] for entry in entries] == [KIND_COMMAND, KIND_RESULT]
+        assert entries[0]["volume"] == 40
+        assert entries[1]["id"] == entries[0]["id"]
+        assert entries[1]["status"] == "successful"
+        await hass.async_stop(force=True)
+
+    asyncio.run(_run())
+
+
+def test_capture_is_closed_when_home_assistant_stops() -> None:
+    async def _run() -> None:
+        config_dir = tempfile.mkdtemp()
+        hass = await async_create_fake_hass(config_dir)
+        capture = SnoozTrafficCapture(hass)
+        path = os.path.join(config_dir, "capture.jsonl")
+
+        await capture.async_start(path)
+        capture.async_record_command(fake_address(0), turn_on())
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+
+        assert not capture.is_recording
+        assert [entry["kind"] for entry in _read(path)] == [KIND_COMMAND]
+        # stopping again, as unloading the last entry does, is a no-op
+        await capture.async_stop()
+        await hass.async_stop(force=True)
+
+    asyncio.run(_run())
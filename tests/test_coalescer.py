@@ -0,0 +1,190 @@
+"""Tests for the SNOOZ command coalescer."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+from custom_components.snooz.breaker import SnoozCircuitBreaker
+from custom_components.snooz.coalescer import (SnoozCommandCoalescer,
+                                               SnoozCommandSuperseded)
+from custom_components.snooz.metrics import SnoozDeviceMetrics
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, set_volume, turn_off,
+                              turn_on)
+
+DEBOUNCE = 0.05
+
+
+class FakeDevice:
+    def __init__(self, write_time: float = 0.0) -> None:
+        self.breaker = SnoozCircuitBreaker(5, 300, 0)
+        self.commands: list[tuple[bool | None, int | None]] = []
+        self.write_time = write_time
+        self.error: Exception | None = None
+        self.disconnects = 0
+
+    async def async_execute_command(self, data: SnoozCommandData) -> SnoozCommandResult:
+        self.commands.append((data.on, data.volume))
+        await asyncio.sleep(self.write_time)
+        if self.error is not None:
+            raise self.error
+        return SnoozCommandResult(SnoozCommandResultStatus.SUCCESSFUL, timedelta())
+
+    async def async_disconnect(self) -> None:
+        self.disconnects += 1
+
+
+class FakeTransitions:
+    def __init__(self) -> None:
+        self.is_running = False
+        self.cancels = 0
+
+    def async_cancel(self) -> None:
+        self.is_running = False
+        self.cancels += 1
+
+
+def _coalescer(device: FakeDevice) -> SnoozCommandCoalescer:
+    return SnoozCommandCoalescer(
+        device,
+        asyncio.get_running_loop(),
+        DEBOUNCE,
+        FakeTransitions(),
+        SnoozDeviceMetrics(),
+    )
+
+
+def test_lone_command_is_sent_without_waiting_for_the_window() -> None:
+    async def _run() -> float:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        result = await commands.async_execute_command(set_volume(40))
+        assert result.status == SnoozCommandResultStatus.SUCCESSFUL
+        assert device.commands == [(None, 40)]
+        return loop.time() - start
+
+    assert asyncio.run(_run()) < DEBOUNCE
+
+
+def test_burst_is_merged_after_the_leading_command() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        first = asyncio.ensure_future(commands.async_execute_command(set_volume(10)))
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        results = await asyncio.gather(
+            first,
+            commands.async_execute_command(set_volume(20)),
+            commands.async_execute_command(turn_on()),
+            commands.async_execute_command(set_volume(30)),
+        )
+
+        # the first goes out right away, the rest are merged into one write
+        assert device.commands == [(None, 10), (True, 30)]
+        assert results[0].status == SnoozCommandResultStatus.SUCCESSFUL
+        assert isinstance(results[1], SnoozCommandSuperseded)
+        assert results[2].status == SnoozCommandResultStatus.SUCCESSFUL
+        assert results[3].status == SnoozCommandResultStatus.SUCCESSFUL
+        assert commands.dropped_commands == 2
+
+    asyncio.run(_run())
+
+
+def test_commands_during_a_write_wait_for_it() -> None:
+    async def _run() -> None:
+        device = FakeDevice(write_time=DEBOUNCE * 2)
+        commands = _coalescer(device)
+        first = asyncio.ensure_future(commands.async_execute_command(set_volume(10)))
+        await asyncio.sleep(DEBOUNCE * 1.5)
+        second = asyncio.ensure_future(commands.async_execute_command(set_volume(20)))
+        await asyncio.sleep(0)
+        assert device.commands == [(None, 10)]
+
+        await asyncio.gather(first, second)
+        assert device.commands == [(None, 10), (None, 20)]
+
+    asyncio.run(_run())
+
+
+def test_turning_off_skips_the_window() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        await commands.async_execute_command(set_volume(10))
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await commands.async_execute_command(turn_off())
+        assert loop.time() - start < DEBOUNCE
+        assert device.commands[-1] == (False, None)
+
+    asyncio.run(_run())
+
+
+def test_error_is_raised_only_to_callers_that_were_sent() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        await commands.async_execute_command(set_volume(10))
+        device.error = RuntimeError("write failed")
+
+        superseded, sent = await asyncio.gather(
+            commands.async_execute_command(set_volume(20)),
+            commands.async_execute_command(set_volume(30)),
+            return_exceptions=True,
+        )
+        assert isinstance(superseded, SnoozCommandSuperseded)
+        assert isinstance(sent, RuntimeError)
+
+    asyncio.run(_run())
+
+
+def test_cancel_drops_the_pending_command() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        await commands.async_execute_command(set_volume(10))
+        pending = asyncio.ensure_future(commands.async_execute_command(set_volume(20)))
+        await asyncio.sleep(0)
+        commands.async_cancel()
+
+        assert (await pending).status == SnoozCommandResultStatus.CANCELLED
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert device.commands == [(None, 10)]
+
+    asyncio.run(_run())
+
+
+def test_command_pre_empts_a_running_transition() -> None:
+    async def _run() -> None:
+        transitions = FakeTransitions()
+        metrics = SnoozDeviceMetrics()
+        commands = SnoozCommandCoalescer(
+            FakeDevice(), asyncio.get_running_loop(), DEBOUNCE, transitions, metrics
+        )
+        transitions.is_running = True
+
+        await commands.async_execute_command(set_volume(10))
+        assert transitions.cancels == 1
+        assert metrics.superseded_transitions == 1
+
+    asyncio.run(_run())
+
+
+def test_disconnect_drops_queued_commands() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        await commands.async_execute_command(set_volume(10))
+        pending = asyncio.ensure_future(commands.async_execute_command(set_volume(20)))
+        await asyncio.sleep(0)
+
+        await commands.async_disconnect()
+        assert (await pending).status == SnoozCommandResultStatus.CANCELLED
+        assert device.disconnects == 1
+        await asyncio.sleep(DEBOUNCE * 2)
+        assert device.commands == [(None, 10)]
+
+    asyncio.run(_run())
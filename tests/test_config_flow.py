@@ -0,0 +1,211 @@
+"""Tests for adding SNOOZ devices through the config flow."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from custom_components.snooz.config_flow import SOURCE_BULK, SnoozConfigFlow
+from custom_components.snooz.const import DOMAIN
+from custom_components.snooz.discovery import DeviceDiscovery
+from homeassistant.config_entries import ConfigEntryState
+from homeassistant.const import CONF_ADDRESS, CONF_DEVICES, CONF_NAME, CONF_TOKEN
+from homeassistant.data_entry_flow import (AbortFlow, FlowResultType,
+                                           UnknownFlow)
+from pysnooz.advertisement import SnoozAdvertisementData
+
+from benchmarks.fakes import IDLE_TOKEN, fake_address, fake_service_info
+
+PAIRING_TOKEN = bytes(range(10, 18))
+
+
+def _discovery(index: int, token: bytes = IDLE_TOKEN) -> DeviceDiscovery:
+    info = fake_service_info(fake_address(index), token=token, name=f"Snooz-{index:04d}")
+    device = SnoozAdvertisementData()
+    device.supported(info)
+    return DeviceDiscovery(info, device)
+
+
+def _flow(*discoveries: DeviceDiscovery) -> SnoozConfigFlow:
+    hass = MagicMock()
+    hass.data = {}
+    hass.config_entries.async_entries.return_value = []
+    hass.config_entries.async_entry_for_domain_unique_id.return_value = None
+    hass.config_entries.flow.async_configure = AsyncMock()
+    hass.config_entries.flow.async_init = AsyncMock(
+        return_value={"type": FlowResultType.CREATE_ENTRY}
+    )
+    hass.tasks = []
+
+    def _create_task(target):
+        task = asyncio.get_running_loop().create_task(target)
+        hass.tasks.append(task)
+        return task
+
+    hass.async_create_task = _create_task
+
+    flow = SnoozConfigFlow()
+    flow.hass = hass
+    flow.handler = DOMAIN
+    flow.flow_id = "flow"
+    flow.context = {"source": "user"}
+    flow._discovered_devices = {d.name: d for d in discoveries}
+    return flow
+
+
+def _pairing_advertisement(discovery: DeviceDiscovery):
+    return fake_service_info(
+        discovery.info.address, token=PAIRING_TOKEN, name=discovery.info.name
+    )
+
+
+def test_several_devices_show_a_menu() -> None:
+    async def _run() -> None:
+        flow = _flow()
+        index = MagicMock()
+        index.async_discovered.return_value = [_discovery(0), _discovery(1)]
+
+        with patch(
+            "custom_components.snooz.config_flow.async_get_discovery_index",
+            return_value=index,
+        ):
+            result = await flow.async_step_user()
+
+        assert result["type"] == FlowResultType.MENU
+        assert result["menu_options"] == ["pick_device", "bulk_select"]
+
+        result = await flow.async_step_bulk_select()
+        assert result["type"] == FlowResultType.FORM
+        assert result["step_id"] == "bulk_select"
+
+    asyncio.run(_run())
+
+
+def test_bulk_selection_adds_devices_in_any_order() -> None:
+    async def _run() -> None:
+        pairing, idle = _discovery(0, PAIRING_TOKEN), _discovery(1)
+        flow = _flow(pairing, idle)
+        hass = flow.hass
+
+        with patch(
+            "custom_components.snooz.config_flow.async_register_callback"
+        ) as register:
+            result = await flow.async_step_bulk_select(
+                {CONF_DEVICES: [pairing.name, idle.name]}
+            )
+            assert result["type"] == FlowResultType.SHOW_PROGRESS
+            await asyncio.sleep(0.01)
+
+            # the device already in pairing mode is added straight away
+            assert hass.config_entries.flow.async_init.await_count == 1
+            on_advertisement = register.call_args.args[1]
+            on_advertisement(_pairing_advertisement(idle), None)
+            await asyncio.wait(hass.tasks)
+
+        hass.config_entries.flow.async_configure.assert_awaited_once_with(flow_id="flow")
+        assert [
+            call.kwargs for call in hass.config_entries.flow.async_init.await_args_list
+        ] == [
+            {
+                "context": {"source": SOURCE_BULK},
+                "data": {
+                    CONF_ADDRESS: discovery.info.address,
+                    CONF_NAME: discovery.name,
+                    CONF_TOKEN: PAIRING_TOKEN.hex(),
+                },
+            }
+            for discovery in (pairing, idle)
+        ]
+
+        result = await flow.async_step_wait_for_bulk_pairing()
+        assert result["type"] == FlowResultType.SHOW_PROGRESS_DONE
+        result = await flow.async_step_bulk_complete()
+        assert result["reason"] == "bulk_pairing_complete"
+        assert result["description_placeholders"] == {
+            "paired": "2",
+            "selected": "2",
+            "missed": "none",
+        }
+
+    asyncio.run(_run())
+
+
+def test_bulk_pairing_reports_devices_missed_by_the_timeout() -> None:
+    async def _run() -> None:
+        pairing, idle = _discovery(0, PAIRING_TOKEN), _discovery(1)
+        flow = _flow(pairing, idle)
+
+        with patch(
+            "custom_components.snooz.config_flow.async_register_callback"
+        ), patch(
+            "custom_components.snooz.config_flow.WAIT_FOR_BULK_PAIRING_TIMEOUT", 0.01
+        ):
+            await flow.async_step_bulk_select({CONF_DEVICES: [pairing.name, idle.name]})
+            await asyncio.sleep(0.05)
+            await asyncio.wait(flow.hass.tasks)
+
+        flow.hass.config_entries.flow.async_configure.assert_awaited_once()
+        result = await flow.async_step_wait_for_bulk_pairing()
+        assert result["type"] == FlowResultType.SHOW_PROGRESS_DONE
+        result = await flow.async_step_bulk_complete()
+        assert result["description_placeholders"] == {
+            "paired": "1",
+            "selected": "2",
+            "missed": idle.name,
+        }
+
+    asyncio.run(_run())
+
+
+def test_closing_the_flow_stops_the_bulk_wait() -> None:
+    async def _run() -> None:
+        flow = _flow(_discovery(0))
+        flow.hass.config_entries.flow.async_configure.side_effect = UnknownFlow
+
+        with patch(
+            "custom_components.snooz.config_flow.async_register_callback"
+        ) as register:
+            await flow.async_step_bulk_select({CONF_DEVICES: [_discovery(0).name]})
+            await asyncio.sleep(0)
+            flow.async_remove()
+            await asyncio.wait(flow.hass.tasks)
+            # the flow is resumed, and UnknownFlow from the removed flow handled
+            await asyncio.gather(*flow.hass.tasks[1:])
+
+        assert flow.hass.tasks[0].cancelled()
+        register.return_value.assert_called_once()
+        flow.hass.config_entries.flow.async_configure.assert_awaited_once()
+
+    asyncio.run(_run())
+
+
+def test_bulk_source_creates_the_entry() -> None:
+    async def _run() -> None:
+        flow = _flow()
+        flow.context = {"source": SOURCE_BULK}
+        data = {CONF_ADDRESS: fake_address(0), CONF_NAME: "Snooz 0000", CONF_TOKEN: "ab"}
+
+        result = await flow.async_step_bulk(data)
+
+        assert result["type"] == FlowResultType.CREATE_ENTRY
+        assert result["title"] == "Snooz 0000"
+        assert result["data"] == {CONF_ADDRESS: fake_address(0), CONF_TOKEN: "ab"}
+        assert flow.unique_id == fake_address(0)
+
+    asyncio.run(_run())
+
+
+def test_bulk_source_aborts_for_a_configured_device() -> None:
+    async def _run() -> None:
+        flow = _flow()
+        flow.context = {"source": SOURCE_BULK}
+        flow.hass.config_entries.async_entry_for_domain_unique_id.return_value = MagicMock(
+            source="user", state=ConfigEntryState.LOADED
+        )
+        data = {CONF_ADDRESS: fake_address(0), CONF_NAME: "Snooz 0000", CONF_TOKEN: "ab"}
+
+        with pytest.raises(AbortFlow) as aborted:
+            await flow.async_step_bulk(data)
+        assert aborted.value.reason == "already_configured"
+
+    asyncio.run(_run())
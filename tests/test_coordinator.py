@@ -0,0 +1,85 @@
+"""Tests for skipping duplicate SNOOZ advertisements."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import tempfile
+
+from custom_components.snooz.coordinator import (AdvertisementStats,
+                                                 SnoozAdvertisementParser,
+                                                 SnoozProcessorCoordinator)
+from homeassistant.components.bluetooth import (BluetoothChange,
+                                                BluetoothScanningMode)
+from homeassistant.core import HomeAssistant
+from pysnooz.advertisement import SnoozAdvertisementData
+
+from benchmarks.fakes import (async_create_fake_hass, fake_bluetooth,
+                              fake_service_info)
+
+ADDRESS = "AA:BB:CC:DD:00:00"
+
+
+def _coordinator(hass: HomeAssistant) -> SnoozProcessorCoordinator:
+    return SnoozProcessorCoordinator(
+        hass, logging.getLogger(__name__), address=ADDRESS, mode=BluetoothScanningMode.ACTIVE
+    )
+
+
+def test_identical_advertisements_are_skipped_but_still_listened_to() -> None:
+    async def _run() -> None:
+        hass = await async_create_fake_hass(tempfile.mkdtemp())
+        with fake_bluetooth():
+            coordinator = _coordinator(hass)
+            heard: list[int] = []
+            coordinator.async_add_advertisement_listener(
+                lambda service_info: heard.append(service_info.rssi)
+            )
+
+            for rssi in (-60, -60, -70, -70):
+                coordinator._async_handle_bluetooth_event(
+                    fake_service_info(ADDRESS, rssi=rssi), BluetoothChange.ADVERTISEMENT
+                )
+
+            assert heard == [-60, -60, -70, -70]
+            assert coordinator.stats.as_dict() == {
+                "received": 4,
+                "skipped": 2,
+                # the new signal strength didn't need the payload re-parsed
+                "rssi_only": 1,
+                "parsed": 1,
+            }
+        await hass.async_stop(force=True)
+
+    asyncio.run(_run())
+
+
+def test_duplicate_advertisement_restores_availability() -> None:
+    async def _run() -> None:
+        hass = await async_create_fake_hass(tempfile.mkdtemp())
+        with fake_bluetooth():
+            coordinator = _coordinator(hass)
+            service_info = fake_service_info(ADDRESS)
+            coordinator._async_handle_bluetooth_event(
+                service_info, BluetoothChange.ADVERTISEMENT
+            )
+            coordinator._async_handle_unavailable(service_info)
+            assert not coordinator.available
+
+            coordinator._async_handle_bluetooth_event(
+                fake_service_info(ADDRESS), BluetoothChange.ADVERTISEMENT
+            )
+            assert coordinator.available
+            assert coordinator.stats.skipped == 0
+        await hass.async_stop(force=True)
+
+    asyncio.run(_run())
+
+
+def test_unchanged_payload_updates_like_a_full_parse() -> None:
+    stats = AdvertisementStats()
+    parser = SnoozAdvertisementParser(stats)
+    parser.update(fake_service_info(ADDRESS, rssi=-60))
+
+    service_info = fake_service_info(ADDRESS, rssi=-70)
+    assert parser.update(service_info) == SnoozAdvertisementData().update(service_info)
+    assert (stats.parsed, stats.rssi_only) == (1, 1)
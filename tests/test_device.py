@@ -0,0 +1,108 @@
+"""Tests for the SNOOZ device wrapper."""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock, patch
+
+from bleak.backends.device import BLEDevice
+from custom_components.snooz.breaker import CircuitState
+from custom_components.snooz.device import ManagedSnoozDevice
+from custom_components.snooz.scheduler import SnoozConnectionScheduler
+from homeassistant.components.bluetooth import BluetoothServiceInfoBleak
+from pysnooz.commands import (SnoozCommandResult, SnoozCommandResultStatus,
+                              turn_on)
+from pysnooz.device import SnoozDevice
+
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+TOKEN = "0011223344556677"
+
+
+def _device(scheduler: SnoozConnectionScheduler | None = None) -> ManagedSnoozDevice:
+    loop = asyncio.get_running_loop()
+    return ManagedSnoozDevice(
+        MagicMock(loop=loop),
+        ADDRESS,
+        "Snooz",
+        None,
+        TOKEN,
+        scheduler or SnoozConnectionScheduler(loop, 2, 1),
+    )
+
+
+def _service_info(connectable: bool = True) -> BluetoothServiceInfoBleak:
+    return BluetoothServiceInfoBleak(
+        name="Snooz-EEFF",
+        address=ADDRESS,
+        rssi=-60,
+        manufacturer_data={},
+        service_data={},
+        service_uuids=[],
+        source="hci0",
+        device=BLEDevice(ADDRESS, "Snooz-EEFF", {}),
+        advertisement=None,
+        connectable=connectable,
+        time=time.monotonic(),
+        tx_power=None,
+    )
+
+
+def test_lazy_device_is_resolved_from_its_first_advertisement() -> None:
+    async def _run() -> None:
+        device = _device()
+        assert device.ble_device is None
+
+        device.record_advertisement(_service_info(connectable=False))
+        assert device.ble_device is None
+
+        service_info = _service_info()
+        device.record_advertisement(service_info)
+        assert device.ble_device is service_info.device
+
+    asyncio.run(_run())
+
+
+def test_slot_timeout_does_not_open_the_circuit() -> None:
+    async def _run() -> None:
+        scheduler = SnoozConnectionScheduler(asyncio.get_running_loop(), 1, 0.01)
+        await scheduler.async_acquire("hci0", MagicMock(is_idle=False))
+        device = _device(scheduler)
+        device.record_advertisement(_service_info())
+
+        with patch(
+            "custom_components.snooz.device.async_scanner_devices_by_address",
+            return_value=[],
+        ):
+            result = await device.async_execute_command(turn_on())
+
+        assert result.status == SnoozCommandResultStatus.DEVICE_UNAVAILABLE
+        assert device.metrics.slot_timeouts >= 1
+        assert device.breaker.state == CircuitState.CLOSED
+        assert device.breaker.failures == 0
+
+    asyncio.run(_run())
+
+
+def test_adverts_do_not_reset_the_backoff_while_connects_fail() -> None:
+    async def _run() -> None:
+        device = _device()
+        attempts: list[None] = []
+
+        async def _unreachable(_self, _data) -> SnoozCommandResult:
+            attempts.append(None)
+            return SnoozCommandResult(SnoozCommandResultStatus.DEVICE_UNAVAILABLE, timedelta())
+
+        with patch.object(SnoozDevice, "async_execute_command", _unreachable):
+            for _ in range(10):
+                device.record_advertisement(_service_info())
+                await device.async_execute_command(turn_on())
+
+        # the first command opens the circuit, the first advert after it
+        # lets one trial through, then the backoff holds
+        assert len(attempts) == 2
+        assert device.breaker.failures == 2
+        assert device.breaker.state == CircuitState.OPEN
+        assert device.breaker.rejected == 8
+
+    asyncio.run(_run())
@@ -0,0 +1,152 @@
+"""Tests for the SNOOZ discovery index and dispatcher."""
+from __future__ import annotations
+
+from unittest.mock import MagicMock, patch
+
+from custom_components.snooz.const import (DATA_DISCOVERY_INDEX, DOMAIN,
+                                           SNOOZ_LOCAL_NAME_PREFIX)
+from custom_components.snooz.discovery import (SnoozDiscoveryIndex,
+                                               async_release_discovery_index)
+from homeassistant.components.bluetooth import BluetoothChange
+from homeassistant.config_entries import ConfigEntryState
+
+from pysnooz.advertisement import SnoozAdvertisementData
+
+from benchmarks.fakes import (fake_address, fake_other_service_info,
+                              fake_service_info)
+
+PAIRING_TOKEN = bytes(range(10, 18))
+
+
+def test_unconfigured_devices_are_indexed() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    index._async_on_advertisement(fake_service_info(fake_address(0)), BluetoothChange.ADVERTISEMENT)
+    index._async_on_advertisement(fake_other_service_info(fake_address(1)), BluetoothChange.ADVERTISEMENT)
+
+    assert [d.info.address for d in index.async_discovered()] == [fake_address(0)]
+
+
+def test_discoveries_expire_after_the_ttl() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    with patch("custom_components.snooz.discovery.time.monotonic", return_value=0):
+        index._async_on_advertisement(fake_service_info(fake_address(0)), BluetoothChange.ADVERTISEMENT)
+
+    with patch("custom_components.snooz.discovery.time.monotonic", return_value=61):
+        assert index.async_discovered() == []
+
+
+def test_configured_devices_are_routed_to_their_entry() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    address = fake_address(0)
+    index._async_on_advertisement(fake_service_info(address), BluetoothChange.ADVERTISEMENT)
+
+    received = []
+    unregister = index.async_register_address(
+        address.lower(), lambda info, change: received.append(info.address)
+    )
+    assert index.async_discovered() == []
+
+    index._async_on_advertisement(fake_service_info(address), BluetoothChange.ADVERTISEMENT)
+    assert received == [address]
+
+    unregister()
+    index._async_on_advertisement(fake_service_info(address), BluetoothChange.ADVERTISEMENT)
+    assert received == [address]
+    assert len(index.async_discovered()) == 1
+
+
+def test_discoveries_are_kept_while_the_device_advertises() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    address = fake_address(0)
+    for now in (0, 50):
+        with patch("custom_components.snooz.discovery.time.monotonic", return_value=now):
+            index._async_on_advertisement(fake_service_info(address), BluetoothChange.ADVERTISEMENT)
+
+    with patch("custom_components.snooz.discovery.time.monotonic", return_value=100):
+        assert len(index.async_discovered()) == 1
+
+
+def test_advertisements_are_only_parsed_when_their_payload_changes() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    address = fake_address(0)
+
+    with patch.object(
+        SnoozAdvertisementData,
+        "supported",
+        autospec=True,
+        side_effect=SnoozAdvertisementData.supported,
+    ) as supported:
+        for rssi in (-60, -70, -80):
+            index._async_on_advertisement(
+                fake_service_info(address, rssi=rssi), BluetoothChange.ADVERTISEMENT
+            )
+        assert supported.call_count == 1
+        [discovery] = index.async_discovered()
+        # the newest advertisement is kept for the config flow
+        assert discovery.info.rssi == -80
+        assert not discovery.device.is_pairing
+
+        index._async_on_advertisement(
+            fake_service_info(address, token=PAIRING_TOKEN), BluetoothChange.ADVERTISEMENT
+        )
+        assert supported.call_count == 2
+        [discovery] = index.async_discovered()
+        assert discovery.device.pairing_token == PAIRING_TOKEN.hex()
+
+
+def test_unregistering_a_replaced_route_keeps_the_new_one() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    address = fake_address(0)
+    old, new = MagicMock(), MagicMock()
+
+    unregister_old = index.async_register_address(address, old)
+    index.async_register_address(address, new)
+    unregister_old()
+
+    index._async_on_advertisement(fake_service_info(address), BluetoothChange.ADVERTISEMENT)
+    old.assert_not_called()
+    new.assert_called_once()
+    assert index.async_discovered() == []
+
+
+def test_start_indexes_known_devices_and_matches_on_the_local_name() -> None:
+    index = SnoozDiscoveryIndex(MagicMock(), 60)
+    known = [fake_service_info(fake_address(0)), fake_other_service_info(fake_address(1))]
+
+    with patch(
+        "custom_components.snooz.discovery.async_discovered_service_info", return_value=known
+    ), patch("custom_components.snooz.discovery.async_register_callback") as register:
+        index.async_start()
+
+    assert [d.info.address for d in index.async_discovered()] == [fake_address(0)]
+    matcher = register.call_args.args[2]
+    assert matcher == {"local_name": f"{SNOOZ_LOCAL_NAME_PREFIX}*"}
+
+    index.async_stop()
+    register.return_value.assert_called_once()
+    assert index.async_discovered() == []
+
+
+def _hass_with_entries(*states: ConfigEntryState) -> MagicMock:
+    hass = MagicMock()
+    hass.config_entries.async_entries.return_value = [MagicMock(state=state) for state in states]
+    hass.data = {DOMAIN: {DATA_DISCOVERY_INDEX: MagicMock()}}
+    return hass
+
+
+def test_index_is_released_once_no_entry_is_loaded() -> None:
+    hass = _hass_with_entries(ConfigEntryState.NOT_LOADED)
+    index = hass.data[DOMAIN][DATA_DISCOVERY_INDEX]
+
+    async_release_discovery_index(hass)
+
+    index.async_stop.assert_called_once()
+    assert DATA_DISCOVERY_INDEX not in hass.data[DOMAIN]
+
+
+def test_index_is_kept_while_an_entry_is_loaded() -> None:
+    hass = _hass_with_entries(ConfigEntryState.NOT_LOADED, ConfigEntryState.LOADED)
+
+    async_release_discovery_index(hass)
+
+    hass.data[DOMAIN][DATA_DISCOVERY_INDEX].async_stop.assert_not_called()
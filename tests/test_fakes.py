@@ -0,0 +1,94 @@
+"""Tests for the fake Bluetooth stack the benchmarks run against."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from bleak.exc import BleakDBusError
+from bleak_retry_connector import BleakNotFoundError
+from pysnooz.advertisement import SnoozAdvertisementData
+from pysnooz.commands import SnoozCommandResultStatus, turn_on
+from pysnooz.device import SnoozDevice
+from pysnooz.testing import WRITE_STATE_UUID
+
+from benchmarks.fakes import (FakeRadio, FakeSnoozClient, fake_address,
+                              fake_ble_device, fake_bluetooth,
+                              fake_establish_connection,
+                              fake_other_service_info, fake_service_info)
+
+TOKEN = "0011223344556677"
+
+
+def test_radio_failure_rates_are_seeded() -> None:
+    def _draws(radio: FakeRadio, rate: float) -> list[bool]:
+        return [radio.fails(rate) for _ in range(1000)]
+
+    assert not any(_draws(FakeRadio(), 0))
+    assert all(_draws(FakeRadio(), 1))
+
+    draws = _draws(FakeRadio(seed=1), 0.3)
+    assert draws == _draws(FakeRadio(seed=1), 0.3)
+    assert 250 < sum(draws) < 350
+
+
+def test_connections_take_the_radio_latency_and_can_fail() -> None:
+    async def _run() -> None:
+        loop = asyncio.get_running_loop()
+        radio = FakeRadio(connect_latency=0.02)
+        connect = fake_establish_connection(radio)
+
+        start = loop.time()
+        client = await connect(FakeSnoozClient, fake_ble_device(fake_address(0)), "Snooz")
+        assert loop.time() - start >= 0.02
+        assert isinstance(client, FakeSnoozClient) and client.is_connected
+
+        radio.connect_latency, radio.connect_failure_rate = 0, 1
+        with pytest.raises(BleakNotFoundError):
+            await connect(FakeSnoozClient, fake_ble_device(fake_address(0)), "Snooz")
+        assert radio.connects == 2
+
+    asyncio.run(_run())
+
+
+def test_writes_take_the_radio_latency_and_can_fail() -> None:
+    async def _run() -> None:
+        loop = asyncio.get_running_loop()
+        radio = FakeRadio(write_latency=0.02)
+        client = FakeSnoozClient(radio, fake_ble_device(fake_address(0)))
+
+        start = loop.time()
+        await client.write_gatt_char(WRITE_STATE_UUID, bytes([1, 40]))
+        assert loop.time() - start >= 0.02
+
+        radio.write_latency, radio.write_failure_rate = 0, 1
+        with pytest.raises(BleakDBusError):
+            await client.write_gatt_char(WRITE_STATE_UUID, bytes([1, 40]))
+        assert radio.writes == 2
+
+    asyncio.run(_run())
+
+
+def test_pysnooz_commands_reach_a_fake_client() -> None:
+    async def _run() -> None:
+        with fake_bluetooth() as radio:
+            device = SnoozDevice(fake_ble_device(fake_address(0)), TOKEN)
+            result = await device.async_execute_command(turn_on(40))
+            await device.async_disconnect()
+
+        assert result.status == SnoozCommandResultStatus.SUCCESSFUL
+        assert device.state.on and device.state.volume == 40
+        assert radio.connects == 1 and radio.writes > 0
+
+    asyncio.run(_run())
+
+
+def test_fake_advertisements_parse_like_a_snooz() -> None:
+    device = SnoozAdvertisementData()
+    assert device.supported(fake_service_info(fake_address(0)))
+    assert not device.is_pairing
+
+    device = SnoozAdvertisementData()
+    assert device.supported(fake_service_info(fake_address(0), token=bytes(range(10, 18))))
+    assert device.pairing_token == bytes(range(10, 18)).hex()
+
+    assert not SnoozAdvertisementData().supported(fake_other_service_info(fake_address(1)))
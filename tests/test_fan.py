@@ -0,0 +1,163 @@
+"""Tests for the optimistic state of the SNOOZ fan."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from custom_components.snooz.coalescer import SnoozCommandSuperseded
+from custom_components.snooz.fan import SnoozFan
+from pysnooz.api import SnoozDeviceState
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, set_volume, turn_on)
+
+
+class FakeDevice:
+    is_connected = True
+
+    def __init__(self) -> None:
+        self.state = SnoozDeviceState(on=False, volume=10)
+
+
+class FakeCommands:
+    """Command queue whose results are set by the test."""
+
+    intents = None
+
+    def __init__(self) -> None:
+        self.sent: list[asyncio.Future[SnoozCommandResult]] = []
+
+    async def async_execute_command(
+        self, command: SnoozCommandData, easing: str | None = None
+    ) -> SnoozCommandResult:
+        result = asyncio.get_running_loop().create_future()
+        self.sent.append(result)
+        return await result
+
+
+def _result(status: SnoozCommandResultStatus) -> SnoozCommandResult:
+    return SnoozCommandResult(status, timedelta())
+
+
+def _fan(device: FakeDevice, commands: FakeCommands) -> SnoozFan:
+    fan = SnoozFan(
+        MagicMock(), "Snooz", "AA:BB:CC:DD:EE:FF", device, commands, MagicMock(), True
+    )
+    fan.async_write_ha_state = MagicMock()
+    return fan
+
+
+async def _start(fan: SnoozFan, command: SnoozCommandData) -> asyncio.Future:
+    task = asyncio.ensure_future(fan.async_execute_command(command))
+    await asyncio.sleep(0)
+    return task
+
+
+def test_intended_state_is_shown_until_the_command_succeeds() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        task = await _start(fan, turn_on(40))
+        assert fan.is_on and fan.percentage == 40
+        assert fan.extra_state_attributes["pending_confirmation"] is True
+
+        device.state = SnoozDeviceState(on=True, volume=40)
+        commands.sent[0].set_result(_result(SnoozCommandResultStatus.SUCCESSFUL))
+        await task
+
+        attributes = fan.extra_state_attributes
+        assert attributes["last_command_successful"] is True
+        assert attributes["pending_confirmation"] is False
+        assert attributes["rolled_back"] is False
+
+    asyncio.run(_run())
+
+
+def test_failed_command_rolls_back() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        task = await _start(fan, turn_on(40))
+        commands.sent[0].set_result(_result(SnoozCommandResultStatus.DEVICE_UNAVAILABLE))
+        await task
+
+        assert not fan.is_on and fan.percentage == 10
+        assert fan.extra_state_attributes["rolled_back"] is True
+        assert fan.extra_state_attributes["last_command_successful"] is False
+
+    asyncio.run(_run())
+
+
+def test_cancelled_caller_rolls_back() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(fan.async_execute_command(turn_on(40)), 0.01)
+
+        assert not fan.is_on and fan.percentage == 10
+        attributes = fan.extra_state_attributes
+        assert attributes["pending_confirmation"] is False
+        assert attributes["rolled_back"] is True
+        # the command may still reach the device, so it isn't a failure
+        assert attributes["last_command_successful"] is None
+
+    asyncio.run(_run())
+
+
+def test_superseded_command_leaves_the_newer_state() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        older = await _start(fan, set_volume(20))
+        newer = await _start(fan, set_volume(30))
+        commands.sent[0].set_result(SnoozCommandSuperseded())
+        await older
+        assert fan.percentage == 30
+
+        commands.sent[1].set_result(_result(SnoozCommandResultStatus.SUCCESSFUL))
+        await newer
+        assert fan.extra_state_attributes["pending_confirmation"] is False
+
+    asyncio.run(_run())
+
+
+def test_older_failure_does_not_roll_back_a_newer_command() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        older = await _start(fan, turn_on(20))
+        await _start(fan, set_volume(30))
+        commands.sent[0].set_result(_result(SnoozCommandResultStatus.DEVICE_UNAVAILABLE))
+        await older
+
+        assert fan.is_on and fan.percentage == 30
+        assert fan.extra_state_attributes["rolled_back"] is False
+        commands.sent[1].cancel()
+
+    asyncio.run(_run())
+
+
+def test_device_state_reconciles_the_intended_state() -> None:
+    async def _run() -> None:
+        device, commands = FakeDevice(), FakeCommands()
+        fan = _fan(device, commands)
+
+        task = await _start(fan, turn_on(40))
+        # a step on the way there doesn't confirm it
+        fan._on_device_state_changed(SnoozDeviceState(on=False, volume=40))
+        assert fan.extra_state_attributes["pending_confirmation"] is True
+
+        device.state = SnoozDeviceState(on=True, volume=40)
+        fan._on_device_state_changed(device.state)
+        assert fan.extra_state_attributes["pending_confirmation"] is False
+        commands.sent[0].set_result(_result(SnoozCommandResultStatus.SUCCESSFUL))
+        await task
+
+    asyncio.run(_run())
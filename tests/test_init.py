@@ -0,0 +1,55 @@
+"""Tests for setting up and unloading SNOOZ config entries."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from custom_components.snooz import async_unload_entry
+from custom_components.snooz.const import (DATA_CAPTURE, DATA_DISCOVERY_INDEX,
+                                           DATA_SNAPSHOTS, DOMAIN)
+from homeassistant.config_entries import ConfigEntryState
+
+
+def _hass(entry: MagicMock, *others: MagicMock) -> MagicMock:
+    hass = MagicMock()
+    hass.config_entries.async_unload_platforms = AsyncMock(return_value=True)
+    hass.config_entries.async_entries.return_value = [entry, *others]
+    hass.data = {
+        DOMAIN: {
+            entry.entry_id: MagicMock(),
+            DATA_DISCOVERY_INDEX: MagicMock(),
+            DATA_CAPTURE: MagicMock(async_stop=AsyncMock()),
+        },
+        DATA_SNAPSHOTS: {"evening": {}},
+    }
+    return hass
+
+
+def _entry(entry_id: str, state: ConfigEntryState) -> MagicMock:
+    return MagicMock(entry_id=entry_id, state=state)
+
+
+def test_unloading_the_last_loaded_entry_tears_down_shared_state() -> None:
+    entry = _entry("last", ConfigEntryState.LOADED)
+    hass = _hass(entry, _entry("failed", ConfigEntryState.SETUP_RETRY))
+    domain_data = hass.data[DOMAIN]
+
+    assert asyncio.run(async_unload_entry(hass, entry))
+
+    assert DOMAIN not in hass.data
+    domain_data[DATA_DISCOVERY_INDEX].async_stop.assert_called_once()
+    domain_data[DATA_CAPTURE].async_stop.assert_awaited_once()
+    assert hass.services.async_remove.called
+    # so a snapshot can still be restored after the integration is reloaded
+    assert hass.data[DATA_SNAPSHOTS] == {"evening": {}}
+
+
+def test_shared_state_is_kept_while_another_entry_is_loaded() -> None:
+    entry = _entry("first", ConfigEntryState.LOADED)
+    hass = _hass(entry, _entry("second", ConfigEntryState.LOADED))
+
+    assert asyncio.run(async_unload_entry(hass, entry))
+
+    assert entry.entry_id not in hass.data[DOMAIN]
+    hass.data[DOMAIN][DATA_DISCOVERY_INDEX].async_stop.assert_not_called()
+    assert not hass.services.async_remove.called
@@ -0,0 +1,183 @@
+"""Tests for commands held while a SNOOZ is out of range."""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from custom_components.snooz.breaker import SnoozCircuitBreaker
+from custom_components.snooz.coalescer import SnoozCommandCoalescer
+from custom_components.snooz.fan import SnoozFan
+from custom_components.snooz.intents import (SnoozCommandPending,
+                                             SnoozIntentBuffer)
+from custom_components.snooz.metrics import SnoozDeviceMetrics
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, set_volume, turn_on)
+
+EXPIRY = 0.05
+
+
+class FakeDevice:
+    def __init__(self) -> None:
+        self.breaker = SnoozCircuitBreaker(5, 300, 0)
+        self.breaker.record_failure(time.monotonic())
+        self.commands: list[tuple[bool | None, int | None]] = []
+
+    async def async_execute_command(self, data: SnoozCommandData) -> SnoozCommandResult:
+        self.commands.append((data.on, data.volume))
+        return SnoozCommandResult(SnoozCommandResultStatus.SUCCESSFUL, timedelta())
+
+
+class FakeUnreachableDevice(FakeDevice):
+    """Advertises, but every connection fails."""
+
+    async def async_execute_command(self, data: SnoozCommandData) -> SnoozCommandResult:
+        if self.breaker.allow(time.monotonic()):
+            self.commands.append((data.on, data.volume))
+            self.breaker.record_failure(time.monotonic())
+        return SnoozCommandResult(SnoozCommandResultStatus.DEVICE_UNAVAILABLE, timedelta())
+
+
+class FakeTransitions:
+    is_running = False
+
+    def async_cancel(self) -> None:
+        pass
+
+
+def _coalescer(device: FakeDevice) -> SnoozCommandCoalescer:
+    return SnoozCommandCoalescer(
+        device,
+        asyncio.get_running_loop(),
+        0,
+        FakeTransitions(),
+        SnoozDeviceMetrics(),
+        SnoozIntentBuffer(EXPIRY),
+    )
+
+
+def _fan(commands: SnoozCommandCoalescer) -> SnoozFan:
+    fan = SnoozFan(
+        MagicMock(),
+        "Snooz",
+        "AA:BB:CC:DD:EE:FF",
+        MagicMock(is_connected=False),
+        commands,
+        MagicMock(),
+        optimistic=True,
+    )
+    fan.async_write_ha_state = MagicMock()
+    commands.add_listener(fan._on_intent_settled)
+    return fan
+
+
+def test_buffer_folds_commands_newest_value_wins() -> None:
+    intents = SnoozIntentBuffer(10)
+    intents.add(turn_on(30), 1)
+    intents.add(set_volume(50), 2)
+    # a replay that failed comes back older than what was held since
+    intents.add(set_volume(20), 0)
+
+    command, since = intents.take(3)
+    assert (command.on, command.volume) == (True, 50)
+    assert since == 2
+    assert intents.take(3) is None
+
+
+def test_buffer_drops_expired_intents() -> None:
+    intents = SnoozIntentBuffer(10)
+    intents.add(turn_on(), 0)
+    assert intents.expires_at == 10
+    assert not intents.expire(9)
+    assert intents.has_intent(9)
+
+    assert intents.expire(10)
+    assert intents.expires_at is None
+    assert intents.expired == 1
+
+
+def test_listeners_are_notified_when_a_held_intent_expires() -> None:
+    async def _run() -> None:
+        commands = _coalescer(FakeDevice())
+        settled: list[bool] = []
+        commands.add_listener(lambda: settled.append(commands.has_pending_intent))
+
+        result = await commands.async_execute_command(turn_on())
+        assert isinstance(result, SnoozCommandPending)
+        assert commands.has_pending_intent
+
+        await asyncio.sleep(EXPIRY * 2)
+        assert settled == [False]
+        assert commands.intent_result is None
+        assert commands.intents.expired == 1
+
+    asyncio.run(_run())
+
+
+def test_listeners_are_notified_when_a_held_intent_is_replayed() -> None:
+    async def _run() -> None:
+        device = FakeDevice()
+        commands = _coalescer(device)
+        settled: list[bool] = []
+        commands.add_listener(lambda: settled.append(commands.has_pending_intent))
+
+        await commands.async_execute_command(turn_on(40))
+        device.breaker.record_success()
+        commands.async_on_advertisement(MagicMock())
+        await asyncio.sleep(0.01)
+
+        assert device.commands == [(True, 40)]
+        assert settled == [False]
+        assert commands.intent_result.status == SnoozCommandResultStatus.SUCCESSFUL
+        commands.async_stop()
+
+    asyncio.run(_run())
+
+
+def test_unreachable_device_is_not_retried_on_every_advertisement() -> None:
+    async def _run() -> None:
+        device = FakeUnreachableDevice()
+        commands = _coalescer(device)
+        await commands.async_execute_command(turn_on(40))
+
+        commands.async_on_advertisement(MagicMock(connectable=False))
+        await asyncio.sleep(0.01)
+        assert device.commands == []
+
+        for _ in range(10):
+            # the device's own listener runs before the coalescer's
+            device.breaker.record_advertisement(time.monotonic())
+            commands.async_on_advertisement(MagicMock(connectable=True))
+            await asyncio.sleep(0.002)
+
+        # one trial on the first advert, then the intent waits for the backoff
+        assert device.commands == [(True, 40)]
+        assert commands.replayed_intents == 1
+        assert commands.has_pending_intent
+        commands.async_stop()
+
+    asyncio.run(_run())
+
+
+def test_fan_keeps_the_intended_state_while_a_command_is_held() -> None:
+    async def _run() -> None:
+        commands = _coalescer(FakeDevice())
+        fan = _fan(commands)
+
+        await fan.async_execute_command(turn_on(40))
+        attributes = fan.extra_state_attributes
+        assert fan.is_on and fan.percentage == 40
+        assert attributes["pending_command"] is True
+        assert attributes["pending_confirmation"] is True
+        assert attributes["rolled_back"] is False
+        assert attributes["last_command_successful"] is None
+
+        await asyncio.sleep(EXPIRY * 2)
+        attributes = fan.extra_state_attributes
+        assert attributes["pending_command"] is False
+        assert attributes["pending_confirmation"] is False
+        assert attributes["rolled_back"] is True
+        assert attributes["last_command_successful"] is False
+
+    asyncio.run(_run())
@@ -0,0 +1,42 @@
+"""Tests for SNOOZ device metrics."""
+from __future__ import annotations
+
+from custom_components.snooz.metrics import (LatencyHistogram,
+                                             SnoozDeviceMetrics)
+from pysnooz.commands import SnoozCommandResultStatus
+from pysnooz.device import DisconnectionReason
+
+
+def test_histogram_percentiles_are_within_a_bucket() -> None:
+    histogram = LatencyHistogram()
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+
+    assert histogram.count == 100
+    assert histogram.max == 0.1
+    assert abs(histogram.percentile(50) - 0.05) <= 0.05 * 0.1
+    assert abs(histogram.percentile(95) - 0.095) <= 0.095 * 0.1
+
+
+def test_empty_histogram_has_no_percentiles() -> None:
+    histogram = LatencyHistogram()
+    assert histogram.percentile(95) is None
+    assert histogram.as_dict()["p50"] is None
+
+
+def test_listeners_are_notified_until_removed() -> None:
+    metrics = SnoozDeviceMetrics()
+    calls: list[None] = []
+    remove = metrics.add_listener(lambda: calls.append(None))
+
+    metrics.record_command(0.1, SnoozCommandResultStatus.SUCCESSFUL)
+    metrics.record_disconnect(DisconnectionReason.DEVICE)
+    # waits are only shown in diagnostics, so they don't notify
+    metrics.record_slot_wait(0.1)
+    assert len(calls) == 2
+
+    remove()
+    metrics.record_connection_retry()
+    assert len(calls) == 2
+    assert metrics.as_dict()["command_results"]["successful"] == 1
+    assert metrics.last_disconnect_reason == DisconnectionReason.DEVICE
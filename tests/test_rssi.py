@@ -0,0 +1,90 @@
+"""Tests for the RSSI emission policy and the signal strength sensor."""
+from __future__ import annotations
+
+import asyncio
+from unittest.mock import MagicMock
+
+from custom_components.snooz.const import (RSSI_SMOOTHING_MEDIAN,
+                                           RSSI_SMOOTHING_NONE)
+from custom_components.snooz.rssi import RssiEmissionPolicy
+from custom_components.snooz.sensor import (SENSOR_DESCRIPTIONS,
+                                            SnoozSensorEntity)
+from homeassistant.components.bluetooth.passive_update_processor import (
+    PassiveBluetoothDataUpdate, PassiveBluetoothEntityKey)
+
+
+def test_first_reading_is_emitted() -> None:
+    policy = RssiEmissionPolicy(30, 3, RSSI_SMOOTHING_NONE)
+    assert policy.update(-60, 0)
+    assert policy.value == -60
+
+
+def test_small_changes_are_not_emitted() -> None:
+    policy = RssiEmissionPolicy(0, 3, RSSI_SMOOTHING_NONE)
+    policy.update(-60, 0)
+    assert not policy.update(-62, 10)
+    assert policy.update(-65, 20)
+    assert policy.value == -65
+
+
+def test_readings_within_the_interval_are_held() -> None:
+    policy = RssiEmissionPolicy(30, 3, RSSI_SMOOTHING_NONE)
+    policy.update(-60, 0)
+    assert not policy.update(-70, 10)
+    assert policy.value == -60
+    assert policy.due_in(10) == 20
+
+    assert policy.flush(30)
+    assert policy.value == -70
+    assert policy.due_in(30) is None
+    assert not policy.flush(31)
+
+
+def test_held_reading_is_dropped_when_the_signal_returns() -> None:
+    policy = RssiEmissionPolicy(30, 3, RSSI_SMOOTHING_NONE)
+    policy.update(-60, 0)
+    policy.update(-70, 10)
+    policy.update(-61, 20)
+    assert policy.due_in(20) is None
+    assert not policy.flush(30)
+    assert policy.value == -60
+
+
+def test_median_smoothing_ignores_a_single_outlier() -> None:
+    policy = RssiEmissionPolicy(0, 3, RSSI_SMOOTHING_MEDIAN, window=3)
+    policy.update(-60, 0)
+    policy.update(-60, 1)
+    assert not policy.update(-90, 2)
+    assert policy.value == -60
+
+
+def test_sensor_writes_a_held_reading_after_the_device_goes_quiet() -> None:
+    async def _run() -> list[int | float | None]:
+        entity_key = PassiveBluetoothEntityKey("signal_strength", None)
+        processor = MagicMock()
+        processor.entity_data = {}
+        entity = SnoozSensorEntity(
+            processor,
+            entity_key,
+            next(iter(SENSOR_DESCRIPTIONS.values())),
+            policy=RssiEmissionPolicy(0.05, 3, RSSI_SMOOTHING_NONE),
+        )
+        entity.hass = MagicMock(loop=asyncio.get_running_loop())
+        written: list[int | float | None] = []
+        entity.async_write_ha_state = lambda: written.append(entity.native_value)
+
+        for reading in (-60, -75):
+            entity._handle_processor_update(
+                PassiveBluetoothDataUpdate(
+                    devices={},
+                    entity_descriptions={},
+                    entity_data={entity_key: reading},
+                    entity_names={},
+                )
+            )
+
+        # no more advertisements arrive, the held reading still gets written
+        await asyncio.sleep(0.1)
+        return written
+
+    assert asyncio.run(_run()) == [-60, -75]
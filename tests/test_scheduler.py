@@ -0,0 +1,136 @@
+"""Tests for the SNOOZ connection scheduler."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+import pytest
+from custom_components.snooz.scheduler import (ConnectionPriority,
+                                               SnoozConnectionScheduler,
+                                               command_priority)
+from pysnooz.commands import set_volume, turn_off, turn_on
+
+SOURCE = "hci0"
+
+
+class FakeHolder:
+    def __init__(self, address: str, idle: bool = False) -> None:
+        self.address = address
+        self.is_idle = idle
+        self.disconnects = 0
+
+    async def async_disconnect(self) -> None:
+        self.disconnects += 1
+
+
+async def _acquire_in_order(
+    scheduler: SnoozConnectionScheduler, holder: FakeHolder, granted: list[str], **kwargs
+) -> None:
+    await scheduler.async_acquire(SOURCE, holder, **kwargs)
+    granted.append(holder.address)
+
+
+async def _until_granted(granted: list[str], count: int) -> None:
+    while len(granted) < count:
+        await asyncio.sleep(0)
+
+
+def test_waiters_are_served_by_priority_then_order() -> None:
+    async def _run() -> None:
+        scheduler = SnoozConnectionScheduler(asyncio.get_running_loop(), 1, 5)
+        busy = FakeHolder("busy")
+        await scheduler.async_acquire(SOURCE, busy)
+
+        granted: list[str] = []
+        holders = {"busy": busy}
+        tasks = []
+        for address, priority in (
+            ("low", ConnectionPriority.LOW),
+            ("normal-1", ConnectionPriority.NORMAL),
+            ("high", ConnectionPriority.HIGH),
+            ("normal-2", ConnectionPriority.NORMAL),
+        ):
+            holders[address] = FakeHolder(address)
+            tasks.append(
+                asyncio.ensure_future(
+                    _acquire_in_order(
+                        scheduler, holders[address], granted, priority=priority
+                    )
+                )
+            )
+            await asyncio.sleep(0)
+
+        assert scheduler.pending(SOURCE) == 4
+        scheduler.release(SOURCE, busy)
+        for count in range(1, 5):
+            await asyncio.wait_for(_until_granted(granted, count), 1)
+            scheduler.release(SOURCE, holders[granted[-1]])
+
+        assert granted == ["high", "normal-1", "normal-2", "low"]
+        await asyncio.gather(*tasks)
+
+    asyncio.run(_run())
+
+
+def test_acquire_times_out_when_no_slot_frees_up() -> None:
+    async def _run() -> None:
+        scheduler = SnoozConnectionScheduler(asyncio.get_running_loop(), 1, 0.01)
+        await scheduler.async_acquire(SOURCE, FakeHolder("busy"))
+
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.async_acquire(SOURCE, FakeHolder("starved"))
+        assert scheduler.pending(SOURCE) == 0
+
+    asyncio.run(_run())
+
+
+def test_idle_holders_are_asked_to_release_for_waiters() -> None:
+    async def _run() -> None:
+        scheduler = SnoozConnectionScheduler(asyncio.get_running_loop(), 1, 0.01)
+        idle = FakeHolder("idle", idle=True)
+        await scheduler.async_acquire(SOURCE, idle)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.async_acquire(SOURCE, FakeHolder("waiting"))
+        assert idle.disconnects == 1
+
+    asyncio.run(_run())
+
+
+def test_retry_with_ticket_keeps_its_place() -> None:
+    async def _run() -> None:
+        scheduler = SnoozConnectionScheduler(asyncio.get_running_loop(), 1, 0.02)
+        busy = FakeHolder("busy")
+        await scheduler.async_acquire(SOURCE, busy)
+
+        retrying = FakeHolder("retrying")
+        ticket = scheduler.next_ticket()
+        with pytest.raises(asyncio.TimeoutError):
+            await scheduler.async_acquire(SOURCE, retrying, ticket=ticket)
+
+        granted: list[str] = []
+        later = asyncio.ensure_future(
+            _acquire_in_order(scheduler, FakeHolder("later"), granted)
+        )
+        await asyncio.sleep(0)
+        retry = asyncio.ensure_future(
+            _acquire_in_order(scheduler, retrying, granted, ticket=ticket)
+        )
+        await asyncio.sleep(0)
+
+        scheduler.release(SOURCE, busy)
+        await asyncio.wait_for(_until_granted(granted, 1), 1)
+        assert granted == ["retrying"]
+
+        scheduler.release(SOURCE, retrying)
+        await asyncio.gather(later, retry)
+        assert granted == ["retrying", "later"]
+
+    asyncio.run(_run())
+
+
+def test_turning_off_outranks_commands_and_transitions() -> None:
+    assert command_priority(turn_off()) == ConnectionPriority.HIGH
+    assert command_priority(turn_off(timedelta(seconds=30))) == ConnectionPriority.HIGH
+    assert command_priority(set_volume(40)) == ConnectionPriority.NORMAL
+    assert command_priority(turn_on(40, timedelta(seconds=30))) == ConnectionPriority.LOW
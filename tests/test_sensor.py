@@ -0,0 +1,34 @@
+"""Tests for converting SNOOZ sensor updates."""
+from __future__ import annotations
+
+from custom_components.snooz.sensor import SensorUpdateConverter
+from pysnooz.advertisement import SnoozAdvertisementData
+
+from benchmarks.fakes import fake_service_info
+from benchmarks.sensor_update import sensor_update_to_bluetooth_data_update
+
+
+def test_first_update_matches_the_full_conversion() -> None:
+    sensor_update = SnoozAdvertisementData().update(fake_service_info())
+
+    assert SensorUpdateConverter()(sensor_update) == (
+        sensor_update_to_bluetooth_data_update(sensor_update)
+    )
+
+
+def test_later_updates_only_carry_what_changed() -> None:
+    parser = SnoozAdvertisementData()
+    converter = SensorUpdateConverter()
+    first = converter(parser.update(fake_service_info(rssi=-60)))
+
+    unchanged = converter(parser.update(fake_service_info(rssi=-60)))
+    assert not unchanged.devices
+    assert not unchanged.entity_descriptions
+    assert not unchanged.entity_data
+    assert not unchanged.entity_names
+
+    moved = converter(parser.update(fake_service_info(rssi=-70)))
+    assert not moved.devices
+    assert not moved.entity_descriptions
+    assert list(moved.entity_data.values()) == [-70]
+    assert list(moved.entity_data) == list(first.entity_data)
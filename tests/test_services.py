@@ -0,0 +1,98 @@
+"""Tests for the integration-wide SNOOZ services."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+from custom_components.snooz.services import (STATUS_ERROR, STATUS_NOT_FOUND,
+                                              STATUS_UNCHANGED,
+                                              _async_run_commands,
+                                              _command_to_restore,
+                                              _count_results)
+from pysnooz.api import SnoozDeviceState, UnknownSnoozState
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, turn_on)
+
+
+class FakeTarget:
+    def __init__(self, error: Exception | None = None) -> None:
+        self.error = error
+        self.commands: list[SnoozCommandData] = []
+
+    async def async_execute_command(
+        self, command: SnoozCommandData, easing: str | None = None
+    ) -> SnoozCommandResult:
+        self.commands.append(command)
+        if self.error is not None:
+            raise self.error
+        return SnoozCommandResult(SnoozCommandResultStatus.SUCCESSFUL, timedelta())
+
+
+class FakeData:
+    def __init__(self, fan: FakeTarget | None, commands: FakeTarget) -> None:
+        self.fan = fan
+        self.commands = commands
+
+
+def test_an_error_on_one_device_is_reported_for_that_device_only() -> None:
+    fan = FakeTarget()
+    results = asyncio.run(
+        _async_run_commands(
+            {
+                "fan.ok": (FakeData(fan, FakeTarget()), turn_on()),
+                "fan.broken": (FakeData(None, FakeTarget(RuntimeError())), turn_on()),
+                "fan.same": (FakeData(None, FakeTarget()), None),
+                "fan.missing": (None, turn_on()),
+            },
+            2,
+            5,
+            None,
+        )
+    )
+
+    statuses = {result["entity_id"]: result["status"] for result in results}
+    assert statuses == {
+        "fan.ok": "successful",
+        "fan.broken": STATUS_ERROR,
+        "fan.same": STATUS_UNCHANGED,
+        "fan.missing": STATUS_NOT_FOUND,
+    }
+    # commands go through the fan entity when there is one
+    assert len(fan.commands) == 1
+    assert _count_results(results) == {
+        "successful": 1,
+        "pending": 0,
+        "superseded": 0,
+        "failed": 2,
+    }
+
+
+def _restore(
+    current: SnoozDeviceState, saved: SnoozDeviceState
+) -> tuple[bool | None, int | None] | None:
+    command = _command_to_restore(current, saved)
+    return None if command is None else (command.on, command.volume)
+
+
+def test_restoring_an_unchanged_device_sends_nothing() -> None:
+    state = SnoozDeviceState(on=True, volume=40)
+    assert _restore(SnoozDeviceState(on=True, volume=40), state) is None
+
+
+def test_restore_sends_only_what_changed() -> None:
+    # volume only
+    assert _restore(
+        SnoozDeviceState(on=True, volume=60), SnoozDeviceState(on=True, volume=40)
+    ) == (None, 40)
+    # on to off
+    assert _restore(
+        SnoozDeviceState(on=True, volume=40), SnoozDeviceState(on=False, volume=40)
+    ) == (False, None)
+    # off to on, at another volume
+    assert _restore(
+        SnoozDeviceState(on=False, volume=10), SnoozDeviceState(on=True, volume=40)
+    ) == (True, 40)
+
+
+def test_restoring_a_device_in_an_unknown_state_sends_everything() -> None:
+    assert _restore(UnknownSnoozState, SnoozDeviceState(on=False, volume=40)) == (False, 40)
@@ -0,0 +1,56 @@
+"""Tests for choosing the scanner a SNOOZ is connected through."""
+from __future__ import annotations
+
+from bleak.backends.device import BLEDevice
+from custom_components.snooz.sources import ConnectionSourceSelector
+
+from benchmarks.fakes import fake_address
+
+STALE_AFTER = 120
+FAILURE_COOLDOWN = 60
+
+
+def _selector() -> ConnectionSourceSelector:
+    return ConnectionSourceSelector(STALE_AFTER, FAILURE_COOLDOWN)
+
+
+def _record(selector: ConnectionSourceSelector, source: str, rssi: int, now: float) -> None:
+    selector.record(source, BLEDevice(fake_address(0), "Snooz", {"source": source}), rssi, now)
+
+
+def test_one_strong_reading_does_not_switch_scanners() -> None:
+    selector = _selector()
+    _record(selector, "hci0", -60, 0)
+    _record(selector, "proxy", -65, 0)
+
+    _record(selector, "proxy", -50, 1)
+    assert selector.best(1).source == "hci0"
+
+    for now in range(2, 6):
+        _record(selector, "proxy", -50, now)
+    assert selector.best(6).source == "proxy"
+
+
+def test_stale_scanners_are_skipped() -> None:
+    selector = _selector()
+    _record(selector, "hci0", -50, 0)
+    _record(selector, "proxy", -80, 100)
+
+    assert selector.best(STALE_AFTER + 1).source == "proxy"
+    assert selector.best(STALE_AFTER + 101) is None
+
+
+def test_failed_scanner_is_only_used_when_no_other_is_left() -> None:
+    selector = _selector()
+    _record(selector, "hci0", -50, 0)
+    _record(selector, "proxy", -80, 0)
+
+    selector.record_failure("hci0", 1)
+    assert selector.best(2).source == "proxy"
+    assert selector.best(FAILURE_COOLDOWN + 2).source == "hci0"
+
+    selector.record_failure("proxy", 3)
+    assert selector.best(4).source == "hci0"
+
+    selector.record_success("proxy")
+    assert selector.best(5).source == "proxy"
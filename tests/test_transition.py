@@ -0,0 +1,134 @@
+"""Tests for SNOOZ volume transitions."""
+from __future__ import annotations
+
+import asyncio
+from datetime import timedelta
+
+from custom_components.snooz.const import (EASING_EXPONENTIAL, EASING_LINEAR,
+                                           EASING_LOG)
+from custom_components.snooz.transition import (SnoozTransitionEngine,
+                                                plan_transition_steps)
+from pysnooz.api import SnoozDeviceState
+from pysnooz.commands import (SnoozCommandData, SnoozCommandResult,
+                              SnoozCommandResultStatus, turn_off, turn_on)
+
+INTERVAL = 0.01
+
+
+class FakeDevice:
+    display_name = "Snooz"
+
+    def __init__(self, on: bool, volume: int, latency: float = 0) -> None:
+        self.state = SnoozDeviceState(on=on, volume=volume)
+        self.latency = latency
+        self.commands: list[tuple[bool | None, int | None]] = []
+
+    async def async_execute_command(self, data: SnoozCommandData) -> SnoozCommandResult:
+        self.commands.append((data.on, data.volume))
+        await asyncio.sleep(self.latency)
+        return SnoozCommandResult(SnoozCommandResultStatus.SUCCESSFUL, timedelta())
+
+
+def _engine(device: FakeDevice, step: int = 1) -> SnoozTransitionEngine:
+    return SnoozTransitionEngine(
+        device, asyncio.get_running_loop(), step, INTERVAL, EASING_LINEAR
+    )
+
+
+def test_steps_smaller_than_the_minimum_are_skipped() -> None:
+    steps = plan_transition_steps(10, 20, 10, 3, 1, EASING_LINEAR)
+
+    assert [volume for _, volume in steps] == [13, 16, 19, 20]
+    assert steps[-1] == (10, 20)
+    assert plan_transition_steps(20, 20, 10, 1, 1, EASING_LINEAR) == []
+
+
+def test_easing_curves_shape_the_volume() -> None:
+    def _halfway(easing: str) -> int:
+        return dict(plan_transition_steps(0, 100, 10, 1, 1, easing))[5]
+
+    assert _halfway(EASING_EXPONENTIAL) < _halfway(EASING_LINEAR) < _halfway(EASING_LOG)
+    for easing in (EASING_LINEAR, EASING_EXPONENTIAL, EASING_LOG):
+        volumes = [volume for _, volume in plan_transition_steps(0, 100, 10, 1, 1, easing)]
+        assert volumes == sorted(volumes)
+        assert volumes[-1] == 100
+
+
+def test_turning_on_sets_the_start_volume_before_stepping_up() -> None:
+    async def _run() -> None:
+        device = FakeDevice(on=False, volume=40)
+        engine = _engine(device, step=10)
+
+        result = await engine.async_run(turn_on(40, timedelta(seconds=INTERVAL * 5)))
+
+        assert result.status == SnoozCommandResultStatus.SUCCESSFUL
+        start_on, start_volume = device.commands[0]
+        assert start_on is True and start_volume < 40
+        assert device.commands[-1] == (None, 40)
+        assert not engine.is_running
+
+    asyncio.run(_run())
+
+
+def test_turning_off_restores_the_original_volume() -> None:
+    async def _run() -> None:
+        device = FakeDevice(on=True, volume=40)
+        engine = _engine(device, step=10)
+
+        await engine.async_run(turn_off(timedelta(seconds=INTERVAL * 5)))
+
+        assert device.commands[-2:] == [(False, None), (None, 40)]
+
+    asyncio.run(_run())
+
+
+def test_turning_off_a_device_that_is_off_leaves_the_volume() -> None:
+    async def _run() -> None:
+        device = FakeDevice(on=False, volume=40)
+        engine = _engine(device, step=10)
+
+        await engine.async_run(turn_off(timedelta(seconds=INTERVAL * 5)))
+
+        assert device.commands == [(False, None)]
+
+    asyncio.run(_run())
+
+
+def test_cancelled_turn_off_does_not_restore_the_volume() -> None:
+    async def _run() -> None:
+        device = FakeDevice(on=True, volume=40, latency=INTERVAL)
+        engine = _engine(device, step=10)
+
+        running = asyncio.ensure_future(
+            engine.async_run(turn_off(timedelta(seconds=INTERVAL * 2)))
+        )
+        while (False, None) not in device.commands:
+            await asyncio.sleep(INTERVAL / 10)
+        engine.async_cancel()
+
+        result = await running
+        await asyncio.sleep(INTERVAL * 2)
+        assert result.status == SnoozCommandResultStatus.CANCELLED
+        assert device.commands[-1] == (False, None)
+
+    asyncio.run(_run())
+
+
+def test_cancelled_transition_reports_cancelled() -> None:
+    async def _run() -> None:
+        device = FakeDevice(on=True, volume=10)
+        engine = _engine(device)
+
+        running = asyncio.ensure_future(
+            engine.async_run(turn_on(90, timedelta(seconds=1)))
+        )
+        await asyncio.sleep(INTERVAL * 5)
+        assert engine.is_running
+        engine.async_cancel()
+
+        result = await running
+        assert result.status == SnoozCommandResultStatus.CANCELLED
+        # the volume stays where the transition was stopped
+        assert device.commands and device.commands[-1][1] < 90
+
+    asyncio.run(_run())